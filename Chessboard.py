@@ -1,6 +1,60 @@
 from Chesspiece import *
 from Square import *
-import copy
+from Chessmove import *
+from Chesseval import *
+from Chesscache import *
+from Chessmagic import *
+import random
+import re
+
+def _zobrist():
+    """
+    Returns the Zobrist keys used to hash the positions of the Chessboard class : a random 64-bit integer for each color,
+    piece_type and square reference, for the turn, for each combination of castling rights and for each en passant file.
+    The keys are generated from a fixed seed, so they are the same at each run.
+    """
+    generator = random.Random(20210801)
+    pieces = {color: {piece_type: {row + str(line): generator.getrandbits(64) for row in 'abcdefgh' for line in range(1, 9)}
+                      for piece_type in Chesspiece.Type_list}
+              for color in Chesspiece.Color_list}
+    turn = generator.getrandbits(64)
+    rights = [generator.getrandbits(64) for i in range(4)]
+    castles = {}
+    for flags in range(16): # Key of each combination of (big white, small white, big black, small black) castling rights
+        castles[tuple(bool(flags >> i & 1) for i in range(4))] = 0
+        for i in range(4):
+            if flags >> i & 1:
+                castles[tuple(bool(flags >> i & 1) for i in range(4))] ^= rights[i]
+    en_passant = {row: generator.getrandbits(64) for row in 'abcdefgh'}
+    return pieces, turn, castles, en_passant
+
+def _geometry():
+    """
+    Returns the precomputed geometry used by the move generation of the Chessboard class :
+    the knight targets, the king targets, the rays of the sliding pieces and the pawn attacks, for each square reference.
+    """
+    refs = {(row, line): 'abcdefgh'[row - 1] + str(line) for row in range(1, 9) for line in range(1, 9)}
+    knight_targets = {}
+    king_targets = {}
+    rays = {}
+    pawn_attacks = {'White': {}, 'Black': {}}
+    for (row, line), ref in refs.items():
+        knight_targets[ref] = [refs[(row + dr, line + dl)] for dr, dl in [(-1, 2), (-1, -2), (-2, 1), (-2, -1), (2, 1), (2, -1), (1, 2), (1, -2)]
+                               if (row + dr, line + dl) in refs]
+        king_targets[ref] = [refs[(row + dr, line + dl)] for dr in (-1, 0, 1) for dl in (-1, 0, 1)
+                             if (dr, dl) != (0, 0) and (row + dr, line + dl) in refs]
+        # The 4 first rays are the rook directions, the 4 last ones the bishop directions
+        rays[ref] = []
+        for dr, dl in [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (1, -1), (-1, -1)]:
+            ray = []
+            step = 1
+            while (row + step * dr, line + step * dl) in refs:
+                ray.append(refs[(row + step * dr, line + step * dl)])
+                step += 1
+            rays[ref].append(ray)
+        pawn_attacks['White'][ref] = [refs[(row + dr, line + 1)] for dr in (-1, 1) if (row + dr, line + 1) in refs]
+        pawn_attacks['Black'][ref] = [refs[(row + dr, line - 1)] for dr in (-1, 1) if (row + dr, line - 1) in refs]
+    return knight_targets, king_targets, rays, pawn_attacks
 
 class Chessboard:
     """
@@ -31,6 +85,30 @@ class Chessboard:
         in the future.
     previous : str
         The reference of the last move played.
+    history : list of tuple
+        The information needed to undo each move executed with make_move.
+    mg_score : int
+        The middlegame material and piece-square score of the position (white point of view), maintained incrementally.
+    eg_score : int
+        The endgame material and piece-square score of the position (white point of view), maintained incrementally.
+    phase : int
+        The game phase, computed from the non-pawn material on the board, maintained incrementally.
+    king_squares : dict of str: str
+        The reference of the square of the king of each color.
+    key : int
+        The Zobrist hash of the position (pieces, turn, castling rights and en passant file), maintained incrementally.
+    pawn_key : int
+        The Zobrist hash of the pawns of the position, maintained incrementally. It only changes on pawn moves,
+        captures of pawns and promotions, and is used as key of the pawn structure evaluation cache.
+    occupied : int
+        The bitboard of the occupied squares (bit 0 for a1 to bit 63 for h8), maintained incrementally. It gives
+        the attacks of the sliding pieces through the magic bitboard tables of the Chessmagic class.
+    move_cache : Chesscache object or None
+        If set, the legal moves of the player to move (legal_moves) and the possible moves of each color
+        (possible_moves) are cached by position key, so that the moves of positions queried again and again
+        (popular openings, hints) are returned without being generated. It is given to the
+        boards sharing a cache when they are created (e.g. Chessboard(move_cache = cache)); the class attribute,
+        used by the other boards, is None (no cache). The cache is not part of the copies and pickles of the board.
 
 
     Methods
@@ -40,6 +118,9 @@ class Chessboard:
 
     cmove(self, ref, promote = None, quiet = False):
         Moves a piece based on its reference in algebraic notation, if permitted by the rules.
+
+    parse_move(self, ref, promote = 'Q'):
+        Returns the Chessmove object of a move reference in algebraic or long algebraic notation, or raises a MoveError.
     
     move(self, *args, promote = None, quiet = False):
         Operates a series of moves based on its references in algebraic notation, if permitted by the rules.
@@ -47,6 +128,9 @@ class Chessboard:
     cheat_move(self, origin, destination):
         Moves a piece based on its origin and destination squares, even if the move is not permitted by the rules.
 
+    undo_cheat_move(self, origin, destination, captured):
+        Undoes a move executed with cheat_move.
+
     get_coord(self, ref):
         Returns the coordinates of a square in a tuple based on its reference.
 
@@ -92,16 +176,64 @@ class Chessboard:
     encode_fen(self):
         Returns the Forsyth–Edwards Notation (FEN) of the current Chessboard position.
 
+    decode_fen(self, fen):
+        Sets the Chessboard to the position given in Forsyth–Edwards Notation (FEN).
+
+    refresh_state(self):
+        Recomputes from scratch the incrementally maintained attributes of the Chessboard.
+
+    make_move(self, origin, destination, promote = None):
+        Moves a piece without checking the rules, updating all the attributes incrementally, so that the move can be undone.
+
+    unmake_move(self):
+        Undoes the last move executed with make_move.
+
+    is_attacked(self, ref, color):
+        Returns a boolean indicating if a square is attacked by a given player.
+
+    pseudo_moves(self, color = None):
+        Returns a list of the moves of a given player, without checking if they leave the king in check.
+
+    legal_moves(self, color = None):
+        Returns a list of the legal moves of a given player, as Chessmove objects.
+
+    to_san(self, move, legal = None):
+        Returns the reference of a legal move in standard algebraic notation, with the check and mate suffixes.
+
+    legal_moves_san(self):
+        Returns a dictionnary of the legal moves of the current player, with their references in standard algebraic notation as keys.
+
+    has_legal_move(self, color = None):
+        Returns a boolean indicating if a given player has at least one legal move.
+
     """
 
     rows = [None,*'abcdefgh']
     lines = [None,*range(1,9)]
+    opponents = {'White': 'Black', 'Black': 'White'}
+    knight_targets, king_targets, rays, pawn_attacks = _geometry()
+    zobrist_pieces, zobrist_turn, zobrist_castles, zobrist_en_passant = _zobrist()
+    move_cache = None
+    move_pattern = re.compile(r'^(?:(?P<castle>[O0o]-[O0o](?P<big>-[O0o])?)'
+                              r'|(?P<piece>[KQRBN])?(?P<row>[a-h])?(?P<line>[1-8])?[-x:]?(?P<destination>[a-h][1-8])'
+                              r'(?:=?(?P<promote>[QRBNqrbn]))?(?:e\.p\.)?)[+#]*[!?]*$')
     
-    def __init__(self):
+    def __init__(self, fen = None, move_cache = None):
         """
         Instantiate a Chessboard object with all attributes set to the initial values of a standard game.
+
+        Parameters
+        ----------
+            fen : str or None
+                If given, the Forsyth–Edwards Notation (FEN) of the position to set up instead of the initial position.
+                Default is None.
+            move_cache : Chesscache object or None
+                If given, the cache of the legal moves of the board, which may be shared with other boards.
+                Default is None (the move_cache class attribute is used).
         """
         #Initialisation of the attributes
+        if move_cache != None:
+            self.move_cache = move_cache
         self.turn = 'White'
         self.count = 1
         self.squares = {}
@@ -110,6 +242,7 @@ class Chessboard:
         self.small_castle_white = True
         self.small_castle_black = True
         self.previous = None
+        self.history = []
 
         #Instantiation of the pieces
         piece_order = ['R','N','B','Q','K','B','N','R']
@@ -136,6 +269,20 @@ class Chessboard:
                 self.squares[Chessboard.rows[row]+str(line)] = sq #Storing the square in the squares attribute 
                                                                     # of the chessboard
 
+        self.refresh_state() #Initialisation of the incrementally maintained attributes
+
+        if fen != None:
+            self.decode_fen(fen)
+
+    def __getstate__(self):
+        """
+        Called by pickle and copy.deepcopy. The cache of the legal moves is shared, not part of the position :
+        the copies use the move_cache class attribute.
+        """
+        state = self.__dict__.copy()
+        state.pop('move_cache', None)
+        return state
+
     def __str__(self):
         """
         Called by the str() built-in function and by the print statement to compute the “informal” string representation 
@@ -179,49 +326,25 @@ class Chessboard:
         """
         try:
             if self.is_valid(origin,destination):
-                
-                # Checking moves preventing future castling
-                if self.turn == 'White' and (origin == 'a1' or origin == 'e1'):
-                    self.big_castle_white = False
-                if self.turn == 'White' and (origin == 'h1' or origin == 'e1'):
-                    self.small_castle_white = False
-                if self.turn == 'Black' and (origin == 'a8' or origin == 'e8'):
-                    self.big_castle_black = False
-                if self.turn == 'Black' and (origin == 'h8' or origin == 'e8'):
-                    self.small_castle_black = False
-
-                #Changing the turn         
-                self.turn = (self.turn == 'White') * 'Black' + (self.turn == 'Black') * 'White'
-                #Adding 1 to the count if it it now white's turn 
-                self.count = self.count + 1 if self.turn == 'White' else self.count           
-
-                #Copying and removing the piece from origin square 
-                piece = copy.copy(self.squares[origin].piece)
-                self.squares[origin].piece = None
+
+                piece = self.squares[origin].piece
                 #Check and print if a piece is taken (only if quiet argument is True)
                 if self.squares[destination].piece != None and not quiet:
                     print(self.squares[destination].piece.color,' ',self.squares[destination].piece.piece_type,' taken')
 
                 #Particular case of 'prise en passant'
                 if piece.piece_type == 'P' and self.squares[destination].piece == None and (destination[0] != origin[0]):
-                
-                    e_p = destination[0] + '4' if self.turn == 'White' else destination[0] + '5' #square reference for 'prise en passant'
-                    self.squares[e_p].piece = None #Removing the piece
                     if not quiet:
-                        print('Pawn on ',e_p,' taken en passant')
-
-                #Putting the piece on destination square
-                self.squares[destination].piece = piece
+                        print('Pawn on ',destination[0] + origin[1],' taken en passant')
 
                 #Particular case of pawn promotion
                 if piece.piece_type == 'P' and (destination[1] == '1' or destination[1] == '8'):
                     if promote == None:
                         promote = input('promote to ? (Q/R/B/N)') #Ask to user if promotion argument was not passed
-                    self.squares[destination].piece.piece_type = promote
 
-                #Storing the move in 'previous' attribute of the chessboard object                       
-                self.previous = origin+destination
-            
+                #Executing the move : pieces, turn, count, castling rights and 'previous' attribute are updated
+                self.make_move(origin, destination, promote)
+
             else:
                 print('Forbidden move')
 
@@ -241,6 +364,7 @@ class Chessboard:
     def cmove(self, ref, promote=None, quiet=False):
         """
         Moves a piece of the chessboard based on a move reference in algebraic form.
+        The reference is read by parse_move; the reason why it is refused, if any, is printed.
 
         Parameters
         ----------
@@ -255,112 +379,94 @@ class Chessboard:
                 Default is False.
         """
         try:
-            turn = self.turn
-            #Cleaning the move from not needed annotations (like '+' or '!')
-            if not ref[-1] in [*'12345678',*Chesspiece.Type_list,'O']:
-                self.cmove(ref[:-1], quiet = quiet)
-            #Checking if the move contains a promotion information at the end
-            elif ref[-1] in [*Chesspiece.Type_list]:
-                self.cmove(ref[:-2], promote=ref[-1], quiet=quiet)
-            #Checking if the move is a small castling
-            elif ref == 'O-O':
-                self.castle(big=False)
-            #Checking if the move is a big castling
-            elif ref == 'O-O-O':
-                self.castle(big=True)
-            #Checking if the move is a pawn move
-            elif len(ref) == 2:
-                row_dest, line_dest = self.get_coord(ref)
-                line_origin = line_dest - 1 if self.turn == 'White' else line_dest + 1
-                ref_origin = self.get_ref(row_dest, line_origin)
-                if self.squares[ref_origin].piece != None:
-                    if self.squares[ref_origin].piece.piece_type == 'P' and self.squares[ref_origin].piece.color == self.turn:
-                        self.smove(ref_origin, ref, promote=promote, quiet=quiet)
-                else:
-                    line_origin = line_origin - 1 if self.turn == 'White' else line_origin + 1
-                    ref_origin = self.get_ref(row_dest, line_origin)
-                    self.smove(ref_origin, ref, promote=promote, quiet=quiet)
-
-            elif len(ref) == 3:
-                #Checking if the first letter is a piece reference
-                if ref[0].isupper():
-                    piece = ref[0]
-                    dest = ref[1:]
-                    #Gathering all the candidate origin squares containing a similar piece
-                    origins = self.search_piece(self.turn, piece)
-                    for origin in origins:
-                        #For all candidate origin squares, checking if the move would be valid. If yes, executing the move.
-                        if self.is_valid(origin, dest, quiet = True):
-                            self.smove(origin, dest, promote=promote, quiet = quiet)
-                            break
-                    if turn == self.turn: #If True, it means no move was executed during the loop
-                        print('command not understood')
-                elif ref[2]=='+':
-                    self.cmove(ref[0:2],promote=promote,quiet=quiet)
-                else:
-                    print('command not understood')
-
-            elif len(ref)==4:
-                #Length of the move reference can be 4 if:
-                # - There is an annotation as last character
-                # - There is a 'x' in the move to signify a piece taken
-                # - There is an additional row or line reference because two similar pieces can move on the same destination 
-
-                # Checking if there is an annotation as last character
-                if ref[3] == '+':
-                    self.cmove(ref[0:3], promote = promote, quiet = quiet)
-                # Checking if there is an 'x' to signify a piece taken
-                elif ref[1] == 'x' and ref[0].isupper(): #Not a pawn
-                    self.cmove(ref[0] + ref[2:], promote = promote, quiet = quiet)
-                elif ref[1] == 'x' and ref[0].islower(): # Pawn case
-                    dest = ref[2:]
-                    row_dest, line_dest = self.get_coord(dest)
-                    line_origin = line_dest - 1 if self.turn == 'White' else line_dest + 1
-                    row_origin = ref[0]
-                    origin = row_origin + str(line_origin)
-                    self.smove(origin, dest, promote = promote, quiet = quiet)
-                # Checking if there is an additional row reference after the piece reference
-                elif ref[0].isupper() and ref[1] in Chessboard.rows and ref[2:] in self.squares.keys():
-                    piece = ref[0]
-                    dest = ref[2:]
-                    origins = self.search_piece(self.turn, piece)
-                    for origin in origins:
-                        if origin[0] == ref[1] and self.is_valid(origin, dest, quiet = True):
-                            self.smove(origin, dest, promote = promote, quiet = quiet)
-                            break
-                    if turn == self.turn:
-                        print('command not understood')
-                # Last case : there is an additional line reference after the piece reference
-                else :
-                    piece = ref[0]
-                    dest = ref[2:]
-                    origins = self.search_piece(self.turn, piece)
-                    for origin in origins:
-                        if origin[1] == ref[1] and self.is_valid(origin, dest, quiet = True):
-                            self.smove(origin, dest, promote = promote, quiet = quiet)
-                            break
-                    if turn == self.turn:
-                        print('command not understood')
-
-            elif len(ref) == 5:
-                #If length of the move is 5, there is additional cleaning to do :
-                i = ref.find('x') #index ot the potential 'x'
-                if i != -1:
-                    new_ref = ref[:i]+ref[i+1:]
-                else: #no 'x' found'
-                    new_ref = ref 
-                j = new_ref.find('+') #index ot the potential '+'
-                if j!=-1:
-                    new_new_ref = new_ref[:j]+ref[j+1:]
-                else: #no '+' found'
-                    new_new_ref=new_ref
-                self.cmove(new_new_ref, promote=promote, quiet=quiet)
+            move = self.parse_move(ref, promote = promote)
+        except MoveError as error:
+            print(error)
+            return
+        piece = self.squares[move.origin].piece
+        if piece.piece_type == 'K' and move.origin[0] == 'e' and move.destination[0] in 'cg' and move.origin[1] == move.destination[1]:
+            self.castle(big = move.destination[0] == 'c')
+        else:
+            self.smove(move.origin, move.destination, promote = move.promote, quiet = quiet)
 
-            
-            if turn == self.turn: #If no move was executed
-                print('command not understood')
-        except: #If any error during the execution
-            print('command not understood')
+    def parse_move(self, ref, promote = 'Q'):
+        """
+        Returns the Chessmove object of a move reference, for the player whose it is the turn to play.
+        The reference is read in a single pass by a precompiled pattern and matched against the moves of the position.
+        Accepted references are the algebraic notation (e.g. 'e4', 'Nbd7', 'R1xa3', 'exd6', 'e8=Q+', 'O-O' or '0-0-0'),
+        with or without check, mate and annotation suffixes ('+', '#', '!', '?'), and the long algebraic notation
+        (e.g. 'g1f3', 'Ng1-f3' or 'e7e8q').
+        Raises a NotationError if the reference cannot be read, an IllegalMoveError if no legal move matches it, and an
+        AmbiguousMoveError if several legal moves match it.
+
+        Parameters
+        ----------
+            ref : str
+                The reference of the move.
+            promote : str or None
+                The piece_type chosen in case of pawn promotion, when the reference does not give it.
+                If None, the promote attribute of the returned move is None and the piece is chosen when the move is executed.
+                Default is 'Q'.
+        """
+        match = Chessboard.move_pattern.match(ref.strip())
+        if match == None:
+            raise NotationError('command not understood')
+
+        written_promote = None
+        if match.group('castle') != None:
+            line = '1' if self.turn == 'White' else '8'
+            piece_type, origin_row, origin_line = 'K', 'e', line
+            destination = ('c' if match.group('big') != None else 'g') + line
+        else:
+            piece_type, origin_row, origin_line = match.group('piece'), match.group('row'), match.group('line')
+            destination = match.group('destination')
+            if match.group('promote') != None:
+                written_promote = match.group('promote').upper()
+            if piece_type == None:
+                if origin_row == None or origin_line == None: # Pawn move in algebraic notation
+                    piece_type = 'P'
+                    if origin_row == None: # A pawn moving forward stays on its row
+                        origin_row = destination[0]
+                # Else : long algebraic notation, the piece is given by the origin square
+        wanted_promote = written_promote if written_promote != None else promote
+
+        squares = self.squares
+        candidates = []
+        cached = self.move_cache != None # The legal moves are looked up in the cache rather than checked
+        for move in (self.legal_moves() if cached else self.pseudo_moves()):
+            if move.destination != destination or (origin_row != None and move.origin[0] != origin_row) \
+                    or (origin_line != None and move.origin[1] != origin_line):
+                continue
+            if piece_type != None and squares[move.origin].piece.piece_type != piece_type:
+                continue
+            if move.promote == None:
+                if written_promote != None:
+                    continue
+            elif wanted_promote == None: # The 4 promotions are the same move, the piece is chosen later
+                move = Chessmove(move.origin, move.destination)
+                if move in candidates:
+                    continue
+            elif move.promote != wanted_promote:
+                continue
+            candidates.append(move)
+
+        if cached:
+            result = candidates
+        else: # Only the moves matching the reference are checked for legality
+            color = self.turn
+            other_color = Chessboard.opponents[color]
+            result = []
+            for move in candidates:
+                self.make_move(*move)
+                if not self.is_attacked(self.king_squares[color], other_color):
+                    result.append(move)
+                self.unmake_move()
+
+        if not result:
+            raise IllegalMoveError('Forbidden move')
+        if len(result) > 1:
+            raise AmbiguousMoveError('Ambiguous move : ' + ', '.join(str(move) for move in result))
+        return result[0]
 
     def move(self, *args, promote=None, quiet=False):
         """
@@ -383,8 +489,11 @@ class Chessboard:
 
     def cheat_move(self, origin, destination):
         """
-        Executes a move without checking that it is allowed by the rules and without updating the attributes 
-        of the chessboard object.
+        Moves a piece without checking that it is allowed by the rules : the piece of the destination square, if any,
+        is removed, and there is no castling, promotion or "prise en passant". The turn, count, castling rights,
+        previous and history attributes are not updated; the material and piece-square scores, the hash keys and
+        the occupied squares are.
+        Returns the removed piece (or None), so that the move can be undone with undo_cheat_move.
         Parameters
         ----------
             origin : str
@@ -392,9 +501,29 @@ class Chessboard:
             destination : str
                 The reference of the destination square of the move
         """
-        piece=copy.copy(self.squares[origin].piece)
-        self.squares[origin].piece=None
-        self.squares[destination].piece=piece
+        piece = self._take_piece(origin)
+        captured = self._take_piece(destination)
+        if piece != None:
+            self._put_piece(destination, piece)
+        return captured
+
+    def undo_cheat_move(self, origin, destination, captured):
+        """
+        Undoes a move executed with cheat_move.
+        Parameters
+        ----------
+            origin : str
+                The reference of the origin square of the move
+            destination : str
+                The reference of the destination square of the move
+            captured : Chesspiece object or None
+                The piece removed by the move, returned by cheat_move.
+        """
+        piece = self._take_piece(destination)
+        if piece != None:
+            self._put_piece(origin, piece)
+        if captured != None:
+            self._put_piece(destination, captured)
 
     def get_coord(self, ref):
         """
@@ -482,48 +611,11 @@ class Chessboard:
                 True if the castling to be done is on queen side (big-castling)
                 Default = False
         """
-        if self.turn == 'White':
-            if big:
-                if self.is_valid_castle(big = True, quiet = False):
-                    self.cheat_move('a1','d1')
-                    self.cheat_move('e1','c1')
-                    self.turn = 'Black'
-                    self.big_castle_white = False
-                    self.small_castle_white = False
-                    self.previous = 'O-O-O'
-                    return
-            else:
-                if self.is_valid_castle(big = False, quiet = False):
-                    self.cheat_move('h1','f1')
-                    self.cheat_move('e1','g1')
-                    self.turn = 'Black'
-                    self.big_castle_white = False
-                    self.small_castle_white = False
-                    self.previous = 'O-O'
-                    return
+        if self.is_valid_castle(big = big, quiet = False):
+            line = '1' if self.turn == 'White' else '8'
+            destination = 'c' + line if big else 'g' + line
+            self.make_move('e' + line, destination) # The rook is moved with the king by make_move
 
-        if self.turn == 'Black':
-            if big:
-                if self.is_valid_castle(big = True, quiet = False):
-                    self.cheat_move('a8','d8')
-                    self.cheat_move('e8','c8')
-                    self.turn = 'White'
-                    self.count = self.count + 1
-                    self.big_castle_black = False
-                    self.small_castle_black = False
-                    self.previous = 'O-O-O'
-                    return
-            else:
-                if self.is_valid_castle(big = False, quiet = False):
-                    self.cheat_move('h8','f8')
-                    self.cheat_move('e8','g8')
-                    self.turn = 'White'
-                    self.count = self.count + 1
-                    self.big_castle_black = False
-                    self.small_castle_black = False
-                    self.previous = 'O-O'
-                    return             
-            
     def search_piece(self,color,piece):
         """
         Returns a list with the reference(s) of all the square(s) containing a given piece with a given color.
@@ -591,25 +683,28 @@ class Chessboard:
         # Storing the color of the player whose it is not the turn to play
         other_turn = (self.turn == 'White') * 'Black' + (self.turn == 'Black') * 'White'
         
-        # Copying the board in test_board
-        test_board=copy.deepcopy(self)
-        
+        # The move is tested on the chessboard itself and undone just after (copying the board, with its history, is slow)
         # Removing the piece in the particular case of "Prise en passant"
-        (row_origin, line_origin) = test_board.get_coord(origin)
-        (row_dest, line_dest) = test_board.get_coord(destination)
-        if line_origin == 5 and line_dest == 6 and test_board.squares[origin].piece.color == 'White' and row_origin - row_dest in [-1,1]:
-            if test_board.previous == destination[0] + '7' + destination[0] + '5' and test_board.squares[destination[0] + '5'].piece.piece_type == 'P':
-                test_board.squares[destination[0] + '5'].piece = None
-        if line_origin == 4 and line_dest == 3 and test_board.squares[origin].piece.color == 'Black' and row_origin-row_dest in [-1,1]:
-            if test_board.previous == destination[0] + '2' + destination[0] + '4' and test_board.squares[destination[0] + '4'].piece.piece_type == 'P':
-                test_board.squares[destination[0] + '4'].piece = None
-        
-        # moving the piece on the test board
-        test_board.cheat_move(origin,destination)
-
+        (row_origin, line_origin) = self.get_coord(origin)
+        (row_dest, line_dest) = self.get_coord(destination)
+        e_p = None
+        if line_origin == 5 and line_dest == 6 and self.squares[origin].piece.color == 'White' and row_origin - row_dest in [-1,1]:
+            if self.previous == destination[0] + '7' + destination[0] + '5' and self.squares[destination[0] + '5'].piece.piece_type == 'P':
+                e_p = destination[0] + '5'
+        if line_origin == 4 and line_dest == 3 and self.squares[origin].piece.color == 'Black' and row_origin-row_dest in [-1,1]:
+            if self.previous == destination[0] + '2' + destination[0] + '4' and self.squares[destination[0] + '4'].piece.piece_type == 'P':
+                e_p = destination[0] + '4'
+        e_p_pawn = self._take_piece(e_p) if e_p != None else None
+
+        # moving the piece, checking the position and undoing the move
+        captured = self.cheat_move(origin,destination)
+        checked = self.is_checking(other_turn)
+        self.undo_cheat_move(origin, destination, captured)
+        if e_p_pawn != None:
+            self._put_piece(e_p, e_p_pawn)
 
         # Checking that after the move, the player who just moved is not checked by the opponent. If yes, the move is not permitted.
-        if test_board.is_checking(other_turn):
+        if checked:
             if not quiet:
                 print("You can't do this move because you would be in check")
             return False
@@ -743,122 +838,18 @@ class Chessboard:
                 attack_8 = Chessboard.rows[row_index+1]+str(Chessboard.lines[line_index]) # right attack
                 result[attack_8] = None
 
-        # Calculating the attacked squares if the piece is a Rook
-        if square.piece.piece_type=='R':
-
-            # Attacked squares in front of the rook :
-            if row_index < 8:
-                row_index += 1
-                
-                while self.get_piece(row_index, line_index) == None and row_index < 8: # Loop over the free squares in front of the rook
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) 
-                    result[attack] = None # Storing the square in the result
-                    row_index += 1 # Going to the next square
-
-                attack = Chessboard.rows[row_index]+str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-                
-            # Attacked squares behind the rook
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if row_index > 1:
-                row_index -= 1
-
-                while self.get_piece(row_index,line_index) == None and row_index > 1: # Loop over the free squares behind the rook
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the square in the result
-                    row_index-=1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index]+str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-            # Attacked squares on the right of the rook
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if line_index < 8:
-                line_index+=1
-            
-                while self.get_piece(row_index,line_index) == None and line_index <8: # Loop over the free squares right of the rook
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the square in the result
-                    line_index += 1 # Going to the next square
-                    
-                attack=Chessboard.rows[row_index]+str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-            # Attacked squares on the left of the rook
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if line_index > 1:
-                line_index -= 1
-
-                while self.get_piece(row_index,line_index) == None and line_index > 1: # Loop over the free squares right of the rook
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the square in the result
-                    line_index -= 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-        # Calculating the attacked squares if the piece is a Bishop
-        if square.piece.piece_type == 'B':
+        # Calculating the attacked squares if the piece is a Rook, a Bishop or a Queen : looked up in the magic bitboard tables
+        if square.piece.piece_type in ('R', 'B', 'Q'):
+            index = Chessmove.square_index[square.name]
+            if square.piece.piece_type == 'R':
+                attacked = Chessmagic.rook_attacks(index, self.occupied)
+            elif square.piece.piece_type == 'B':
+                attacked = Chessmagic.bishop_attacks(index, self.occupied)
+            else:
+                attacked = Chessmagic.queen_attacks(index, self.occupied)
+            for attack in Chessmagic.refs(attacked): # The squares up to the first piece of each ray, included
+                result[attack] = None
 
-            # Attacked squares on the front-right of the bishop :
-            if row_index < 8 and line_index<8 :
-                row_index += 1
-                line_index += 1
-                
-                while self.get_piece(row_index,line_index) == None and row_index < 8 and line_index<8 : # Loop over the free squares front-right
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the square in the result
-                    row_index += 1
-                    line_index += 1 # Going to the next square
-
-                attack=Chessboard.rows[row_index]+str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result    
-            
-            # Attacked squares behind-right of the bishop :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if row_index > 1 and line_index<8 :
-                row_index -= 1
-                line_index += 1
-                
-                while self.get_piece(row_index,line_index) == None and row_index > 1 and line_index<8: # Loop over the free squares behind-right
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the square in the result
-                    row_index -= 1
-                    line_index += 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-            # Attacked squares in front-left of the bishop :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if row_index < 8 and line_index > 1:
-                row_index += 1
-                line_index -= 1
-            
-                while self.get_piece(row_index,line_index) == None and row_index < 8 and line_index > 1: # Loop over the free squares front-left
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the square in the result
-                    row_index += 1
-                    line_index -= 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-            # Attacked squares behind-left of the bishop :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if row_index > 1 and line_index > 1:
-                row_index -= 1
-                line_index -= 1
-
-                while self.get_piece(row_index,line_index) == None and row_index > 1 and line_index > 1: # Loop over the free squares behind-left
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the square in the result
-                    line_index -= 1
-                    row_index -= 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-        
         # Calculating the attacked squares if the piece is a Knight
         if square.piece.piece_type == 'N':
             if row_index > 1: # Excluding knights on the left edge
@@ -913,126 +904,6 @@ class Chessboard:
                     attack = Chessboard.rows[row_attack] + str(Chessboard.lines[line_attack]) # Attacked square on backward - right
                     result[attack] = None # Storing the attacked square in the result
 
-        # Calculating the attacked squares if the piece is a Queen
-        if square.piece.piece_type == 'Q':
-            
-            # Attacked squares front-right of the queen :
-            if row_index < 8 and line_index < 8 : 
-                row_index += 1
-                line_index += 1
-                
-                while self.get_piece(row_index, line_index) == None and row_index < 8 and line_index < 8 : # Loop over the free squares front-right
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    row_index += 1
-                    line_index += 1 # Going to the next square
-
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-                   
-            # Attacked squares behind-right of the queen :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if row_index > 1 and line_index<8 :
-                row_index -= 1
-                line_index += 1
-                
-                while self.get_piece(row_index, line_index) == None and row_index > 1 and line_index < 8: # Loop over the free squares behind-right
-                    attack=Chessboard.rows[row_index]+str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    row_index -= 1
-                    line_index += 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-            # Attacked squares front-left of the queen :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-
-            if row_index < 8 and line_index > 1:
-                row_index += 1
-                line_index -= 1
-            
-                while self.get_piece(row_index, line_index) == None and row_index < 8 and line_index > 1: # Loop over the free squares front-left
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    row_index += 1
-                    line_index -= 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-            # Attacked squares behind-left of the queen :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-
-            if row_index > 1 and line_index > 1:
-                row_index -= 1
-                line_index -= 1
-
-                while self.get_piece(row_index, line_index) == None and row_index > 1 and line_index > 1: # Loop over the free squares behind-left
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    line_index -= 1
-                    row_index -= 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result
-
-
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-
-            # Attacked squares in front of the queen :
-            if row_index < 8:
-                row_index += 1
-                
-                while self.get_piece(row_index, line_index) == None and row_index < 8: # Loop over the free squares in front
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    row_index += 1 # Going to the next square
-
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result      
-            
-            # Attacked squares behind the queen :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-            if row_index > 1:
-                row_index -= 1
-
-                while self.get_piece(row_index, line_index) == None and row_index > 1: # Loop over the free squares behind
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    row_index -= 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index]+str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result 
-
-            # Attacked squares on the right of the queen :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-
-            if line_index < 8:
-                line_index += 1
-            
-                while self.get_piece(row_index, line_index) == None and line_index < 8: # Loop over the free squares on the right
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    line_index += 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result 
-
-            # Attacked squares on the left of the queen :
-            (row_index , line_index) = self.get_coord(square.name) # Reinitializing row and line indexes
-
-            if line_index > 1:
-                line_index -= 1
-
-                while self.get_piece(row_index, line_index) == None and line_index > 1: # Loop over the free squares on the left
-                    attack = Chessboard.rows[row_index] + str(Chessboard.lines[line_index])
-                    result[attack] = None # Storing the attacked square
-                    line_index -= 1 # Going to the next square
-                    
-                attack = Chessboard.rows[row_index]+str(Chessboard.lines[line_index]) # 1st square encountered with a piece on it
-                result[attack] = None # Storing also this square in the result 
-
         # Removing the squares with pieces from the color which attacks
         erase_keys = {}
         for key in result.keys():
@@ -1067,12 +938,18 @@ class Chessboard:
     def possible_moves(self,color):
         """
         Returns a list with all the possible moves references of a given color.
+        If the move_cache attribute is set, the moves are looked up in the cache first.
         Parameters
         ----------
             color : String
                 The attacking color for which to get the possible moves.
 
         """
+        cache = self.move_cache
+        if cache != None: # Cached by position key and color, apart from the legal moves cached by position key only
+            result = cache.get((self.key, color))
+            if result != None:
+                return list(result)
         result = [] # Initializing the result list
         for origin, square_origin in self.squares.items(): # Loop over all the square references of the chessboard object (tentative origin)
             if square_origin.piece != None: # Excluding free squares
@@ -1093,7 +970,9 @@ class Chessboard:
 
         if self.is_valid_castle(big=True, quiet = True):
             result.append('O-O-O') # Adding the big castling move reference, if valid
-            
+
+        if cache != None:
+            cache.put((self.key, color), tuple(result))
         return result
                
     def is_checking(self,color):
@@ -1130,9 +1009,10 @@ class Chessboard:
                     for ref_test, square_test in self.squares.items(): # Loop over all squares of the chessboard object 
                                                                         # (possible destination squares of a move)
                         if self.is_valid(ref, ref_test, quiet=True, turn=False): # Excluding unvalid moves
-                            test_board = copy.deepcopy(self) # Storing a copy of the chessboard object
-                            test_board.cheat_move(ref, ref_test) # Moving the piece from origin to destination
-                            if not test_board.is_checking(color): # Checking if the attacking color is still 'checking' after the move 
+                            captured = self.cheat_move(ref, ref_test) # Moving the piece from origin to destination
+                            checking = self.is_checking(color)
+                            self.undo_cheat_move(ref, ref_test, captured) # Putting the pieces back
+                            if not checking: # Checking if the attacking color is still 'checking' after the move 
                                 return False # If not, then the attacking color is not mating
         return True # If no move is found to avoid the attacking color to "check", then it's a "mat"
             
@@ -1153,9 +1033,10 @@ class Chessboard:
                     for ref_test, square_test in self.squares.items(): # Loop over all squares of the chessboard object 
                                                                         # (possible destination squares of a move)
                         if self.is_valid(ref, ref_test, quiet=True, turn=False): # Excluding unvalid moves
-                            test_board = copy.deepcopy(self) # Storing a copy of the chessboard object
-                            test_board.cheat_move(ref, ref_test) # Moving the piece from origin to destination
-                            if not test_board.is_checking(color): # Checking if the attacking color is 'checking' after the move 
+                            captured = self.cheat_move(ref, ref_test) # Moving the piece from origin to destination
+                            checking = self.is_checking(color)
+                            self.undo_cheat_move(ref, ref_test, captured) # Putting the pieces back
+                            if not checking: # Checking if the attacking color is 'checking' after the move 
                                 return False # If not, then there is no pat
         return True # If whatever the move, the opponent is "checked", then there is a "pat"
 
@@ -1230,4 +1111,452 @@ class Chessboard:
 
         return fen
 
+    def decode_fen(self, fen):
+        """
+        Sets the chessboard to the position given in Forsyth–Edwards Notation (FEN) and clears the history of the moves.
+        For more information on FEN : https://en.wikipedia.org/wiki/Forsyth%E2%80%93Edwards_Notation
+        Parameters
+        ----------
+            fen : str
+                The Forsyth–Edwards Notation (FEN) of the position. The fields after the position of the pieces are optional.
+        """
+        fields = fen.split()
+
+        # 1/ Decoding the position of the pieces
+        for square in self.squares.values():
+            square.piece = None
+        line = 8
+        row = 1
+        for char in fields[0]:
+            if char == '/': # Going to the next line
+                line -= 1
+                row = 1
+            elif char.isdigit(): # Skipping free squares
+                row += int(char)
+            else:
+                color = 'White' if char.isupper() else 'Black'
+                self.squares[Chessboard.rows[row] + str(line)].piece = Chesspiece(char.upper(), color)
+                row += 1
+
+        # 2/ Decoding the turn
+        self.turn = 'Black' if len(fields) > 1 and fields[1] == 'b' else 'White'
+
+        # 3/ Decoding the castling status
+        castling = fields[2] if len(fields) > 2 else '-'
+        self.small_castle_white = 'K' in castling
+        self.big_castle_white = 'Q' in castling
+        self.small_castle_black = 'k' in castling
+        self.big_castle_black = 'q' in castling
+
+        # 4/ Decoding the En-passant target square, stored as the pawn move that allows it
+        e_p = fields[3] if len(fields) > 3 else '-'
+        if e_p != '-' and e_p[1] == '3':
+            self.previous = e_p[0] + '2' + e_p[0] + '4'
+        elif e_p != '-' and e_p[1] == '6':
+            self.previous = e_p[0] + '7' + e_p[0] + '5'
+        else:
+            self.previous = None
+
+        # 5/ The "Half_move clock" information is not used. 6/ Decoding the Fullmove number information
+        self.count = int(fields[5]) if len(fields) > 5 else 1
+
+        self.history = []
+        self.refresh_state()
+
+    def refresh_state(self):
+        """
+        Recomputes from scratch the attributes of the chessboard that are otherwise maintained incrementally
+        by make_move and unmake_move : mg_score, eg_score, phase, king_squares, key, pawn_key and occupied.
+        Must be called if the squares or the attributes of the chessboard are modified directly.
+        """
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        self.key = 0
+        self.pawn_key = 0
+        self.occupied = 0
+        self.king_squares = {}
+        for ref, square in self.squares.items():
+            if square.piece != None:
+                self._put_piece(ref, square.piece)
+        self.key ^= self._state_key()
+
+    def _state_key(self):
+        """
+        Returns the part of the Zobrist hash of the position which does not depend on the pieces :
+        turn, castling rights and en passant file.
+        """
+        key = Chessboard.zobrist_castles[(self.big_castle_white, self.small_castle_white, self.big_castle_black, self.small_castle_black)]
+        if self.turn == 'Black':
+            key ^= Chessboard.zobrist_turn
+        e_p = self.en_passant_square()
+        if e_p != None:
+            key ^= Chessboard.zobrist_en_passant[e_p[0]]
+        return key
+
+    def _put_piece(self, ref, piece):
+        """
+        Puts a piece on a square and updates incrementally the material and piece-square scores, the hash keys and
+        the occupied squares.
+        """
+        self.squares[ref].piece = piece
+        self.occupied |= Chessmagic.square_bits[ref]
+        mg, eg = Chesseval.psq[piece.color][piece.piece_type][ref]
+        self.mg_score += mg
+        self.eg_score += eg
+        self.phase += Chesseval.phase_weights[piece.piece_type]
+        self.key ^= Chessboard.zobrist_pieces[piece.color][piece.piece_type][ref]
+        if piece.piece_type == 'K':
+            self.king_squares[piece.color] = ref
+        elif piece.piece_type == 'P':
+            self.pawn_key ^= Chessboard.zobrist_pieces[piece.color]['P'][ref]
+
+    def _take_piece(self, ref):
+        """
+        Removes the piece of a square, updates incrementally the material and piece-square scores, the hash keys and
+        the occupied squares, and returns the piece.
+        """
+        piece = self.squares[ref].piece
+        if piece != None:
+            self.squares[ref].piece = None
+            self.occupied &= ~Chessmagic.square_bits[ref]
+            mg, eg = Chesseval.psq[piece.color][piece.piece_type][ref]
+            self.mg_score -= mg
+            self.eg_score -= eg
+            self.phase -= Chesseval.phase_weights[piece.piece_type]
+            self.key ^= Chessboard.zobrist_pieces[piece.color][piece.piece_type][ref]
+            if piece.piece_type == 'P':
+                self.pawn_key ^= Chessboard.zobrist_pieces[piece.color]['P'][ref]
+        return piece
+
+    def make_move(self, origin, destination, promote = None):
+        """
+        Executes a move without checking that it is allowed by the rules, and stores in the history attribute
+        what is needed to undo it with unmake_move.
+        All the attributes of the chessboard object are updated (turn, count, castling, previous), and the material
+        and piece-square scores are updated incrementally.
+        A castling is executed by moving the king of 2 squares (e.g. from 'e1' to 'g1'), the rook is moved accordingly.
+        A "prise en passant" is detected when a pawn moves in diagonal on an empty square.
+
+        Parameters
+        ----------
+            origin : str
+                The reference of the origin square of the move
+            destination : str
+                The reference of the destination square of the move
+            promote : str or None
+                The chosen piece in case of pawn promotion. If None, the pawn is promoted to a queen.
+                Default is None
+        """
+        squares = self.squares
+        piece = squares[origin].piece
+
+        captured_ref = destination
+        if piece.piece_type == 'P' and origin[0] != destination[0] and squares[destination].piece == None:
+            captured_ref = destination[0] + origin[1] # Particular case of 'prise en passant'
+
+        rook_move = None
+        previous = origin + destination
+        if piece.piece_type == 'K' and origin[0] == 'e' and destination[0] in 'cg' and origin[1] == destination[1] \
+                and origin[1] in '18': # Particular case of castling : the rook is also moved
+            line = origin[1]
+            rook_move = ('h' + line, 'f' + line) if destination[0] == 'g' else ('a' + line, 'd' + line)
+            previous = 'O-O' if destination[0] == 'g' else 'O-O-O'
+
+        self.history.append((origin, destination, piece, squares[captured_ref].piece, captured_ref, rook_move,
+                             (self.big_castle_white, self.small_castle_white, self.big_castle_black, self.small_castle_black),
+                             self.previous, self.count, self.turn, self.mg_score, self.eg_score, self.phase, self.pawn_key,
+                             self.occupied, self.key))
+
+        self.key ^= self._state_key() # Removing the turn, castling and en passant keys of the previous state
+        self._take_piece(origin)
+        self._take_piece(captured_ref)
+        if rook_move != None:
+            self._put_piece(rook_move[1], self._take_piece(rook_move[0]))
+
+        if piece.piece_type == 'P' and (destination[1] == '1' or destination[1] == '8'): # Particular case of pawn promotion
+            piece = Chesspiece(promote if promote != None else 'Q', piece.color)
+        self._put_piece(destination, piece)
+
+        # Checking moves preventing future castling (a move from or to the initial squares of the king and rooks)
+        if origin in ('a1', 'e1') or destination == 'a1':
+            self.big_castle_white = False
+        if origin in ('h1', 'e1') or destination == 'h1':
+            self.small_castle_white = False
+        if origin in ('a8', 'e8') or destination == 'a8':
+            self.big_castle_black = False
+        if origin in ('h8', 'e8') or destination == 'h8':
+            self.small_castle_black = False
+
+        self.previous = previous
+        self.turn = Chessboard.opponents[self.turn]
+        if self.turn == 'White':
+            self.count += 1
+        self.key ^= self._state_key() # Adding the turn, castling and en passant keys of the new state
+
+    def unmake_move(self):
+        """
+        Undoes the last move executed with make_move, restoring all the attributes of the chessboard object.
+        """
+        (origin, destination, piece, captured, captured_ref, rook_move, castles,
+         self.previous, self.count, self.turn, self.mg_score, self.eg_score, self.phase, self.pawn_key, self.occupied,
+         self.key) = self.history.pop()
+        (self.big_castle_white, self.small_castle_white, self.big_castle_black, self.small_castle_black) = castles
+
+        squares = self.squares
+        squares[destination].piece = None
+        squares[origin].piece = piece
+        if captured != None:
+            squares[captured_ref].piece = captured
+        if rook_move != None:
+            squares[rook_move[0]].piece = squares[rook_move[1]].piece
+            squares[rook_move[1]].piece = None
+        if piece.piece_type == 'K':
+            self.king_squares[piece.color] = origin
+
+    def is_attacked(self, ref, color):
+        """
+        Returns True if a square is attacked by at least one piece of a given color.
+        Parameters
+        ----------
+            ref : str
+                The reference of the square to be checked.
+            color : str
+                The attacking color.
+
+        """
+        squares = self.squares
+        for origin in Chessboard.pawn_attacks[Chessboard.opponents[color]][ref]: # Squares from which a pawn attacks ref
+            piece = squares[origin].piece
+            if piece != None and piece.piece_type == 'P' and piece.color == color:
+                return True
+        for origin in Chessboard.knight_targets[ref]:
+            piece = squares[origin].piece
+            if piece != None and piece.piece_type == 'N' and piece.color == color:
+                return True
+        for origin in Chessboard.king_targets[ref]:
+            piece = squares[origin].piece
+            if piece != None and piece.piece_type == 'K' and piece.color == color:
+                return True
+        # Sliding pieces : the first piece of each ray, from the magic bitboard tables (inlined, as this is the hottest path)
+        occupied = self.occupied
+        index = Chessmove.square_index[ref]
+        magic = Chessmagic
+        ref_lists = magic.ref_lists
+        blockers = magic.rook_table[magic.rook_offsets[index] + (
+            ((occupied & magic.rook_masks[index]) * magic.rook_magics[index] & 0xFFFFFFFFFFFFFFFF) >> magic.rook_shifts[index])] & occupied
+        for origin in ref_lists.get(blockers) or magic.refs(blockers):
+            piece = squares[origin].piece
+            if piece.color == color and (piece.piece_type == 'R' or piece.piece_type == 'Q'):
+                return True
+        blockers = magic.bishop_table[magic.bishop_offsets[index] + (
+            ((occupied & magic.bishop_masks[index]) * magic.bishop_magics[index] & 0xFFFFFFFFFFFFFFFF) >> magic.bishop_shifts[index])] & occupied
+        for origin in ref_lists.get(blockers) or magic.refs(blockers):
+            piece = squares[origin].piece
+            if piece.color == color and (piece.piece_type == 'B' or piece.piece_type == 'Q'):
+                return True
+        return False
+
+    def en_passant_square(self):
+        """
+        Returns the reference of the square on which a "prise en passant" is possible, or None.
+        """
+        previous = self.previous
+        if previous != None and len(previous) == 4 and previous[0] == previous[2] and \
+                ((previous[1] == '2' and previous[3] == '4') or (previous[1] == '7' and previous[3] == '5')):
+            piece = self.squares[previous[2:]].piece
+            if piece != None and piece.piece_type == 'P':
+                return previous[0] + ('3' if previous[1] == '2' else '6')
+        return None
+
+    def pseudo_moves(self, color = None):
+        """
+        Returns a list with all the moves of a given color as Chessmove objects, without checking if the moves
+        leave the king in check. Castling moves are fully checked.
+        Parameters
+        ----------
+            color : str or None
+                The color for which to get the moves. If None, the color whose it is the turn to play is used.
+                Default is None.
+
+        """
+        if color == None:
+            color = self.turn
+        squares = self.squares
+        forward = 1 if color == 'White' else -1
+        last_line = '8' if color == 'White' else '1'
+        start_line = '2' if color == 'White' else '7'
+        e_p = self.en_passant_square()
+        result = []
 
+        for origin, square in squares.items():
+            piece = square.piece
+            if piece == None or piece.color != color:
+                continue
+            piece_type = piece.piece_type
+
+            if piece_type == 'P':
+                targets = []
+                one = origin[0] + str(int(origin[1]) + forward)
+                if squares[one].piece == None: # Pawn forward moves
+                    targets.append(one)
+                    if origin[1] == start_line:
+                        two = origin[0] + str(int(origin[1]) + 2 * forward)
+                        if squares[two].piece == None:
+                            targets.append(two)
+                for destination in Chessboard.pawn_attacks[color][origin]: # Pawn captures
+                    target = squares[destination].piece
+                    if (target != None and target.color != color) or destination == e_p:
+                        targets.append(destination)
+                for destination in targets:
+                    if destination[1] == last_line:
+                        for promote in ('Q', 'R', 'B', 'N'):
+                            result.append(Chessmove(origin, destination, promote))
+                    else:
+                        result.append(Chessmove(origin, destination))
+
+            elif piece_type == 'N' or piece_type == 'K':
+                targets = Chessboard.knight_targets[origin] if piece_type == 'N' else Chessboard.king_targets[origin]
+                for destination in targets:
+                    target = squares[destination].piece
+                    if target == None or target.color != color:
+                        result.append(Chessmove(origin, destination))
+
+            else: # Sliding pieces : their attacks are looked up in the magic bitboard tables
+                index = Chessmove.square_index[origin]
+                if piece_type == 'R':
+                    attacked = Chessmagic.rook_attacks(index, self.occupied)
+                elif piece_type == 'B':
+                    attacked = Chessmagic.bishop_attacks(index, self.occupied)
+                else:
+                    attacked = Chessmagic.queen_attacks(index, self.occupied)
+                for destination in Chessmagic.refs(attacked):
+                    target = squares[destination].piece
+                    if target == None or target.color != color:
+                        result.append(Chessmove(origin, destination))
+
+        # Castling moves : rights, rook in place, free squares and king not passing through an attacked square
+        line = '1' if color == 'White' else '8'
+        other_color = Chessboard.opponents[color]
+        small = self.small_castle_white if color == 'White' else self.small_castle_black
+        big = self.big_castle_white if color == 'White' else self.big_castle_black
+        king = squares['e' + line].piece
+        if (small or big) and king != None and king.piece_type == 'K' and king.color == color:
+            for allowed, rook_ref, free, safe, destination in ((small, 'h', 'fg', 'ef', 'g'), (big, 'a', 'bcd', 'ed', 'c')):
+                rook = squares[rook_ref + line].piece
+                if allowed and rook != None and rook.piece_type == 'R' and rook.color == color \
+                        and all(squares[row + line].piece == None for row in free) \
+                        and not any(self.is_attacked(row + line, other_color) for row in safe):
+                    result.append(Chessmove('e' + line, destination + line))
+
+        return result
+
+    def legal_moves(self, color = None):
+        """
+        Returns a list with all the legal moves of a given color as Chessmove objects.
+        Each candidate move is made and unmade on the chessboard to check that it does not leave the king in check.
+        If the move_cache attribute is set, the moves of the player to move are looked up in the cache first.
+        Parameters
+        ----------
+            color : str or None
+                The color for which to get the moves. If None, the color whose it is the turn to play is used.
+                Default is None.
+
+        """
+        if color == None:
+            color = self.turn
+        cache = self.move_cache
+        if cache != None and color == self.turn: # The position key does not say which player the moves are asked for
+            moves = cache.get(self.key)
+            if moves != None:
+                return list(moves)
+        other_color = Chessboard.opponents[color]
+        result = []
+        for move in self.pseudo_moves(color):
+            self.make_move(*move)
+            if not self.is_attacked(self.king_squares[color], other_color):
+                result.append(move)
+            self.unmake_move()
+        if cache != None and color == self.turn:
+            cache.put(self.key, tuple(result)) # Stored as a tuple, so that the callers cannot modify the cached moves
+        return result
+
+    def to_san(self, move, legal = None):
+        """
+        Returns the reference of a legal move of the player whose it is the turn to play, in standard algebraic notation
+        (e.g. 'Nbd7', 'exd6', 'e8=Q+', 'O-O' or 'Qh4#'), as written in pgn files.
+        The origin square is only given when needed to distinguish the move from another legal move (row first,
+        then line, then both). The check and mate suffixes are computed with a single make / unmake of the move.
+
+        Parameters
+        ----------
+            move : Chessmove object
+                The move, as returned by legal_moves.
+            legal : list of Chessmove objects or None
+                The legal moves of the position, if already computed. If None, they are computed.
+                Default is None.
+        """
+        if legal == None:
+            legal = self.legal_moves()
+        squares = self.squares
+        origin, destination = move.origin, move.destination
+        piece_type = squares[origin].piece.piece_type
+
+        if piece_type == 'K' and origin[0] == 'e' and destination[0] in 'cg' and origin[1] == destination[1] and origin[1] in '18':
+            ref = 'O-O' if destination[0] == 'g' else 'O-O-O'
+        elif piece_type == 'P':
+            ref = destination
+            if origin[0] != destination[0]: # Capture, including "prise en passant"
+                ref = origin[0] + 'x' + destination
+            if move.promote != None:
+                ref += '=' + move.promote
+        else:
+            others = [other.origin for other in legal if other.destination == destination and other.origin != origin
+                      and squares[other.origin].piece.piece_type == piece_type]
+            if not others:
+                prefix = ''
+            elif all(other[0] != origin[0] for other in others):
+                prefix = origin[0]
+            elif all(other[1] != origin[1] for other in others):
+                prefix = origin[1]
+            else:
+                prefix = origin
+            ref = piece_type + prefix + ('x' if squares[destination].piece != None else '') + destination
+
+        color = self.turn
+        other_color = Chessboard.opponents[color]
+        self.make_move(*move)
+        if self.is_attacked(self.king_squares[other_color], color):
+            ref += '+' if self.has_legal_move() else '#'
+        self.unmake_move()
+        return ref
+
+    def legal_moves_san(self):
+        """
+        Returns a dictionnary with the references in standard algebraic notation of all the legal moves
+        of the player whose it is the turn to play as keys, and the Chessmove objects as values.
+        The legal moves are generated once and shared by the disambiguation of all the moves.
+        """
+        legal = self.legal_moves()
+        return {self.to_san(move, legal = legal): move for move in legal}
+
+    def has_legal_move(self, color = None):
+        """
+        Returns True if a given player has at least one legal move. The search stops at the first legal move found.
+        Parameters
+        ----------
+            color : str or None
+                The color of the player. If None, the color whose it is the turn to play is used.
+                Default is None.
+
+        """
+        if color == None:
+            color = self.turn
+        other_color = Chessboard.opponents[color]
+        for move in self.pseudo_moves(color):
+            self.make_move(*move)
+            legal = not self.is_attacked(self.king_squares[color], other_color)
+            self.unmake_move()
+            if legal:
+                return True
+        return False
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+import threading
+
+class Chesscache:
+    """
+    A class to represent a bounded cache with a least recently used eviction policy and hit-rate counters.
+
+    ...
+
+    A cache shared between threads is created with shared = True : its entries are then read and written under a lock.
+    The other caches (e.g. the pawn structure cache of an evaluator) do not pay for the lock.
+
+    Attributes
+    ----------
+    size : int
+        The maximum number of entries kept in the cache.
+    hits : int
+        The number of lookups that found their key in the cache.
+    misses : int
+        The number of lookups that did not find their key in the cache.
+
+    Methods
+    -------
+    get(self, key, default = None):
+        Returns the value stored for a key, or default, and updates the hit-rate counters.
+
+    put(self, key, value):
+        Stores a value for a key, evicting the least recently used entry if the cache is full.
+
+    hit_rate(self):
+        Returns the ratio of lookups that found their key in the cache.
+
+    clear(self):
+        Removes all the entries of the cache and resets the counters.
+    """
+
+    def __init__(self, size = 16384, shared = False):
+        """
+        Instantiate a Chesscache object.
+
+        Parameters
+        ----------
+            size : int
+                The maximum number of entries kept in the cache.
+                Default is 16384.
+            shared : bool
+                If True, the cache can be shared between threads : its entries are read and written under a lock.
+                Default is False.
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock() if shared else None
+
+    def __getstate__(self):
+        """
+        Called by pickle. The lock cannot be pickled : it is recreated by __setstate__.
+        """
+        state = self.__dict__.copy()
+        state['lock'] = self.lock != None
+        return state
+
+    def __setstate__(self, state):
+        """
+        Called by pickle to restore the Chesscache object, with a new lock.
+        """
+        self.__dict__.update(state)
+        self.lock = threading.Lock() if state['lock'] else None
+
+    def __len__(self):
+        """
+        Called by the len() built-in function. Returns the number of entries in the cache.
+        """
+        return len(self.entries)
+
+    def __str__(self):
+        """
+        Called by the str() built-in function and by the print statement to compute the “informal” string representation
+        of the Chesscache object.
+        """
+        return 'cache %d/%d entries, %d hits, %d misses, hit rate %.1f%%' % (len(self.entries), self.size, self.hits,
+                                                                             self.misses, 100 * self.hit_rate())
+
+    def get(self, key, default = None):
+        """
+        Returns the value stored for a key, or default if the key is not in the cache.
+        The key becomes the most recently used one.
+
+        Parameters
+        ----------
+            key : hashable
+                The key to look up.
+            default : any
+                The value returned if the key is not in the cache.
+                Default is None.
+        """
+        if self.lock != None:
+            with self.lock:
+                return self._get(key, default)
+        return self._get(key, default)
+
+    def _get(self, key, default):
+        """
+        Returns the value stored for a key, or default, without the lock.
+        """
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a value for a key. If the cache is full, the least recently used entry is removed.
+
+        Parameters
+        ----------
+            key : hashable
+                The key of the entry.
+            value : any
+                The value of the entry.
+        """
+        if self.lock != None:
+            with self.lock:
+                self._put(key, value)
+        else:
+            self._put(key, value)
+
+    def _put(self, key, value):
+        """
+        Stores a value for a key without the lock.
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last = False)
+
+    def hit_rate(self):
+        """
+        Returns the ratio (between 0 and 1) of lookups that found their key in the cache.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """
+        Removes all the entries of the cache and resets the hit-rate counters.
+        """
+        if self.lock != None:
+            with self.lock:
+                self.entries.clear()
+        else:
+            self.entries.clear()
+        self.hits = 0
+        self.misses = 0
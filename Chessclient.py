@@ -0,0 +1,272 @@
+from Chessboard import *
+from urllib.parse import urlsplit
+import asyncio
+import random
+import ssl
+import time
+
+class Chessclient:
+    """
+    A class to ask the best move of a position to a remote engine over HTTP, with asyncio.
+    It is the asynchronous counterpart of the get_move_from_api function of playgame.py : many concurrent games can
+    share one client without blocking each other.
+
+    ...
+
+    The client keeps a pool of persistent (keep-alive) connections, applies a timeout to each request, retries failed
+    requests with an exponential backoff, and can send a hedged duplicate request when the first one is slow.
+
+    Attributes
+    ----------
+    url : str
+        The url of the remote engine. The FEN of the position is sent as body of a POST request,
+        and the move is read from the body of the response.
+    pool_size : int
+        The maximum number of connections opened at the same time.
+    timeout : float
+        The maximum time in seconds of one request.
+    retries : int
+        The number of additional attempts after a failed request.
+    backoff : float
+        The waiting time in seconds before the first retry, doubled at each retry.
+    hedge_after : float or None
+        If given, the time in seconds after which a duplicate request is sent if the first one did not answer.
+        The first answer received is used.
+    stats : dict of str: int
+        Counters of the requests, retries, hedged requests, errors and connections opened.
+
+    Methods
+    -------
+    get_move(self, fen):
+        Coroutine returning the best move of a position, in long algebraic notation.
+
+    close(self):
+        Coroutine closing all the connections of the pool.
+
+    serve_stub(host = '127.0.0.1', port = 0, delay = 0):
+        Coroutine starting a local stub server answering random legal moves, to test the client without the remote engine.
+    """
+
+    def __init__(self, url = 'https://chess.apurn.com/nextmove', pool_size = 4, timeout = 5, retries = 2, backoff = 0.2,
+                 hedge_after = None):
+        """
+        Instantiate a Chessclient object. No connection is opened before the first request.
+
+        Parameters
+        ----------
+            url : str
+                The url of the remote engine.
+                Default is 'https://chess.apurn.com/nextmove'.
+            pool_size : int
+                The maximum number of connections opened at the same time.
+                Default is 4.
+            timeout : float
+                The maximum time in seconds of one request.
+                Default is 5.
+            retries : int
+                The number of additional attempts after a failed request.
+                Default is 2.
+            backoff : float
+                The waiting time in seconds before the first retry, doubled at each retry.
+                Default is 0.2.
+            hedge_after : float or None
+                If given, the time in seconds after which a duplicate request is sent if the first one did not answer.
+                It must be shorter than timeout (a ValueError is raised otherwise).
+                Default is None.
+        """
+        if hedge_after != None and not 0 <= hedge_after < timeout:
+            raise ValueError('hedge_after must be between 0 and timeout, got %s' % hedge_after)
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.secure = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.secure else 80)
+        self.path = parts.path or '/'
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.stats = {'requests': 0, 'retries': 0, 'hedged': 0, 'errors': 0, 'connections': 0}
+        self.idle = [] # Idle connections, as (reader, writer) tuples
+        self.slots = None # Semaphore limiting the number of connections, created in the running event loop
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _connection(self):
+        """
+        Returns an idle connection of the pool, or opens a new one.
+        """
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        self.stats['connections'] += 1
+        context = ssl.create_default_context() if self.secure else None
+        return await asyncio.open_connection(self.host, self.port, ssl = context)
+
+    async def _request(self, fen):
+        """
+        Sends one POST request on a connection of the pool and returns the body of the response.
+        The connection is given back to the pool only if the request completed.
+        """
+        if self.slots == None:
+            self.slots = asyncio.Semaphore(self.pool_size)
+        async with self.slots:
+            reader, writer = await self._connection()
+            completed = False
+            try:
+                body = fen.encode()
+                writer.write(('POST %s HTTP/1.1\r\nHost: %s\r\nContent-Type: text/plain\r\nContent-Length: %d\r\n'
+                              'Connection: keep-alive\r\n\r\n' % (self.path, self.host, len(body))).encode() + body)
+                await writer.drain()
+
+                status = (await reader.readline()).decode().split()
+                if len(status) < 2:
+                    raise ConnectionError('connection closed by the server')
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                if headers.get('transfer-encoding', '').lower() == 'chunked':
+                    content = b''
+                    while True:
+                        length = int((await reader.readline()).strip().split(b';')[0], 16)
+                        if length == 0:
+                            await reader.readline()
+                            break
+                        content += await reader.readexactly(length)
+                        await reader.readline()
+                else:
+                    content = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                if not status[1].startswith('2'):
+                    raise ConnectionError('HTTP error ' + status[1])
+                completed = headers.get('connection', '').lower() != 'close'
+                return content.decode().strip()
+            finally:
+                if completed:
+                    self.idle.append((reader, writer))
+                else: # The connection state is unknown (error, timeout or cancellation) : it is not reused
+                    writer.close()
+
+    async def _hedged_request(self, fen):
+        """
+        Sends a request, and a duplicate one if the first did not answer after hedge_after seconds.
+        Returns the first answer received and cancels the other request.
+        """
+        first = asyncio.ensure_future(self._request(fen))
+        if self.hedge_after == None:
+            return await asyncio.wait_for(first, self.timeout)
+        tasks = [first]
+        try:
+            done, pending = await asyncio.wait(tasks, timeout = self.hedge_after)
+            if not done:
+                self.stats['hedged'] += 1
+                tasks.append(asyncio.ensure_future(self._request(fen)))
+            deadline = time.monotonic() + self.timeout - self.hedge_after
+            while tasks:
+                done, pending = await asyncio.wait(tasks, timeout = max(deadline - time.monotonic(), 0),
+                                                   return_when = asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() == None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_move(self, fen):
+        """
+        Coroutine returning the best move of a position in long algebraic notation (e.g. 'e2e4'), as answered by
+        the remote engine. Failed requests are retried with an exponential backoff; the last error is raised if all
+        the attempts failed.
+
+        Parameters
+        ----------
+            fen : str
+                The Forsyth–Edwards Notation (FEN) of the position.
+        """
+        self.stats['requests'] += 1
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._hedged_request(fen)
+            except (OSError, EOFError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as error:
+                self.stats['errors'] += 1
+                if attempt == self.retries:
+                    raise
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def close(self):
+        """
+        Coroutine closing all the idle connections of the pool.
+        """
+        while self.idle:
+            reader, writer = self.idle.pop()
+            writer.close()
+
+    @staticmethod
+    async def serve_stub(host = '127.0.0.1', port = 0, delay = 0, fail_rate = 0):
+        """
+        Coroutine starting a local HTTP stub of the remote engine and returning the asyncio server.
+        The stub answers each POST request with a random legal move of the position sent, with keep-alive connections.
+        The url of the stub is 'http://<host>:<port>/' where port is server.sockets[0].getsockname()[1].
+
+        Parameters
+        ----------
+            host : str
+                The address on which the stub listens.
+                Default is '127.0.0.1'.
+            port : int
+                The port on which the stub listens. If 0, a free port is chosen.
+                Default is 0.
+            delay : float
+                The time in seconds the stub waits before answering, to simulate a slow engine.
+                Default is 0.
+            fail_rate : float
+                The ratio of requests answered with an HTTP 500 error, to simulate an unreliable engine.
+                Default is 0.
+        """
+        async def handle(reader, writer):
+            try:
+                while True:
+                    request = await reader.readline()
+                    if not request:
+                        break
+                    length = 0
+                    while True:
+                        line = (await reader.readline()).decode().strip()
+                        if not line:
+                            break
+                        if line.lower().startswith('content-length:'):
+                            length = int(line.split(':')[1])
+                    fen = (await reader.readexactly(length)).decode()
+                    await asyncio.sleep(delay)
+                    if random.random() < fail_rate:
+                        status, body = '500 Internal Server Error', b''
+                    else:
+                        moves = Chessboard(fen = fen).legal_moves()
+                        status, body = '200 OK', (str(random.choice(moves)) if moves else '').encode()
+                    writer.write(('HTTP/1.1 %s\r\nContent-Length: %d\r\nConnection: keep-alive\r\n\r\n'
+                                  % (status, len(body))).encode() + body)
+                    await writer.drain()
+            except (ConnectionError, asyncio.IncompleteReadError): # Closed by the client
+                pass
+            finally: # Also when the stub is closed : the cancellation goes on once the connection is closed
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,146 @@
+import time
+
+class Chessclock:
+    """
+    A class to represent a chess clock : the remaining time of each player, with an increment added after each move
+    (Fischer increment), and the allocation of the time of a move for the computer.
+
+    ...
+
+    Attributes
+    ----------
+    remaining : dict of str: float
+        The remaining time in seconds of each color, without the move in progress.
+    increment : float
+        The time in seconds added to the clock of a player after each of their moves.
+    running : str or None
+        The color whose clock is running, if any.
+
+    Methods
+    -------
+    start(self, color):
+        Starts the clock of a player.
+
+    stop(self):
+        Stops the running clock and adds the increment. Returns the time of the move.
+
+    time_left(self, color):
+        Returns the remaining time of a player, including the move in progress.
+
+    flagged(self, color):
+        Returns True if a player has no time left.
+
+    allocate(self, color, moves_to_go = 30):
+        Returns the soft and hard time limits of the next move of a player.
+    """
+
+    def __init__(self, minutes = 5, increment = 0):
+        """
+        Instantiate a Chessclock object with the same time for both players, not running.
+
+        Parameters
+        ----------
+            minutes : float
+                The initial time of each player, in minutes.
+                Default is 5.
+            increment : float
+                The time in seconds added after each move.
+                Default is 0.
+        """
+        self.remaining = {'White': minutes * 60.0, 'Black': minutes * 60.0}
+        self.increment = increment
+        self.running = None
+        self.started = None
+
+    @classmethod
+    def from_string(cls, text):
+        """
+        Returns the Chessclock object of a time control written as '<minutes>+<increment in seconds>' (e.g. '5+3').
+
+        Parameters
+        ----------
+            text : str
+                The time control.
+        """
+        minutes, _, increment = text.partition('+')
+        return cls(float(minutes), float(increment) if increment else 0)
+
+    def __str__(self):
+        """
+        Called by the str() built-in function. Returns the remaining times (e.g. 'White 4:32 - Black 4:58').
+        """
+        return ' - '.join('%s %d:%02d' % (color, self.time_left(color) // 60, self.time_left(color) % 60)
+                          for color in ('White', 'Black'))
+
+    def start(self, color):
+        """
+        Starts the clock of a player (and stops the other one without increment, if it was running).
+
+        Parameters
+        ----------
+            color : str
+                The color of the player ('White' or 'Black').
+        """
+        if self.running != None:
+            self.remaining[self.running] -= time.perf_counter() - self.started
+        self.running = color
+        self.started = time.perf_counter()
+
+    def stop(self):
+        """
+        Stops the running clock at the end of a move, and adds the increment if the time was not exceeded.
+        Returns the time of the move in seconds.
+        """
+        if self.running == None:
+            return 0.0
+        elapsed = time.perf_counter() - self.started
+        self.remaining[self.running] -= elapsed
+        if self.remaining[self.running] > 0:
+            self.remaining[self.running] += self.increment
+        self.running = None
+        return elapsed
+
+    def time_left(self, color):
+        """
+        Returns the remaining time of a player in seconds, including the move in progress (at least 0).
+
+        Parameters
+        ----------
+            color : str
+                The color of the player ('White' or 'Black').
+        """
+        left = self.remaining[color]
+        if self.running == color:
+            left -= time.perf_counter() - self.started
+        return max(left, 0.0)
+
+    def flagged(self, color):
+        """
+        Returns True if a player has no time left.
+
+        Parameters
+        ----------
+            color : str
+                The color of the player ('White' or 'Black').
+        """
+        return self.time_left(color) <= 0
+
+    def allocate(self, color, moves_to_go = 30):
+        """
+        Returns a tuple (soft, hard) with the time limits in seconds of the next move of a player : the soft limit is
+        the normal time of the move (a share of the remaining time, plus most of the increment), that the search may
+        shorten when its best move is stable or extend when its score drops, and the hard limit is never exceeded.
+
+        Parameters
+        ----------
+            color : str
+                The color of the player ('White' or 'Black').
+            moves_to_go : int
+                The number of moves for which the remaining time must last.
+                Default is 30.
+        """
+        left = self.time_left(color)
+        soft = left / moves_to_go + self.increment * 3 / 4
+        hard = min(soft * 4, left * 0.5 + self.increment * 3 / 4)
+        hard = max(min(hard, left - 0.05), 0.01) # Safety margin for the moves of the interface
+        return min(soft, hard), hard
@@ -0,0 +1,653 @@
+from Chessboard import *
+from Chesseval import *
+from Chesstable import *
+from Chessstats import *
+import queue
+import time
+import os
+
+def _parallel_worker(board, worker, table_name, table_entries, depth, movetime, nodes, stop_event, results):
+    """
+    Searches a position in a helper process of Chessengine.parallel_search, using the shared transposition table,
+    and puts the result of the search in the results queue.
+    """
+    table = Chesstable.attach(table_name, table_entries)
+    engine = Chessengine(table = table, worker = worker)
+    engine.stop_event = stop_event
+    engine.search(board, depth = depth, movetime = movetime, nodes = nodes)
+    results.put({'worker': worker, 'move': engine.best_move, 'score': engine.score, 'depth': engine.depth,
+                 'pv': engine.pv, 'nodes': engine.nodes, 'seconds': engine.elapsed()})
+    table.close()
+
+
+class Chessengine:
+    """
+    A class to search the best move of a Chessboard position.
+
+    ...
+
+    The search is an iterative deepening negamax alpha-beta search with principal variation search, a transposition
+    table, killer and history move ordering, check extensions and a quiescence search of the captures.
+    Positions are evaluated with a Chesseval object.
+
+    Attributes
+    ----------
+    evaluator : Chesseval object
+        The evaluation function used at the leaves of the search.
+    table : Chesstable object
+        The transposition table.
+    tablebase : Chesstablebase object or None
+        The endgame tablebases probed at the root and after the captures and promotions, if any.
+    worker : int
+        The number of the worker in a parallel search (0 for the main search).
+    stop_event : threading.Event or multiprocessing.Event or None
+        If set during a search, the search stops as soon as possible.
+    best_move : Chessmove object or None
+        The best move found by the last search.
+    score : int
+        The score of the best move, in centipawns, from the point of view of the player to move.
+    depth : int
+        The last depth fully searched.
+    pv : list of Chessmove objects
+        The principal variation found by the last search.
+    lines : list of tuple
+        The moves found by the last multi-PV search, from the best to the worst, as (move, score, pv) tuples.
+    nodes : int
+        The number of nodes visited by the last search.
+    qnodes : int
+        The number of nodes of the quiescence search visited by the last search (included in nodes).
+    cutoffs : int
+        The number of beta cutoffs of the last search.
+    first_cutoffs : int
+        The number of beta cutoffs produced by the first move searched.
+    stats : Chessstats object
+        The statistics of each depth of the last search.
+    worker_stats : list of dict
+        The statistics of each worker of the last parallel search (depth, nodes, seconds and nodes per second).
+
+    Methods
+    -------
+    search(self, board, depth = None, movetime = None, nodes = None, callback = None, soft_time = None, ponder = False):
+        Searches a position and returns the best move found.
+
+    multipv_search(self, board, lines = 3, depth = None, movetime = None, nodes = None, callback = None, ponder = False):
+        Searches the best moves of a position and returns them with their scores and principal variations.
+
+    parallel_search(self, board, workers = None, depth = None, movetime = None, nodes = None, callback = None,
+                    soft_time = None, ponder = False):
+        Searches a position with several processes sharing the transposition table, and returns the best move found.
+
+    stop(self):
+        Asks the current search to stop as soon as possible.
+
+    ponderhit(self, movetime = None, soft_time = None):
+        Turns the current pondering search into a normal search with time limits.
+    """
+
+    mate_score = 100000
+    max_ply = 64
+    infinity = 1000000
+    piece_values = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 10}
+
+    def __init__(self, evaluator = None, table = None, worker = 0, tablebase = None):
+        """
+        Instantiate a Chessengine object.
+
+        Parameters
+        ----------
+            evaluator : Chesseval object or None
+                The evaluation function. If None, a Chesseval object with default weights is used.
+                Default is None.
+            table : Chesstable object or None
+                The transposition table. If None, a new local Chesstable object is used.
+                Default is None.
+            worker : int
+                The number of the worker in a parallel search. Helper workers (worker > 0) search at different depths
+                to diversify the parallel search.
+                Default is 0.
+            tablebase : Chesstablebase object or None
+                The endgame tablebases. When the position has a table, the root move is read in the table without
+                searching, and the positions reached by a capture or a promotion during the search are scored by the table.
+                Default is None.
+        """
+        self.evaluator = evaluator if evaluator != None else Chesseval()
+        self.table = table if table != None else Chesstable()
+        self.worker = worker
+        self.tablebase = tablebase
+        self.stop_event = None
+        self.best_move = None
+        self.score = 0
+        self.depth = 0
+        self.pv = []
+        self.lines = []
+        self.excluded_root = set()
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.stats = Chessstats()
+        self.worker_stats = []
+        self.start = time.perf_counter()
+
+    def elapsed(self):
+        """
+        Returns the time in seconds since the start of the last search.
+        """
+        return time.perf_counter() - self.start
+
+    def stop(self):
+        """
+        Asks the current search to stop as soon as possible. The best move of the last depth fully searched is kept.
+        """
+        self.stopped = True
+
+    def ponderhit(self, movetime = None, soft_time = None):
+        """
+        Turns the current pondering search (started with ponder = True) into a normal search : its time limits start
+        now, and the depths already searched are kept. Called when the opponent played the expected move.
+
+        Parameters
+        ----------
+            movetime : float or None
+                The maximum time of the search from now, in seconds. If None, the one given to search is used.
+                Default is None.
+            soft_time : float or None
+                The normal time of the search from now, in seconds. If None, the one given to search is used.
+                Default is None.
+        """
+        self.clock_start = time.perf_counter()
+        self.movetime = movetime if movetime != None else self.movetime
+        self.soft_time = soft_time if soft_time != None else self.soft_time
+        self.deadline = self.clock_start + self.movetime if self.movetime != None else None
+        self.soft_deadline = self.clock_start + 2 * self.soft_time if self.soft_time != None else None
+        self.pondering = False
+
+    def search(self, board, depth = None, movetime = None, nodes = None, callback = None, soft_time = None, ponder = False):
+        """
+        Searches a position by iterative deepening and returns the best move found, as a Chessmove object
+        (None if there is no legal move). The search stops when the first of the given limits is reached.
+        The board is left in the same state as before the search.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be searched.
+            depth : int or None
+                The maximum depth of the search, in plies. If None, the search is only limited by the other limits.
+                Default is None.
+            movetime : float or None
+                The maximum time of the search, in seconds.
+                Default is None.
+            nodes : int or None
+                The maximum number of nodes of the search.
+                Default is None.
+            callback : function or None
+                A function called with the Chessengine object as argument after each depth fully searched.
+                Default is None.
+            soft_time : float or None
+                The normal time of the search, in seconds, for the games with a clock (movetime is then the time that
+                must never be exceeded). The search stops earlier when the best move stays the same during 3 depths,
+                and is extended when the score drops, up to twice soft_time (and never after movetime).
+                Default is None.
+            ponder : bool
+                If True, the search runs without time limit until it is stopped, or until ponderhit is called
+                (searching the position after the expected move of the opponent, during their time, or an infinite
+                search). If the search ends before (no choice, tablebase move, mate found or maximum depth), the best
+                move is only returned after the ponderhit or the stop, as the UCI protocol requires.
+                Default is False.
+        """
+        self._start_search(movetime, nodes, soft_time, ponder)
+
+        root_moves = board.legal_moves()
+        self.best_move = root_moves[0] if root_moves else None
+        if len(root_moves) <= 1: # No need to search if there is no choice
+            self.pv = root_moves[:1]
+            if self.pondering and callback != None: # The caller may wait for a first report before the ponderhit
+                callback(self)
+            self._wait_ponderhit()
+            return self.best_move
+        if self.tablebase != None:
+            result = self.tablebase.best_move(board)
+            if result != None: # Perfect play read in the tables
+                self.best_move, self.pv = result[0], [result[0]]
+                self.score = result[1] * (Chessengine.mate_score - result[2])
+                if callback != None:
+                    callback(self)
+                self._wait_ponderhit()
+                return self.best_move
+
+        max_depth = min(depth, Chessengine.max_ply) if depth != None else Chessengine.max_ply
+        stable = 0 # Number of consecutive depths with the same best move
+        for current in range(1, max_depth + 1):
+            search_depth = min(current + self.worker % 2, max_depth) # Helper workers search one ply deeper every other worker
+            self.root_move = None
+            score = self._negamax(board, search_depth, -Chessengine.infinity, Chessengine.infinity, 0)
+            if self.stopped or self.root_move == None: # The last iteration was not completed
+                break
+            stable = stable + 1 if self.depth > 0 and self.root_move == self.best_move else 0
+            dropping = self.depth > 0 and score < self.score - 50
+            self.depth = search_depth
+            self.score = score
+            self.best_move = self.root_move
+            self.pv = self._principal_variation(board, search_depth)
+            self.stats.record(self)
+            if callback != None:
+                callback(self)
+            if abs(score) >= Chessengine.mate_score - Chessengine.max_ply: # A forced mate was found
+                break
+            if self.pondering: # No time limit until the ponderhit
+                continue
+            spent = time.perf_counter() - self.clock_start
+            if self.soft_time != None:
+                budget = self.soft_time
+                if stable >= 2: # The best move is stable : no need to search longer
+                    budget /= 2
+                if dropping: # The score drops : more time to find a better move (still limited by movetime)
+                    budget *= 2
+                if spent > budget / 2:
+                    break # The next depth would most probably exceed the budget
+            elif self.deadline != None and spent > (self.deadline - self.clock_start) / 2:
+                break # The next depth would most probably not be completed in time
+        self._wait_ponderhit()
+        return self.best_move
+
+    def _wait_ponderhit(self):
+        """
+        Waits, at the end of a pondering search, until ponderhit is called or the search is stopped.
+        """
+        while self.pondering and not self.stopped:
+            if self.stop_event != None:
+                if self.stop_event.wait(0.01):
+                    self.stopped = True
+            else:
+                time.sleep(0.01)
+
+    def _start_search(self, movetime, nodes, soft_time = None, ponder = False):
+        """
+        Sets the limits of a new search and resets its counters and move ordering tables.
+        """
+        self.start = time.perf_counter()
+        self.clock_start = self.start # Start of the time limits (the ponderhit for a pondering search)
+        self.movetime = movetime
+        self.soft_time = soft_time
+        self.pondering = ponder
+        self.deadline = self.start + movetime if movetime != None and not ponder else None
+        self.soft_deadline = self.start + 2 * soft_time if soft_time != None and not ponder else None # Longest extension
+        self.node_limit = nodes
+        self.stopped = False
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.stats.reset(self)
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        self.lines = []
+        self.excluded_root = set()
+        self.killers = [[None, None] for ply in range(Chessengine.max_ply + 1)]
+        self.history_scores = {}
+
+    def multipv_search(self, board, lines = 3, depth = None, movetime = None, nodes = None, callback = None, ponder = False):
+        """
+        Searches the best moves of a position by iterative deepening and returns them from the best to the worst,
+        as a list of tuples (move, score, pv) : a Chessmove object, its score in centipawns from the point of view of
+        the player to move, and its principal variation (list of Chessmove objects).
+        At each depth, the best move is searched, then the best move excluding it, and so on. All the lines share the
+        transposition table, so each line after the first one mostly reuses the positions searched by the previous
+        ones, and costs far less than a separate search. When a line scores more than the line before it (whose search
+        relied on entries stored by older searches), the line before is searched again, so that the lines are ranked
+        by the searches themselves. The board is left in the same state as before the search.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be searched.
+            lines : int
+                The number of moves returned (less if there are less legal moves).
+                Default is 3.
+            depth, movetime, nodes :
+                The limits of the search, as in the search method.
+            callback : function or None
+                A function called with the Chessengine object as argument after each depth fully searched.
+                The lines of the depth are in the lines attribute.
+                Default is None.
+            ponder : bool
+                If True, the time limits only start when ponderhit is called, as in the search method.
+                Default is False.
+        """
+        self._start_search(movetime, nodes, ponder = ponder)
+        root_moves = board.legal_moves()
+        count = min(lines, len(root_moves))
+        self.best_move = root_moves[0] if root_moves else None
+        if count == 0:
+            self._wait_ponderhit()
+            return []
+
+        max_depth = min(depth, Chessengine.max_ply) if depth != None else Chessengine.max_ply
+        for current in range(1, max_depth + 1):
+            found = []
+            researches = 0
+            while len(found) < count:
+                self.excluded_root = set(line[0] for line in found) # Searched without the moves already found
+                self.root_move = None
+                score = self._negamax(board, current, -Chessengine.infinity, Chessengine.infinity, 0)
+                if self.stopped or self.root_move == None: # The line was not completed
+                    break
+                if found and score > found[-1][1] and researches < count:
+                    # The previous line should have found this move (its score relied on entries of the transposition
+                    # table stored by older searches) : it is searched again, with the entries stored by this line
+                    found.pop()
+                    researches += 1
+                    continue
+                found.append((self.root_move, score, self._principal_variation(board, current)))
+            if len(found) < count:
+                if not self.lines: # Stopped during the first depth : the lines found are better than nothing
+                    self.lines = sorted(found, key = lambda line: line[1], reverse = True)
+                break
+            self.lines = sorted(found, key = lambda line: line[1], reverse = True)
+            self.depth = current
+            self.best_move, self.score, self.pv = self.lines[0]
+            self.stats.record(self)
+            if callback != None:
+                callback(self)
+            if self.deadline != None and time.perf_counter() - self.clock_start > (self.deadline - self.clock_start) / 2:
+                break # The next depth would most probably not be completed in time
+        self._wait_ponderhit()
+        self.excluded_root = set()
+        if self.lines:
+            self.best_move, self.score, self.pv = self.lines[0]
+        return self.lines
+
+    def parallel_search(self, board, workers = None, depth = None, movetime = None, nodes = None, callback = None,
+                        soft_time = None, ponder = False):
+        """
+        Searches a position with several processes and returns the best move found, as a Chessmove object.
+        All the workers search the same root position and share the transposition table through a shared memory
+        block (Lazy SMP) : each worker benefits from the results stored by the others, and half of the workers search
+        one ply deeper, so the depth reached grows with the number of workers.
+        The search of this process is the main one : when it ends (or when the stop_event attribute is set), the helper
+        workers are stopped, and the result of the worker which completed the deepest search is returned.
+        The statistics of each worker are stored in the worker_stats attribute.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be searched.
+            workers : int or None
+                The number of workers (processes) of the search, including this one. If None, the number of CPUs is used.
+                Default is None.
+            depth, movetime, nodes, callback :
+                The limits of the search of each worker and the callback of the main search, as in the search method.
+            soft_time, ponder :
+                The time management and the pondering of the main search, as in the search method. The helper workers
+                search until the main search ends.
+        """
+        workers = workers if workers != None else (os.cpu_count() or 1)
+        # Helper processes are spawned rather than forked, as forking a process whose other threads hold locks
+        # (e.g. a thread reading the standard input) may deadlock the child process
+        import multiprocessing # Imported on first use : the single process searches do not need it
+        context = multiprocessing.get_context('spawn')
+        local_table = self.table
+        self.table = Chesstable(local_table.entries, shared = True)
+        stop_event = context.Event()
+        results = context.Queue()
+        helpers = [context.Process(target = _parallel_worker, daemon = True,
+                                           args = (board, worker, self.table.name, self.table.entries, depth,
+                                                   movetime if soft_time == None and not ponder else None, nodes,
+                                                   stop_event, results))
+                   for worker in range(1, workers)]
+        try:
+            for helper in helpers:
+                helper.start()
+            self.search(board, depth = depth, movetime = movetime, nodes = nodes, callback = callback,
+                        soft_time = soft_time, ponder = ponder)
+            stop_event.set() # The main search is over : stopping the helper workers
+
+            reports = [{'worker': 0, 'move': self.best_move, 'score': self.score, 'depth': self.depth, 'pv': self.pv,
+                        'nodes': self.nodes, 'seconds': self.elapsed()}]
+            for helper in helpers:
+                try:
+                    reports.append(results.get(timeout = 10))
+                except queue.Empty:
+                    pass
+            for helper in helpers:
+                helper.join(timeout = 10)
+        finally:
+            stop_event.set()
+            self.table.close()
+            self.table = local_table
+
+        for report in reports:
+            report['nps'] = int(report['nodes'] / report['seconds']) if report['seconds'] > 0 else 0
+        self.worker_stats = sorted(reports, key = lambda report: report['worker'])
+
+        best = max(reports, key = lambda report: (report['move'] != None, report['depth'], -report['worker']))
+        self.best_move, self.score, self.depth, self.pv = best['move'], best['score'], best['depth'], best['pv']
+        self.nodes = sum(report['nodes'] for report in reports)
+        return self.best_move
+
+    def _check_limits(self):
+        """
+        Stops the search if the time, the nodes limit is reached or if the stop event is set.
+        """
+        if (self.deadline != None and time.perf_counter() >= self.deadline) \
+                or (self.soft_deadline != None and time.perf_counter() >= self.soft_deadline) \
+                or (self.node_limit != None and self.nodes >= self.node_limit) \
+                or (self.stop_event != None and self.stop_event.is_set()):
+            self.stopped = True
+
+    def _is_repetition(self, board):
+        """
+        Returns True if the current position already occured since the last capture or pawn move.
+        """
+        history = board.history
+        key = board.key
+        for index in range(len(history) - 1, -1, -1):
+            record = history[index]
+            if (len(history) - index) % 2 == 0 and record[-1] == key: # Same player to move and same position
+                return True
+            if record[2].piece_type == 'P' or record[3] != None: # Irreversible move
+                return False
+        return False
+
+    def _score_to_table(self, score, ply):
+        """
+        Converts a mate score relative to the root into a mate score relative to the current position.
+        """
+        if score >= Chessengine.mate_score - Chessengine.max_ply:
+            return score + ply
+        if score <= -Chessengine.mate_score + Chessengine.max_ply:
+            return score - ply
+        return score
+
+    def _score_from_table(self, score, ply):
+        """
+        Converts a mate score relative to a stored position into a mate score relative to the root.
+        """
+        if score >= Chessengine.mate_score - Chessengine.max_ply:
+            return score - ply
+        if score <= -Chessengine.mate_score + Chessengine.max_ply:
+            return score + ply
+        return score
+
+    def _ordered_moves(self, board, moves, table_move, ply):
+        """
+        Returns the moves sorted in the order in which they should be searched : move of the transposition table,
+        captures (most valuable victim first, least valuable attacker first) and promotions, killer moves,
+        and the other moves by history score.
+        """
+        squares = board.squares
+        killers = self.killers[ply]
+        history_scores = self.history_scores
+        values = Chessengine.piece_values
+        scored = []
+        for move in moves:
+            if move == table_move:
+                priority = 1000000
+            else:
+                victim = squares[move.destination].piece
+                if victim != None or move.promote != None:
+                    priority = 100000 + 10 * (values[victim.piece_type] if victim != None else 0) \
+                               - values[squares[move.origin].piece.piece_type] + (values[move.promote] * 10 if move.promote else 0)
+                elif move == killers[0] or move == killers[1]:
+                    priority = 90000
+                else:
+                    priority = history_scores.get(move, 0)
+            scored.append((priority, move))
+        scored.sort(key = lambda item: item[0], reverse = True)
+        return [move for priority, move in scored]
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        """
+        Returns the score of the position from the point of view of the player to move, searched at a given depth,
+        with an alpha-beta window.
+        """
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        color = board.turn
+        other_color = board.opponents[color]
+        if ply > 0:
+            if self._is_repetition(board):
+                return 0
+            alpha = max(alpha, -Chessengine.mate_score + ply) # Mate distance pruning
+            beta = min(beta, Chessengine.mate_score - ply - 1)
+            if alpha >= beta:
+                return alpha
+            last = board.history[-1]
+            if self.tablebase != None and board.phase <= 8 \
+                    and (last[3] != None or (last[2].piece_type == 'P' and last[1][1] in '18')):
+                result = self.tablebase.probe(board) # Capture or promotion : the material changed, the position may have a table
+                if result != None:
+                    return result[0] * (Chessengine.mate_score - ply - result[1])
+        if ply >= Chessengine.max_ply:
+            return self.evaluator.evaluate(board)
+
+        in_check = board.is_attacked(board.king_squares[color], other_color)
+        if in_check:
+            depth += 1 # Check extension
+        if depth <= 0:
+            return self._quiesce(board, alpha, beta, ply)
+
+        table_move = None
+        entry = self.table.probe(board.key)
+        if entry != None:
+            entry_depth, flag, score, table_move = entry
+            score = self._score_from_table(score, ply)
+            if ply > 0 and entry_depth >= depth:
+                if flag == Chesstable.exact or (flag == Chesstable.lower and score >= beta) \
+                        or (flag == Chesstable.upper and score <= alpha):
+                    return score
+
+        alpha_origin = alpha
+        best_score = -Chessengine.infinity
+        best_move = None
+        legal = 0
+        for move in self._ordered_moves(board, board.pseudo_moves(color), table_move, ply):
+            if ply == 0 and move in self.excluded_root: # Move of a previous line of a multi-PV search
+                continue
+            board.make_move(*move)
+            if board.is_attacked(board.king_squares[color], other_color): # Illegal move
+                board.unmake_move()
+                continue
+            legal += 1
+            if legal == 1:
+                score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            else: # Principal variation search : null window first, full window only if the move may be better
+                score = -self._negamax(board, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if ply == 0:
+                    self.root_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        self.first_cutoffs += legal == 1
+                        if board.squares[move.destination].piece == None and move.promote == None: # Quiet move
+                            if move != self.killers[ply][0]:
+                                self.killers[ply] = [move, self.killers[ply][0]]
+                            self.history_scores[move] = self.history_scores.get(move, 0) + depth * depth
+                        break
+
+        if legal == 0: # Mate or pat
+            return -Chessengine.mate_score + ply if in_check else 0
+
+        if best_score <= alpha_origin:
+            flag = Chesstable.upper
+        elif best_score >= beta:
+            flag = Chesstable.lower
+        else:
+            flag = Chesstable.exact
+        if ply > 0 or not self.excluded_root: # The root score without some moves is not the score of the position
+            self.table.store(board.key, depth, flag, self._score_to_table(best_score, ply), best_move)
+        return best_score
+
+    def _quiesce(self, board, alpha, beta, ply):
+        """
+        Returns the score of the position from the point of view of the player to move, searching only the captures
+        and promotions until the position is quiet.
+        """
+        self.nodes += 1
+        self.qnodes += 1
+        if self.nodes & 255 == 0:
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        stand_pat = self.evaluator.evaluate(board)
+        if stand_pat >= beta or ply >= Chessengine.max_ply:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        color = board.turn
+        other_color = board.opponents[color]
+        squares = board.squares
+        captures = [move for move in board.pseudo_moves(color) if squares[move.destination].piece != None or move.promote == 'Q']
+        for move in self._ordered_moves(board, captures, None, ply):
+            board.make_move(*move)
+            if board.is_attacked(board.king_squares[color], other_color):
+                board.unmake_move()
+                continue
+            score = -self._quiesce(board, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if self.stopped:
+                return 0
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+    def _principal_variation(self, board, depth):
+        """
+        Returns the principal variation of the last search as a list of Chessmove objects, by following
+        the best moves stored in the transposition table from the root position.
+        """
+        pv = [self.root_move]
+        board.make_move(*self.root_move)
+        seen = {board.key}
+        while len(pv) < depth:
+            entry = self.table.probe(board.key)
+            if entry == None or entry[3] == None or entry[3] not in board.legal_moves():
+                break
+            board.make_move(*entry[3])
+            pv.append(entry[3])
+            if board.key in seen: # Repetition : the variation would never end
+                break
+            seen.add(board.key)
+        for move in pv:
+            board.unmake_move()
+        return pv
@@ -0,0 +1,366 @@
+from Chesscache import *
+from Chessmagic import *
+from Chessmove import *
+
+def _build_psq(values_mg, values_eg, tables_mg, tables_eg):
+    """
+    Returns the piece-square dictionnary used by the Chesseval class : for each color, piece_type and square reference,
+    a tuple (middlegame score, endgame score) including the material value of the piece.
+    The scores of the black pieces are negative, so that the sum over the board is the score of the white player.
+    """
+    psq = {'White': {}, 'Black': {}}
+    for piece_type in values_mg.keys():
+        psq['White'][piece_type] = {}
+        psq['Black'][piece_type] = {}
+        for index, row in enumerate('abcdefgh'):
+            for line in range(1, 9):
+                white_index = (8 - line) * 8 + index # Tables are written from the white point of view, line 8 first
+                black_index = (line - 1) * 8 + index # Black pieces use the vertically mirrored table
+                psq['White'][piece_type][row + str(line)] = (values_mg[piece_type] + tables_mg[piece_type][white_index],
+                                                             values_eg[piece_type] + tables_eg[piece_type][white_index])
+                psq['Black'][piece_type][row + str(line)] = (-values_mg[piece_type] - tables_mg[piece_type][black_index],
+                                                             -values_eg[piece_type] - tables_eg[piece_type][black_index])
+    return psq
+
+
+class Chesseval:
+    """
+    A class to evaluate a Chessboard position.
+
+    ...
+
+    The evaluation is tapered : a middlegame score and an endgame score are computed and blended according to the
+    game phase (the amount of non-pawn material left on the board).
+    The material and piece-square terms are not computed here : they are maintained incrementally by the Chessboard
+    object in its mg_score, eg_score and phase attributes each time a move is made or unmade.
+
+    Attributes
+    ----------
+    mobility_weights : dict of str: tuple
+        The (middlegame, endgame) bonus for each square a piece can move to, for each piece_type.
+    doubled_penalty, isolated_penalty : tuple
+        The (middlegame, endgame) penalty for each doubled or isolated pawn.
+    passed_bonus : list of tuple
+        The (middlegame, endgame) bonus of a passed pawn, for each relative line of the pawn.
+    shield_bonus : int
+        The middlegame bonus for each pawn in front of the king.
+    open_file_penalty : int
+        The middlegame penalty for each file around the king without pawn of the king color.
+    king_zone_penalty : int
+        The middlegame penalty for each square around the king attacked by the opponent.
+    pawn_cache : Chesscache object
+        The cache of the pawn structure scores, keyed by the pawn_key attribute of the Chessboard objects.
+
+    Methods
+    -------
+    evaluate(self, board, color = None):
+        Returns the score of the position in centipawns, from the point of view of a given color.
+
+    material_pst(self, board):
+        Returns the material and piece-square scores of the position, computed from scratch.
+
+    mobility(self, board, color):
+        Returns the mobility scores of a given color.
+
+    pawn_scores(self, board):
+        Returns the pawn structure scores of the position, using the pawn structure cache.
+
+    pawn_structure(self, board, color):
+        Returns the pawn structure scores of a given color.
+
+    king_safety(self, board, color):
+        Returns the king safety score of a given color.
+    """
+
+    max_phase = 24
+    phase_weights = {'P': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+    piece_values_mg = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 0}
+    piece_values_eg = {'P': 120, 'N': 300, 'B': 320, 'R': 530, 'Q': 950, 'K': 0}
+
+    # Piece-square tables, from the white point of view (line 8 first, row a first)
+    pst_mg = {
+        'P': [  0,  0,  0,  0,  0,  0,  0,  0,
+               50, 50, 50, 50, 50, 50, 50, 50,
+               10, 10, 20, 30, 30, 20, 10, 10,
+                5,  5, 10, 25, 25, 10,  5,  5,
+                0,  0,  0, 20, 20,  0,  0,  0,
+                5, -5,-10,  0,  0,-10, -5,  5,
+                5, 10, 10,-20,-20, 10, 10,  5,
+                0,  0,  0,  0,  0,  0,  0,  0],
+        'N': [-50,-40,-30,-30,-30,-30,-40,-50,
+              -40,-20,  0,  0,  0,  0,-20,-40,
+              -30,  0, 10, 15, 15, 10,  0,-30,
+              -30,  5, 15, 20, 20, 15,  5,-30,
+              -30,  0, 15, 20, 20, 15,  0,-30,
+              -30,  5, 10, 15, 15, 10,  5,-30,
+              -40,-20,  0,  5,  5,  0,-20,-40,
+              -50,-40,-30,-30,-30,-30,-40,-50],
+        'B': [-20,-10,-10,-10,-10,-10,-10,-20,
+              -10,  0,  0,  0,  0,  0,  0,-10,
+              -10,  0,  5, 10, 10,  5,  0,-10,
+              -10,  5,  5, 10, 10,  5,  5,-10,
+              -10,  0, 10, 10, 10, 10,  0,-10,
+              -10, 10, 10, 10, 10, 10, 10,-10,
+              -10,  5,  0,  0,  0,  0,  5,-10,
+              -20,-10,-10,-10,-10,-10,-10,-20],
+        'R': [  0,  0,  0,  0,  0,  0,  0,  0,
+                5, 10, 10, 10, 10, 10, 10,  5,
+               -5,  0,  0,  0,  0,  0,  0, -5,
+               -5,  0,  0,  0,  0,  0,  0, -5,
+               -5,  0,  0,  0,  0,  0,  0, -5,
+               -5,  0,  0,  0,  0,  0,  0, -5,
+               -5,  0,  0,  0,  0,  0,  0, -5,
+                0,  0,  0,  5,  5,  0,  0,  0],
+        'Q': [-20,-10,-10, -5, -5,-10,-10,-20,
+              -10,  0,  0,  0,  0,  0,  0,-10,
+              -10,  0,  5,  5,  5,  5,  0,-10,
+               -5,  0,  5,  5,  5,  5,  0, -5,
+                0,  0,  5,  5,  5,  5,  0, -5,
+              -10,  5,  5,  5,  5,  5,  0,-10,
+              -10,  0,  5,  0,  0,  0,  0,-10,
+              -20,-10,-10, -5, -5,-10,-10,-20],
+        'K': [-30,-40,-40,-50,-50,-40,-40,-30,
+              -30,-40,-40,-50,-50,-40,-40,-30,
+              -30,-40,-40,-50,-50,-40,-40,-30,
+              -30,-40,-40,-50,-50,-40,-40,-30,
+              -20,-30,-30,-40,-40,-30,-30,-20,
+              -10,-20,-20,-20,-20,-20,-20,-10,
+               20, 20,  0,  0,  0,  0, 20, 20,
+               20, 30, 10,  0,  0, 10, 30, 20]}
+
+    pst_eg = {
+        'P': [  0,  0,  0,  0,  0,  0,  0,  0,
+               80, 80, 80, 80, 80, 80, 80, 80,
+               50, 50, 50, 50, 50, 50, 50, 50,
+               30, 30, 30, 30, 30, 30, 30, 30,
+               20, 20, 20, 20, 20, 20, 20, 20,
+               10, 10, 10, 10, 10, 10, 10, 10,
+                0,  0,  0,  0,  0,  0,  0,  0,
+                0,  0,  0,  0,  0,  0,  0,  0],
+        'N': pst_mg['N'],
+        'B': pst_mg['B'],
+        'R': [0] * 64,
+        'Q': pst_mg['Q'],
+        'K': [-50,-40,-30,-20,-20,-30,-40,-50,
+              -30,-20,-10,  0,  0,-10,-20,-30,
+              -30,-10, 20, 30, 30, 20,-10,-30,
+              -30,-10, 30, 40, 40, 30,-10,-30,
+              -30,-10, 30, 40, 40, 30,-10,-30,
+              -30,-10, 20, 30, 30, 20,-10,-30,
+              -30,-30,  0,  0,  0,  0,-30,-30,
+              -50,-30,-30,-30,-30,-30,-30,-50]}
+
+    psq = _build_psq(piece_values_mg, piece_values_eg, pst_mg, pst_eg)
+
+    def __init__(self, pawn_cache_size = 16384):
+        """
+        Instantiate a Chesseval object with the default weights of the evaluation terms.
+
+        Parameters
+        ----------
+            pawn_cache_size : int
+                The maximum number of pawn structures kept in the pawn structure cache.
+                Default is 16384.
+        """
+        self.mobility_weights = {'N': (4, 4), 'B': (5, 5), 'R': (2, 4), 'Q': (1, 2)}
+        self.doubled_penalty = (10, 20)
+        self.isolated_penalty = (10, 15)
+        self.passed_bonus = [(0, 0), (0, 0), (5, 10), (10, 20), (20, 40), (35, 70), (60, 110), (0, 0), (0, 0)]
+        self.shield_bonus = 10
+        self.open_file_penalty = 15
+        self.king_zone_penalty = 8
+        self.pawn_cache = Chesscache(pawn_cache_size)
+
+    def evaluate(self, board, color = None):
+        """
+        Returns the score of the position in centipawns, from the point of view of a given color.
+        A positive score means that the position is favourable to this color.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be evaluated.
+            color : str or None
+                The color from which point of view the score is given. If None, the color of the player whose
+                it is the turn to play is used (as needed by a negamax search).
+                Default is None.
+        """
+        mg, eg = self.pawn_scores(board)
+        mg += board.mg_score # Incremental material and piece-square scores
+        eg += board.eg_score
+
+        for side, sign in (('White', 1), ('Black', -1)):
+            mob_mg, mob_eg = self.mobility(board, side)
+            mg += sign * (mob_mg + self.king_safety(board, side))
+            eg += sign * mob_eg
+
+        phase = min(board.phase, Chesseval.max_phase)
+        score = (mg * phase + eg * (Chesseval.max_phase - phase)) // Chesseval.max_phase
+
+        if color == None:
+            color = board.turn
+        return score if color == 'White' else -score
+
+    def material_pst(self, board):
+        """
+        Returns a tuple (middlegame score, endgame score, phase) with the material and piece-square scores of the position,
+        computed with a full scan of the board. The scores are given from the white point of view.
+        This is the reference against which the incremental scores of the Chessboard object can be checked.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be evaluated.
+        """
+        mg, eg, phase = 0, 0, 0
+        for ref, square in board.squares.items():
+            if square.piece != None:
+                piece_mg, piece_eg = Chesseval.psq[square.piece.color][square.piece.piece_type][ref]
+                mg += piece_mg
+                eg += piece_eg
+                phase += Chesseval.phase_weights[square.piece.piece_type]
+        return (mg, eg, phase)
+
+    def mobility(self, board, color):
+        """
+        Returns a tuple (middlegame score, endgame score) with the mobility scores of the knights, bishops, rooks and
+        queens of a given color. The mobility of a piece is the number of squares it could move to (empty or
+        with an opponent piece on it), without checking if the move would leave the king in check.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be evaluated.
+            color : str
+                The color of the pieces to be evaluated.
+        """
+        mg, eg = 0, 0
+        squares = board.squares
+        for ref, square in squares.items():
+            piece = square.piece
+            if piece == None or piece.color != color or piece.piece_type in 'PK':
+                continue
+            count = 0
+            if piece.piece_type == 'N':
+                for target in board.knight_targets[ref]:
+                    if squares[target].piece == None or squares[target].piece.color != color:
+                        count += 1
+            else: # Attacks of the sliding pieces, from the magic bitboard tables : the empty squares are counted at once
+                index = Chessmove.square_index[ref]
+                if piece.piece_type == 'R':
+                    attacked = Chessmagic.rook_attacks(index, board.occupied)
+                elif piece.piece_type == 'B':
+                    attacked = Chessmagic.bishop_attacks(index, board.occupied)
+                else:
+                    attacked = Chessmagic.queen_attacks(index, board.occupied)
+                count = bin(attacked & ~board.occupied).count('1')
+                for target in Chessmagic.refs(attacked & board.occupied): # First piece of each ray
+                    if squares[target].piece.color != color:
+                        count += 1
+            weight_mg, weight_eg = self.mobility_weights[piece.piece_type]
+            mg += count * weight_mg
+            eg += count * weight_eg
+        return (mg, eg)
+
+    def pawn_scores(self, board):
+        """
+        Returns a tuple (middlegame score, endgame score) with the pawn structure scores of the position, from the
+        white point of view. The scores only depend on the pawns, so they are looked up in the pawn cache with the
+        pawn_key of the board, and only computed when the pawn structure was never met before.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be evaluated.
+        """
+        scores = self.pawn_cache.get(board.pawn_key)
+        if scores == None:
+            white_mg, white_eg = self.pawn_structure(board, 'White')
+            black_mg, black_eg = self.pawn_structure(board, 'Black')
+            scores = (white_mg - black_mg, white_eg - black_eg)
+            self.pawn_cache.put(board.pawn_key, scores)
+        return scores
+
+    def pawn_structure(self, board, color):
+        """
+        Returns a tuple (middlegame score, endgame score) with the pawn structure scores of a given color :
+        penalties for doubled and isolated pawns, and bonuses for passed pawns.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be evaluated.
+            color : str
+                The color of the pawns to be evaluated.
+        """
+        own = {} # For each file (1 to 8), the list of the lines of the pawns of the color
+        other = {} # For each file, the list of the lines of the opponent pawns
+        for ref, square in board.squares.items():
+            piece = square.piece
+            if piece != None and piece.piece_type == 'P':
+                pawns = own if piece.color == color else other
+                pawns.setdefault(' abcdefgh'.index(ref[0]), []).append(int(ref[1]))
+
+        mg, eg = 0, 0
+        for file, lines in own.items():
+            if len(lines) > 1: # Doubled pawns
+                mg -= (len(lines) - 1) * self.doubled_penalty[0]
+                eg -= (len(lines) - 1) * self.doubled_penalty[1]
+            if file - 1 not in own and file + 1 not in own: # Isolated pawns
+                mg -= len(lines) * self.isolated_penalty[0]
+                eg -= len(lines) * self.isolated_penalty[1]
+            for line in lines: # Passed pawns : no opponent pawn in front of it on the same or adjacent files
+                passed = True
+                for other_file in (file - 1, file, file + 1):
+                    for other_line in other.get(other_file, []):
+                        if (color == 'White' and other_line > line) or (color == 'Black' and other_line < line):
+                            passed = False
+                if passed:
+                    relative_line = line if color == 'White' else 9 - line
+                    mg += self.passed_bonus[relative_line][0]
+                    eg += self.passed_bonus[relative_line][1]
+        return (mg, eg)
+
+    def king_safety(self, board, color):
+        """
+        Returns the middlegame king safety score of a given color : a bonus for the pawns sheltering the king,
+        a penalty for the files around the king without any pawn of its color, and a penalty for each square
+        around the king attacked by the opponent.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position to be evaluated.
+            color : str
+                The color of the king to be evaluated.
+        """
+        king = board.king_squares.get(color)
+        if king == None:
+            return 0
+        other_color = board.opponents[color]
+        squares = board.squares
+        forward = 1 if color == 'White' else -1
+        row = ' abcdefgh'.index(king[0])
+        line = int(king[1])
+
+        score = 0
+        for file in range(max(row - 1, 1), min(row + 1, 8) + 1):
+            has_pawn = False
+            for step in (1, 2): # Pawn shield : the 2 squares in front of the king on the king file and adjacent files
+                shield_line = line + forward * step
+                if 1 <= shield_line <= 8:
+                    piece = squares['abcdefgh'[file - 1] + str(shield_line)].piece
+                    if piece != None and piece.piece_type == 'P' and piece.color == color:
+                        score += self.shield_bonus // step
+            for shield_line in range(1, 9): # Open files around the king
+                piece = squares['abcdefgh'[file - 1] + str(shield_line)].piece
+                if piece != None and piece.piece_type == 'P' and piece.color == color:
+                    has_pawn = True
+                    break
+            if not has_pawn:
+                score -= self.open_file_penalty
+
+        for target in board.king_targets[king]: # King zone attacked by the opponent
+            if board.is_attacked(target, other_color):
+                score -= self.king_zone_penalty
+        return score
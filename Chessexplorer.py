@@ -0,0 +1,263 @@
+from Chessboard import *
+from Chesspgn import *
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+class Chessexplorer:
+    """
+    A class to answer "opening explorer" queries : for a position, the moves played in a pgn archive, how often,
+    and with which results.
+
+    ...
+
+    The games are replayed once, when they are added, and the statistics are grouped by position key (the Zobrist key
+    of the Chessboard) and move, in a table file : a header followed by fixed-size records (key, move code, white wins,
+    draws, black wins) sorted by key and move. A query is a binary search of the position key in the memory-mapped
+    table, so it never replays any game.
+    New pgn files are added incrementally : their statistics are aggregated in memory, spilled to sorted temporary
+    runs when there are too many of them, and merged with the existing table in a single streaming pass.
+
+    Attributes
+    ----------
+    file : str
+        The path of the table file.
+    max_plies : int or None
+        The number of plies of each game taken into account (None for the whole games).
+    records : int
+        The number of (position, move) records of the table.
+
+    Methods
+    -------
+    add_games(self, files, french = False, max_entries = 1000000):
+        Replays the games of pgn files and merges their statistics in the table.
+
+    query(self, position):
+        Returns the moves played in a position with their statistics.
+
+    close(self):
+        Closes the table file.
+    """
+
+    record = struct.Struct('<QH3I') # Position key, move code, white wins, draws, black wins
+    magic = b'CHSX\x01' # First bytes of a table file (version 1)
+    score_codes = {'1-0': 0, '1/2-1/2': 1, '0-1': 2}
+
+    def __init__(self, file, max_plies = 40):
+        """
+        Instantiate a Chessexplorer object on a table file. The file is created by the first call to add_games.
+
+        Parameters
+        ----------
+            file : str
+                The path of the table file.
+            max_plies : int or None
+                The number of plies of each game taken into account when games are added (None for the whole games).
+                Default is 40.
+        """
+        self.file = file
+        self.max_plies = max_plies
+        self.stream = None
+        self.map = None
+        self.records = 0
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _open(self):
+        """
+        Maps the table file in memory, if it exists.
+        """
+        self.close()
+        if not os.path.exists(self.file):
+            return
+        self.stream = open(self.file, 'rb')
+        if self.stream.read(len(Chessexplorer.magic)) != Chessexplorer.magic:
+            self.stream.close()
+            self.stream = None
+            raise ValueError(self.file + ' is not an explorer table')
+        size = os.path.getsize(self.file)
+        self.records = (size - len(Chessexplorer.magic)) // Chessexplorer.record.size
+        if self.records:
+            self.map = mmap.mmap(self.stream.fileno(), 0, access = mmap.ACCESS_READ)
+
+    def close(self):
+        """
+        Closes the table file.
+        """
+        if self.map != None:
+            self.map.close()
+            self.map = None
+        if self.stream != None:
+            self.stream.close()
+            self.stream = None
+        self.records = 0
+
+    def _key_at(self, index):
+        """
+        Returns the position key of a record of the table.
+        """
+        return struct.unpack_from('<Q', self.map, len(Chessexplorer.magic) + index * Chessexplorer.record.size)[0]
+
+    def _read_table(self):
+        """
+        Returns the records of the table one after the other, as tuples (key, code, white, draws, black).
+        """
+        for index in range(self.records):
+            yield Chessexplorer.record.unpack_from(self.map, len(Chessexplorer.magic) + index * Chessexplorer.record.size)
+
+    @staticmethod
+    def _read_run(file):
+        """
+        Returns the records of a sorted temporary run one after the other.
+        """
+        with open(file, 'rb') as stream:
+            while True:
+                data = stream.read(Chessexplorer.record.size * 4096)
+                if not data:
+                    break
+                yield from Chessexplorer.record.iter_unpack(data)
+
+    @staticmethod
+    def _write_run(counts):
+        """
+        Writes aggregated statistics, sorted by key and move, in a temporary run file and returns its path.
+        """
+        descriptor, path = tempfile.mkstemp(suffix = '.run')
+        with os.fdopen(descriptor, 'wb', buffering = 1 << 16) as stream:
+            for (key, code), scores in sorted(counts.items()):
+                stream.write(Chessexplorer.record.pack(key, code, *scores))
+        return path
+
+    def add_games(self, files, french = False, max_entries = 1000000):
+        """
+        Replays the games of pgn files and merges their statistics in the table. A game is replayed until its first
+        move that cannot be executed. Games without a result are ignored.
+        Returns a dictionnary with the number of games added, of games ignored, and of records of the new table.
+
+        Parameters
+        ----------
+            files : list of str
+                The paths of the pgn files.
+            french : bool
+                To be set to True if the games are in french notations.
+                Default is False.
+            max_entries : int
+                The number of (position, move) statistics kept in memory before they are written in a sorted
+                temporary run, which bounds the memory used for large archives.
+                Default is 1000000.
+        """
+        counts, runs = {}, []
+        added, ignored = 0, 0
+        try:
+            for file in files:
+                for game in Chesspgn.read_games(file, french = french):
+                    score = Chessexplorer.score_codes.get(game['result'])
+                    if score == None:
+                        ignored += 1
+                        continue
+                    board = Chessboard()
+                    for ref in game['moves'][:self.max_plies]:
+                        try:
+                            move = board.parse_move(ref)
+                        except MoveError:
+                            break
+                        entry = counts.get((board.key, move.to_code()))
+                        if entry == None:
+                            entry = counts[(board.key, move.to_code())] = [0, 0, 0]
+                        entry[score] += 1
+                        board.make_move(*move)
+                    added += 1
+                    if len(counts) >= max_entries:
+                        runs.append(Chessexplorer._write_run(counts))
+                        counts = {}
+            if counts or not runs:
+                runs.append(Chessexplorer._write_run(counts))
+            self._merge([Chessexplorer._read_run(run) for run in runs])
+        finally:
+            for run in runs:
+                os.remove(run)
+        return {'games': added, 'ignored': ignored, 'records': self.records}
+
+    def _merge(self, runs):
+        """
+        Merges sorted runs of records with the table, adding the statistics of the same position and move,
+        and replaces the table file by the result.
+        """
+        sources = list(runs)
+        if self.records:
+            sources.append(self._read_table())
+        path = self.file + '.tmp'
+        with open(path, 'wb', buffering = 1 << 16) as stream:
+            stream.write(Chessexplorer.magic)
+            current = None
+            for record in heapq.merge(*sources):
+                if current != None and record[0] == current[0] and record[1] == current[1]: # Same position and move
+                    current[2] += record[2]
+                    current[3] += record[3]
+                    current[4] += record[4]
+                    continue
+                if current != None:
+                    stream.write(Chessexplorer.record.pack(*current))
+                current = list(record)
+            if current != None:
+                stream.write(Chessexplorer.record.pack(*current))
+        self.close()
+        os.replace(path, self.file)
+        self._open()
+
+    def query(self, position):
+        """
+        Returns the moves played in a position, from the most to the least played : a list of dictionnaries with
+        the move in standard algebraic notation, the number of games, of white wins, draws and black wins,
+        and the score in percent for the player to move.
+
+        Parameters
+        ----------
+            position : Chessboard object or str
+                The position, as a board or as its Forsyth–Edwards Notation (FEN).
+        """
+        board = Chessboard(fen = position) if isinstance(position, str) else position
+        key = board.key
+        low, high = 0, self.records
+        while low < high: # First record of the key
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        result = []
+        legal = None
+        for index in range(low, self.records):
+            record_key, code, white, draws, black = Chessexplorer.record.unpack_from(
+                self.map, len(Chessexplorer.magic) + index * Chessexplorer.record.size)
+            if record_key != key:
+                break
+            if legal == None:
+                legal = board.legal_moves()
+            games = white + draws + black
+            wins = white if board.turn == 'White' else black
+            result.append({'move': board.to_san(Chessmove.from_code(code), legal = legal), 'games': games,
+                           'white': white, 'draws': draws, 'black': black,
+                           'score': round(100 * (wins + draws / 2) / games, 1)})
+        result.sort(key = lambda entry: entry['games'], reverse = True)
+        return result
+
+
+if __name__ == "__main__":
+    import sys
+    explorer = Chessexplorer(sys.argv[1])
+    if sys.argv[2] == 'add':
+        print(explorer.add_games(sys.argv[3:]))
+    else: # query followed by a FEN, or nothing for the initial position
+        board = Chessboard(fen = ' '.join(sys.argv[3:])) if len(sys.argv) > 3 else Chessboard()
+        for entry in explorer.query(board):
+            print('%-8s %8d games  +%d =%d -%d  %5.1f %%' % (entry['move'], entry['games'], entry['white'],
+                                                          entry['draws'], entry['black'], entry['score']))
+    explorer.close()
@@ -1,4 +1,5 @@
 from Chessboard import *
+from Chesspgn import *
 import time
 
 class Chessgame():
@@ -26,6 +27,8 @@ class Chessgame():
     playgame(self,timer=3):
         Simulate the execution of the game on a Chessboard object, prints each move reference and the visualisation
         of the board after each move.
+    write_pgn(self, pgn, **tags):
+        Replays the game and writes it with a Chesspgn object, in standard algebraic notation.
     """
 
     def __init__(self, file = None, french = False):
@@ -106,7 +109,28 @@ class Chessgame():
             time.sleep(timer)  
         print(self.result) # Finishing the execution by printing the result.
 
+    def write_pgn(self, pgn, **tags):
+        """
+        Replays the game on a Chessboard object and writes it with a Chesspgn object.
+        The moves are written in standard algebraic notation, whatever the notation of the file they were read from.
+        If a move cannot be executed, the game is written until this move, with an unknown result.
 
-
-
-
+        Parameters
+        ----------
+            pgn : Chesspgn object
+                The writer of the pgn file.
+            tags : dict of str: str
+                The tags of the game (e.g. White = 'Carlsen', Black = 'Nakamura').
+        """
+        board = Chessboard()
+        pgn.begin_game(**tags)
+        result = self.result if self.result in Chesspgn.results else '*'
+        for ref in self.moves:
+            try:
+                move = board.parse_move(ref)
+            except MoveError:
+                result = '*'
+                break
+            pgn.add_move(board.to_san(move))
+            board.make_move(*move)
+        pgn.end_game(result = result)
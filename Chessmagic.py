@@ -0,0 +1,318 @@
+from Chessprecomputed import *
+from array import array
+import random
+
+rook_directions = ((1, 0), (-1, 0), (0, 1), (0, -1))
+bishop_directions = ((1, 1), (-1, 1), (1, -1), (-1, -1))
+magics_version = 1 # Version of the cached tables, to be increased when the way they are built changes
+
+# Magic multipliers of the squares a1 to h8, found by find_magics (python Chessmagic.py prints them again)
+rook_magics = (
+    0x0080002480144001, 0x0140004120001000, 0x82002080100a0040, 0x06000810060060c0,
+    0x2080020400800800, 0x0200104442000108, 0x0200020004008108, 0x4480005021000080,
+    0x4000800592604000, 0x0004808020004000, 0x0010801008802000, 0x0808801001080080,
+    0x8002000520100a00, 0x0100800200040080, 0x0804003002211854, 0xc422800300004480,
+    0x4020008080004000, 0x0090044020084000, 0x0080888010002000, 0x8000848008001000,
+    0x088800800a800400, 0x2104008004800200, 0x0300040082300118, 0x0148020004218053,
+    0x0608400180007088, 0x2100200440005000, 0x3020200100401102, 0x0060100080800800,
+    0x8000110100080004, 0x0121002300040008, 0x0100880c001a9001, 0x000084020020c483,
+    0x08c0008050800022, 0x0000802000804009, 0x4410002000801080, 0x400100100300204a,
+    0xd09080a401800800, 0x0042008002801400, 0x0040024104000810, 0x2004088042001405,
+    0x0a00802040008002, 0x2020402010004000, 0x0010008120018010, 0x1050008008008010,
+    0x0820080004008080, 0x1042040002008080, 0x1000011002040008, 0x0041000040810022,
+    0x80c0002040800080, 0x1609018021520200, 0x0031004010200100, 0x0418100008008080,
+    0x0200480100100500, 0x0008800200040080, 0x0081000c06000300, 0x0018191151840200,
+    0x0080081080402101, 0x430e004100201082, 0x8004430010082001, 0x0001000a20041001,
+    0x2082005108442002, 0x800d008204000801, 0x000001100a0818c4, 0x0001008400205102,
+)
+bishop_magics = (
+    0x00022084150a0021, 0x0024810805010001, 0x8108220423a02008, 0x2054040388211004,
+    0x80042c2010020002, 0x0010821041200022, 0x2004308404600102, 0x0202021104010401,
+    0x0200040810041098, 0x02f04881210c1900, 0x4530904100410000, 0x0508040400910040,
+    0x00000110400041a0, 0x2000220213210005, 0x9180008404034002, 0x0100008441082028,
+    0x0040072082424203, 0xe0985060920c2440, 0x1050000800204010, 0x8018403024004000,
+    0x0044004080e00000, 0x0088108080442008, 0x2000860414010821, 0x0040200101082200,
+    0x0a60202004a43400, 0x0408200002021210, 0x04080200610c0500, 0xc001080021004100,
+    0xc818840000802001, 0x1101004088080800, 0x2404108121249020, 0x5182002100441200,
+    0x2001201210200404, 0x8188118401500400, 0x2104020100080044, 0x1001020084d80080,
+    0x0004140400101100, 0x4810060088160090, 0x2021881683060a00, 0x0020c505004a0090,
+    0x0008095028029008, 0x4810884108101040, 0x0801008040408400, 0x2121051144000802,
+    0x4000240102100400, 0x4040011401000021, 0x80620852048a2400, 0x0004840c00240040,
+    0x1004008808888008, 0x02550484c42018c4, 0x0001408048083001, 0x2000004442021408,
+    0x4021004930240800, 0x0411081001220000, 0x0644a81821040272, 0x10480a0c24202000,
+    0x0210808048200404, 0x00800a00650c1000, 0x0501040206010424, 0x0002010010420200,
+    0x1a00000048112400, 0x006020c030128080, 0x0800080841080a01, 0x82022082020e0121,
+)
+
+
+def _slider_attacks(index, occupied, directions):
+    """
+    Returns the bitboard of the squares attacked by a sliding piece on a square (index 0 for a1 to 63 for h8),
+    computed by walking its rays until the first occupied square. Used to build and verify the magic tables.
+    """
+    row, line = index % 8, index // 8
+    result = 0
+    for dr, dl in directions:
+        r, l = row + dr, line + dl
+        while 0 <= r < 8 and 0 <= l < 8:
+            result |= 1 << (l * 8 + r)
+            if occupied >> (l * 8 + r) & 1:
+                break
+            r, l = r + dr, l + dl
+    return result
+
+
+def _relevant_mask(index, directions):
+    """
+    Returns the bitboard of the squares whose occupancy changes the attacks of a sliding piece on a square :
+    its rays without their last square (the attacks of a ray are the same whether its last square is occupied or not).
+    """
+    row, line = index % 8, index // 8
+    result = 0
+    for dr, dl in directions:
+        r, l = row + dr, line + dl
+        while 0 <= r + dr < 8 and 0 <= l + dl < 8:
+            result |= 1 << (l * 8 + r)
+            r, l = r + dr, l + dl
+    return result
+
+
+def _subsets(mask):
+    """
+    Returns all the subsets of the bits of a mask (the occupancies of its squares), starting with 0.
+    """
+    result = [0]
+    subset = (0 - mask) & mask
+    while subset:
+        result.append(subset)
+        subset = (subset - mask) & mask
+    return result
+
+
+def _find_magic(index, directions, generator):
+    """
+    Returns a magic multiplier for a sliding piece on a square, found by trial of sparse random numbers : it maps each
+    relevant occupancy to a distinct index of the table, or to an index whose attacks are the same.
+    """
+    mask = _relevant_mask(index, directions)
+    shift = 64 - bin(mask).count('1')
+    occupancies = _subsets(mask)
+    attacks = [_slider_attacks(index, occupied, directions) for occupied in occupancies]
+    table = [0] * (1 << (64 - shift))
+    epochs = [0] * (1 << (64 - shift)) # Trial in which each entry of the table was written
+    epoch = 0
+    while True:
+        magic = generator.getrandbits(64) & generator.getrandbits(64) & generator.getrandbits(64)
+        if bin((mask * magic) & 0xFF00000000000000).count('1') < 6: # Not enough high bits : bad candidate
+            continue
+        epoch += 1
+        for occupied, attacked in zip(occupancies, attacks):
+            position = ((occupied * magic) & 0xFFFFFFFFFFFFFFFF) >> shift
+            if epochs[position] != epoch:
+                epochs[position] = epoch
+                table[position] = attacked
+            elif table[position] != attacked:
+                break
+        else:
+            return magic
+
+
+def find_magics(seed = 20211107):
+    """
+    Returns a tuple (rook magics, bishop magics) with the magic multipliers of the 64 squares, searched from a seed.
+    The search takes about 20 seconds, which is why its result is stored in the rook_magics and bishop_magics constants.
+
+    Parameters
+    ----------
+        seed : int
+            The seed of the random generator.
+            Default is 20211107.
+    """
+    generator = random.Random(seed)
+    return tuple(tuple(_find_magic(index, directions, generator) for index in range(64))
+                 for directions in (rook_directions, bishop_directions))
+
+
+def _build_magics():
+    """
+    Returns the magic bitboard tables of the rooks and the bishops, in a list of arrays : for each of the two sliders
+    the masks, magic multipliers, shifts and offsets of the 64 squares, and the attack table of all the squares.
+    The attacks of each relevant occupancy are computed by walking the rays, and stored at the index given by
+    the magic multiplier. The tables are verified before being returned.
+    """
+    tables = []
+    for directions, slider_magics in ((rook_directions, rook_magics), (bishop_directions, bishop_magics)):
+        masks, magics, shifts, offsets, attacks = array('Q'), array('Q', slider_magics), array('B'), array('I'), array('Q')
+        for index in range(64):
+            mask = _relevant_mask(index, directions)
+            shift = 64 - bin(mask).count('1')
+            table = [0] * (1 << (64 - shift))
+            for occupied in _subsets(mask):
+                table[((occupied * magics[index]) & 0xFFFFFFFFFFFFFFFF) >> shift] = _slider_attacks(index, occupied, directions)
+            masks.append(mask)
+            shifts.append(shift)
+            offsets.append(len(attacks))
+            attacks.extend(table)
+        tables += [masks, magics, shifts, offsets, attacks]
+    _verify(tables)
+    return tables
+
+
+def _verify(tables, squares = range(64)):
+    """
+    Checks that the magic lookups give the same attacks as the ray walks for all the relevant occupancies of
+    the squares (all of them by default), and raises a ValueError otherwise.
+    """
+    for slider, directions in enumerate((rook_directions, bishop_directions)):
+        masks, magics, shifts, offsets, attacks = tables[5 * slider:5 * slider + 5]
+        for index in squares:
+            for occupied in _subsets(masks[index]):
+                position = offsets[index] + (((occupied * magics[index]) & 0xFFFFFFFFFFFFFFFF) >> shifts[index])
+                if attacks[position] != _slider_attacks(index, occupied, directions):
+                    raise ValueError('wrong magic bitboard attacks for the square %d' % index)
+
+
+def _check_magics(tables, samples = 4):
+    """
+    Returns True if tables read from the cache file are those that _build_magics returns : the magic multipliers,
+    masks, shifts, offsets and table sizes are compared with those of the current constants, and the attacks of
+    a few random squares are verified against the ray walks.
+    """
+    if len(tables) != 10:
+        return False
+    for slider, (directions, slider_magics) in enumerate(((rook_directions, rook_magics), (bishop_directions, bishop_magics))):
+        masks, magics, shifts, offsets, attacks = tables[5 * slider:5 * slider + 5]
+        size = 0
+        for index in range(64):
+            mask = _relevant_mask(index, directions)
+            if masks[index] != mask or magics[index] != slider_magics[index] or shifts[index] != 64 - bin(mask).count('1') \
+                    or offsets[index] != size:
+                return False
+            size += 1 << bin(mask).count('1')
+        if len(masks) != 64 or len(magics) != 64 or len(shifts) != 64 or len(offsets) != 64 or len(attacks) != size:
+            return False
+    try:
+        _verify(tables, squares = random.sample(range(64), samples))
+    except ValueError:
+        return False
+    return True
+
+
+class Chessmagic:
+    """
+    A class holding the magic bitboard tables of the sliding pieces, to get their attacks without walking their rays.
+
+    ...
+
+    The squares are indexed from 0 (a1) to 63 (h8), as in Chessmove.square_index, and a bitboard is an integer with
+    one bit per square. The attacks of a rook or a bishop on a square only depend on the occupancy of a few squares
+    (its mask). Multiplied by the magic number of the square and shifted, this occupancy gives the index of the attacks
+    in the table : a mask, a multiply, a shift and a lookup, whatever the number of pieces on the board.
+    The tables are built once from the magic multipliers (less than a second), verified, and then read from a cache
+    file by the next runs, which check them against the multipliers and verify a few squares.
+
+    Attributes
+    ----------
+    rook_masks, rook_magics, rook_shifts, rook_offsets, rook_table : list of int
+        The masks, magic multipliers, shifts and offsets in the table of each square, and the attacks table of the rooks
+        (lists rather than arrays, which are slower to index).
+    bishop_masks, bishop_magics, bishop_shifts, bishop_offsets, bishop_table : list of int
+        The same tables for the bishops.
+    square_bits : dict of str: int
+        The bitboard of each square reference.
+
+    Methods
+    -------
+    rook_attacks(index, occupied):
+        Returns the bitboard of the squares attacked by a rook.
+
+    bishop_attacks(index, occupied):
+        Returns the bitboard of the squares attacked by a bishop.
+
+    queen_attacks(index, occupied):
+        Returns the bitboard of the squares attacked by a queen.
+
+    refs(bitboard):
+        Returns the references of the squares of a bitboard.
+    """
+
+    (rook_masks, rook_magics, rook_shifts, rook_offsets, rook_table,
+     bishop_masks, bishop_magics, bishop_shifts, bishop_offsets, bishop_table) = \
+        [table.tolist() for table in load_tables('magics', magics_version, _build_magics, check = _check_magics)]
+    square_refs = ['abcdefgh'[index % 8] + str(index // 8 + 1) for index in range(64)]
+    square_bits = {ref: 1 << index for index, ref in enumerate(square_refs)}
+    ref_lists = {} # References of the squares of the bitboards already converted (a few thousands attack sets)
+
+    @staticmethod
+    def rook_attacks(index, occupied):
+        """
+        Returns the bitboard of the squares attacked by a rook, including the occupied squares which stop its rays.
+
+        Parameters
+        ----------
+            index : int
+                The index of the square of the rook (0 for a1 to 63 for h8).
+            occupied : int
+                The bitboard of the occupied squares.
+        """
+        return Chessmagic.rook_table[Chessmagic.rook_offsets[index] +
+            (((occupied & Chessmagic.rook_masks[index]) * Chessmagic.rook_magics[index] & 0xFFFFFFFFFFFFFFFF) >> Chessmagic.rook_shifts[index])]
+
+    @staticmethod
+    def bishop_attacks(index, occupied):
+        """
+        Returns the bitboard of the squares attacked by a bishop, including the occupied squares which stop its rays.
+
+        Parameters
+        ----------
+            index : int
+                The index of the square of the bishop (0 for a1 to 63 for h8).
+            occupied : int
+                The bitboard of the occupied squares.
+        """
+        return Chessmagic.bishop_table[Chessmagic.bishop_offsets[index] +
+            (((occupied & Chessmagic.bishop_masks[index]) * Chessmagic.bishop_magics[index] & 0xFFFFFFFFFFFFFFFF) >> Chessmagic.bishop_shifts[index])]
+
+    @staticmethod
+    def queen_attacks(index, occupied):
+        """
+        Returns the bitboard of the squares attacked by a queen, including the occupied squares which stop its rays.
+
+        Parameters
+        ----------
+            index : int
+                The index of the square of the queen (0 for a1 to 63 for h8).
+            occupied : int
+                The bitboard of the occupied squares.
+        """
+        return Chessmagic.rook_attacks(index, occupied) | Chessmagic.bishop_attacks(index, occupied)
+
+    @staticmethod
+    def refs(bitboard):
+        """
+        Returns a tuple with the references of the squares of a bitboard, from a1 to h8. The tuples are cached, as
+        the attack sets of the sliding pieces are only a few thousands.
+
+        Parameters
+        ----------
+            bitboard : int
+                The bitboard.
+        """
+        result = Chessmagic.ref_lists.get(bitboard)
+        if result == None:
+            refs = []
+            remaining = bitboard
+            while remaining:
+                bit = remaining & -remaining
+                refs.append(Chessmagic.square_refs[bit.bit_length() - 1])
+                remaining ^= bit
+            result = Chessmagic.ref_lists[bitboard] = tuple(refs)
+        return result
+
+
+if __name__ == "__main__":
+    for name, magics in zip(('rook_magics', 'bishop_magics'), find_magics()):
+        print(name + ' = (')
+        for index in range(0, 64, 4):
+            print('    ' + ', '.join('0x%016x' % magic for magic in magics[index:index + 4]) + ',')
+        print(')')
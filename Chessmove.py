@@ -0,0 +1,113 @@
+from collections import namedtuple
+
+class Chessmove(namedtuple('Chessmove', ['origin', 'destination', 'promote'])):
+    """
+    A class to represent a move on a Chessboard.
+    A Chessmove object is an immutable tuple, so it can be compared, hashed and stored in dictionaries.
+
+    ...
+
+    Attributes
+    ----------
+    origin : str
+        The reference of the origin square of the move
+    destination : str
+        The reference of the destination square of the move
+    promote : str or None
+        The piece_type chosen in case of pawn promotion, if any.
+
+    Castling is represented by the move of the king (e.g. 'e1' to 'g1' for a white small castling).
+    """
+
+    __slots__ = ()
+
+    square_index = {row + str(line): (line - 1) * 8 + index for index, row in enumerate('abcdefgh') for line in range(1, 9)}
+    square_refs = {index: ref for ref, index in square_index.items()}
+    promote_codes = {None: 0, 'Q': 1, 'R': 2, 'B': 3, 'N': 4}
+    promote_types = {code: piece_type for piece_type, code in promote_codes.items()}
+
+    def __new__(cls, origin, destination, promote = None):
+        """
+        Instantiate a Chessmove object.
+
+        Parameters
+        ----------
+            origin : str
+                The reference of the origin square of the move
+            destination : str
+                The reference of the destination square of the move
+            promote : str or None
+                The piece_type chosen in case of pawn promotion, if any.
+                Default is None
+        """
+        return super().__new__(cls, origin, destination, promote)
+
+    def __str__(self):
+        """
+        Called by the str() built-in function and by the print statement to compute the “informal” string representation
+        of the Chessmove object.
+        Returns the move in long algebraic notation, as used by chess engines (e.g. 'e2e4' or 'e7e8q').
+        """
+        if self.promote != None:
+            return self.origin + self.destination + self.promote.lower()
+        return self.origin + self.destination
+
+    @classmethod
+    def from_uci(cls, text):
+        """
+        Returns the Chessmove object of a move given in long algebraic notation, as used by chess engines
+        (e.g. 'e2e4', 'e1g1' for a castling or 'e7e8q' for a promotion).
+
+        Parameters
+        ----------
+            text : str
+                The move in long algebraic notation.
+        """
+        return cls(text[:2], text[2:4], text[4].upper() if len(text) > 4 else None)
+
+    def to_code(self):
+        """
+        Returns the move encoded in a 16-bit integer : the index of the origin square in bits 0 to 5,
+        the index of the destination square in bits 6 to 11 and the promotion in bits 12 to 14.
+        The index of a square is 0 for 'a1', 1 for 'b1', ..., 63 for 'h8'.
+        """
+        return Chessmove.square_index[self.origin] | Chessmove.square_index[self.destination] << 6 \
+               | Chessmove.promote_codes[self.promote] << 12
+
+    @classmethod
+    def from_code(cls, code):
+        """
+        Returns the Chessmove object of a move encoded by to_code.
+
+        Parameters
+        ----------
+            code : int
+                The move encoded in a 16-bit integer.
+        """
+        return cls(Chessmove.square_refs[code & 0x3F], Chessmove.square_refs[code >> 6 & 0x3F],
+                   Chessmove.promote_types[code >> 12 & 0x7])
+
+
+class MoveError(ValueError):
+    """
+    The base class of the errors raised when a move written in algebraic notation cannot be executed.
+    The message of the error is the one printed to the player.
+    """
+
+
+class NotationError(MoveError):
+    """
+    Raised when a move reference is not written in algebraic or long algebraic notation.
+    """
+
+
+class IllegalMoveError(MoveError):
+    """
+    Raised when a move reference is well written but no legal move of the position matches it.
+    """
+
+
+class AmbiguousMoveError(MoveError):
+    """
+    Raised when a move reference matches several legal moves of the position (missing disambiguation).
+    """
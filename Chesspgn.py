@@ -0,0 +1,363 @@
+import re
+
+class Chesspgn:
+    """
+    A class to write chess games in a pgn file, one after the other.
+    For more information on the pgn format : https://en.wikipedia.org/wiki/Portable_Game_Notation
+
+    ...
+
+    The games are streamed to the file : only the moves of the current game are kept in memory, and the file is written
+    with a large buffer, so that millions of games can be exported by self-play pipelines.
+    A live game (begin_game with live = True) is written move after move instead, and flushed after each move, so that
+    a game being played is not lost if the program is killed : its tags are written first with an unknown result,
+    and end_game replaces it in the file with the complete game.
+    Each game has the seven standard tags (Event, Site, Date, Round, White, Black, Result), any additional tag,
+    a Termination tag giving the reason why the game ended, and its moves wrapped to the standard line length.
+
+    Attributes
+    ----------
+    file : str
+        The path of the pgn file.
+    line_length : int
+        The maximum length of the lines of the moves.
+    games : int
+        The number of games written since the creation of the object.
+
+    Methods
+    -------
+    begin_game(self, fen = None, live = False, **tags):
+        Starts a new game with its tags.
+
+    add_move(self, ref, nag = None, comment = None):
+        Adds a move in standard algebraic notation to the current game, with its annotations.
+
+    end_game(self, result = '*', termination = None):
+        Writes the current game in the file, with its result and the reason why it ended.
+
+    write_game(self, moves, result = '*', termination = None, fen = None, **tags):
+        Writes a complete game in the file.
+
+    flush(self):
+        Writes the buffered games in the file.
+
+    close(self):
+        Writes the buffered games and closes the file.
+
+    read_games(file, french = False):
+        Reads the games of a pgn file one after the other (static method).
+
+    parse_movetext(text, french = False):
+        Returns the moves and the result of the movetext of a game (static method).
+    """
+
+    seven_tags = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+    results = ('1-0', '0-1', '1/2-1/2', '*')
+    terminations = ('normal', 'adjudication', 'time forfeit', 'abandoned', 'rules infraction', 'unterminated')
+    tag_pattern = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]$')
+    comment_pattern = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+')
+    variation_pattern = re.compile(r'\([^()]*\)')
+    number_pattern = re.compile(r'^\d+\.+')
+
+    def __init__(self, file, mode = 'a', line_length = 80, buffering = 1 << 16):
+        """
+        Instantiate a Chesspgn object and opens the pgn file.
+
+        Parameters
+        ----------
+            file : str
+                The path of the pgn file.
+            mode : str
+                'a' to add the games at the end of the file, 'w' to replace its content.
+                Default is 'a'.
+            line_length : int
+                The maximum length of the lines of the moves.
+                Default is 80.
+            buffering : int
+                The size in bytes of the write buffer of the file.
+                Default is 65536.
+        """
+        self.file = file
+        self.line_length = line_length
+        self.stream = open(file, mode, buffering = buffering, encoding = 'utf-8')
+        self.games = 0
+        self.tags = None
+        self.moves = None
+        self.annotations = None
+        self.fen = None
+        self.live = False
+        self.offset = None # Position in the file of the live game
+        self.line = '' # Last line of the moves of the live game, and its position in the file
+        self.line_offset = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def begin_game(self, fen = None, live = False, **tags):
+        """
+        Starts a new game. The game is written in the file by end_game.
+
+        Parameters
+        ----------
+            fen : str or None
+                The Forsyth–Edwards Notation (FEN) of the initial position, if the game does not start
+                from the standard initial position. It is written in the SetUp and FEN tags.
+                Default is None.
+            live : bool
+                If True, the tags are written in the file now and each move is written as soon as it is added,
+                so that the game being played can be recovered if the program is killed. The game is rewritten
+                with its result by end_game.
+                Default is False.
+            tags : dict of str: str
+                The tags of the game (e.g. White = 'Carlsen', Black = 'Computer', WhiteElo = '2850').
+                The seven standard tags that are not given are set to their unknown values ('?' or '????.??.??').
+        """
+        self.tags = {'Event': '?', 'Site': '?', 'Date': '????.??.??', 'Round': '?',
+                     'White': '?', 'Black': '?', 'Result': '*'}
+        self.tags.update((name, str(value)) for name, value in tags.items())
+        if fen != None:
+            self.tags['SetUp'] = '1'
+            self.tags['FEN'] = fen
+        self.fen = fen
+        self.moves = []
+        self.annotations = {}
+        self.live = live
+        if live: # The game is written without a result for now, it is completed by end_game
+            self.stream.flush()
+            self.offset = self.stream.tell()
+            self.stream.write('\n'.join(self._tag_lines()) + '\n\n')
+            self.line = ''
+            self.line_offset = self.stream.tell()
+            self.stream.flush()
+
+    def add_move(self, ref, nag = None, comment = None):
+        """
+        Adds a move to the current game.
+
+        Parameters
+        ----------
+            ref : str
+                The reference of the move in standard algebraic notation (as returned by Chessboard.to_san).
+            nag : int or None
+                The numeric annotation glyph of the move (e.g. 2 for '?', 4 for '??'), written after the move as '$2'.
+                Default is None.
+            comment : str or None
+                The comment written after the move, between braces (e.g. '+0.35').
+                Default is None.
+        """
+        self.moves.append(ref)
+        if nag != None or comment != None:
+            self.annotations[len(self.moves) - 1] = (nag, comment)
+        if self.live: # The last line of the moves is rewritten with the tokens of the move, so that the file ends with a new line
+            lines = []
+            line = self.line
+            for token in self._move_tokens(len(self.moves) - 1):
+                line = self._wrap(line, token, lines)
+            self.stream.seek(self.line_offset)
+            self.stream.truncate()
+            self.stream.write(''.join(text + '\n' for text in lines))
+            self.line_offset = self.stream.tell()
+            self.stream.write(line + '\n')
+            self.line = line
+            self.stream.flush()
+
+    def end_game(self, result = '*', termination = None):
+        """
+        Writes the current game in the file : the tags, the moves wrapped to the line length, and the result.
+
+        Parameters
+        ----------
+            result : str
+                The result of the game : '1-0', '0-1', '1/2-1/2', or '*' if the game is not finished.
+                Default is '*'.
+            termination : str or None
+                The reason why the game ended, written in the Termination tag (e.g. 'normal', 'adjudication',
+                'abandoned', 'unterminated'). If None, it is 'normal' for a finished game and 'unterminated' otherwise.
+                Default is None.
+        """
+        if result not in Chesspgn.results:
+            raise ValueError('unknown result ' + result)
+        self.tags['Result'] = result
+        self.tags['Termination'] = termination if termination != None else ('unterminated' if result == '*' else 'normal')
+
+        lines = self._tag_lines()
+        lines.append('')
+        line = ''
+        for index in range(len(self.moves)):
+            for token in self._move_tokens(index):
+                line = self._wrap(line, token, lines)
+        line = self._wrap(line, result, lines)
+        lines.append(line)
+        lines.append('')
+
+        if self.live: # The game written without its result is replaced by the complete game
+            self.stream.seek(self.offset)
+            self.stream.truncate()
+        self.stream.write('\n'.join(lines) + '\n')
+        if self.live:
+            self.stream.flush()
+        self.games += 1
+        self.tags = None
+        self.moves = None
+        self.annotations = None
+        self.fen = None
+        self.live = False
+        self.offset = None
+        self.line = ''
+        self.line_offset = None
+
+    def _tag_lines(self):
+        """
+        Returns the lines of the tags of the current game. The seven standard tags come first, in their standard order.
+        """
+        names = [*Chesspgn.seven_tags, *(name for name in self.tags if name not in Chesspgn.seven_tags)]
+        return ['[%s "%s"]' % (name, self.tags[name].replace('\\', '\\\\').replace('"', '\\"')) for name in names]
+
+    def _move_tokens(self, index):
+        """
+        Returns the tokens written for a move of the current game : the move with its number, if needed,
+        followed by its numeric annotation glyph and the words of its comment, if any.
+        """
+        count, white = 1, True
+        if self.fen != None: # The move number and the player to move are read in the FEN
+            fields = self.fen.split()
+            white = len(fields) < 2 or fields[1] == 'w'
+            count = int(fields[5]) if len(fields) > 5 else 1
+        plies = index + (0 if white else 1) # Plies since the white move of the first move number
+        count += plies // 2
+        ref = self.moves[index]
+        if plies % 2 == 0:
+            tokens = ['%d. %s' % (count, ref)]
+        elif index == 0 or index - 1 in self.annotations: # Black move after the start or an annotation
+            tokens = ['%d... %s' % (count, ref)]
+        else:
+            tokens = [ref]
+        if index in self.annotations:
+            nag, comment = self.annotations[index]
+            if nag != None:
+                tokens.append('$%d' % nag)
+            if comment != None: # The comment may be wrapped between its words
+                tokens.extend(('{' + comment.replace('}', ')') + '}').split())
+        return tokens
+
+    def _wrap(self, line, token, lines):
+        """
+        Adds a token to the current line of the moves, or starts a new line if it would be too long.
+        Returns the new current line.
+        """
+        if not line:
+            return token
+        if len(line) + 1 + len(token) > self.line_length:
+            lines.append(line)
+            return token
+        return line + ' ' + token
+
+    def write_game(self, moves, result = '*', termination = None, fen = None, **tags):
+        """
+        Writes a complete game in the file.
+
+        Parameters
+        ----------
+            moves : list of str
+                The references of the moves in standard algebraic notation.
+            result : str
+                The result of the game : '1-0', '0-1', '1/2-1/2', or '*'.
+                Default is '*'.
+            termination : str or None
+                The reason why the game ended. If None, it is deduced from the result.
+                Default is None.
+            fen : str or None
+                The Forsyth–Edwards Notation (FEN) of the initial position, if it is not the standard one.
+                Default is None.
+            tags : dict of str: str
+                The tags of the game.
+        """
+        self.begin_game(fen = fen, **tags)
+        self.moves.extend(moves)
+        self.end_game(result = result, termination = termination)
+
+    def flush(self):
+        """
+        Writes the buffered games in the file.
+        """
+        self.stream.flush()
+
+    def close(self):
+        """
+        Writes the buffered games and closes the file.
+        """
+        if not self.stream.closed:
+            self.stream.close()
+
+    @staticmethod
+    def read_games(file, french = False):
+        """
+        Reads the games of a pgn file one after the other. This is a generator : only the current game is kept
+        in memory, so that very large archives can be read. Each game is a dictionnary with its tags (dict of str: str),
+        its moves (list of str, as written in the file without the move numbers) and its result ('*' if unknown).
+
+        Parameters
+        ----------
+            file : str
+                The path of the pgn file.
+            french : bool
+                To be set to True if the moves are in french notations. They are translated in english notations.
+                Default is False.
+        """
+        tags, text = {}, []
+        with open(file, encoding = 'utf-8', errors = 'replace') as stream:
+            for line in stream:
+                line = line.strip()
+                match = Chesspgn.tag_pattern.match(line)
+                if match != None:
+                    if text: # First tag of the next game
+                        yield Chesspgn._game(tags, text, french)
+                        tags, text = {}, []
+                    tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+                elif line and not line.startswith('%'):
+                    text.append(line)
+        if tags or text:
+            yield Chesspgn._game(tags, text, french)
+
+    @staticmethod
+    def _game(tags, text, french):
+        """
+        Returns the dictionnary of a game read by read_games.
+        """
+        moves, result = Chesspgn.parse_movetext('\n'.join(text), french = french)
+        if result == '*':
+            result = tags.get('Result', '*') if tags.get('Result') in Chesspgn.results else '*'
+        return {'tags': tags, 'moves': moves, 'result': result}
+
+    @staticmethod
+    def parse_movetext(text, french = False):
+        """
+        Returns a tuple (moves, result) with the list of the moves of the movetext of a game and its result
+        ('*' if the movetext has no result). Comments, variations, numeric annotation glyphs and move numbers
+        are removed.
+
+        Parameters
+        ----------
+            text : str
+                The movetext (e.g. '1. e4 {best by test} e5 2. Nf3 (2. f4 exf4) Nc6 1-0').
+            french : bool
+                To be set to True if the moves are in french notations. They are translated in english notations.
+                Default is False.
+        """
+        text = Chesspgn.comment_pattern.sub(' ', text)
+        length = None
+        while length != len(text): # Nested variations are removed from the innermost one
+            length = len(text)
+            text = Chesspgn.variation_pattern.sub(' ', text)
+        moves, result = [], '*'
+        for token in text.split():
+            if token in Chesspgn.results:
+                result = token
+                continue
+            token = Chesspgn.number_pattern.sub('', token)
+            if token:
+                moves.append(token.translate(str.maketrans('TFCDR', 'RBNQK')) if french else token)
+        return moves, result
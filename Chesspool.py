@@ -0,0 +1,236 @@
+import queue
+import subprocess
+import threading
+import time
+import sys
+import os
+
+class Chesspool:
+    """
+    A class to represent a pool of long-lived local chess engines, driven with the UCI protocol through pipes.
+    It is a drop-in replacement of the remote API : get_move(fen) returns the best move in long algebraic notation.
+
+    ...
+
+    Each engine is a subprocess started once and reused for all the moves. A position is handed out to an idle engine,
+    so several games (threads) can ask for moves at the same time and the throughput grows with the size of the pool.
+    An engine which crashes or does not answer in time is killed and replaced by a new one, which is asked again once.
+    If the new engine fails too, it is killed as well and the next position handed out to its slot starts another one.
+
+    Attributes
+    ----------
+    command : list of str
+        The command line starting an engine (any UCI engine binary, by default this project's uci.py).
+    size : int
+        The number of engines of the pool.
+    movetime : float
+        The time in seconds given to an engine for each move.
+    depth : int or None
+        If given, the depth of the search of each move instead of the time limit.
+    timeout : float
+        The additional time in seconds after which an engine that did not answer is considered as crashed.
+    restarts : int
+        The number of engines restarted since the creation of the pool.
+    engines : list of dict
+        The running engines, guarded by the lock attribute as they are replaced by the threads asking for moves.
+
+    Methods
+    -------
+    get_move(self, fen, movetime = None, depth = None):
+        Returns the best move found by an idle engine of the pool for a position given in FEN.
+
+    close(self):
+        Stops all the engines of the pool.
+    """
+
+    default_command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uci.py')]
+
+    def __init__(self, command = None, size = 2, movetime = 0.5, depth = None, timeout = 5, options = None):
+        """
+        Instantiate a Chesspool object and starts its engines.
+
+        Parameters
+        ----------
+            command : list of str or str or None
+                The command line (or path of the binary) starting an engine. If None, this project's uci.py is used.
+                Default is None.
+            size : int
+                The number of engines of the pool.
+                Default is 2.
+            movetime : float
+                The time in seconds given to an engine for each move.
+                Default is 0.5.
+            depth : int or None
+                If given, each move is searched at this depth instead of using the time limit.
+                Default is None.
+            timeout : float
+                The additional time in seconds after which an engine that did not answer is considered as crashed.
+                Default is 5.
+            options : dict of str: str or None
+                UCI options sent to each engine when it starts (e.g. {'Threads': '1', 'Hash': '16'}).
+                Default is None.
+        """
+        if command == None:
+            command = Chesspool.default_command
+        self.command = [command] if isinstance(command, str) else list(command)
+        self.size = size
+        self.movetime = movetime
+        self.depth = depth
+        self.timeout = timeout
+        self.options = options if options != None else {}
+        self.restarts = 0
+        self.engines = []
+        self.lock = threading.Lock()
+        self.idle = queue.Queue() # Idle engines, or None for a slot whose engine was killed
+        for index in range(size):
+            self.idle.put(self._start())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start(self):
+        """
+        Starts an engine subprocess, waits until it is ready and adds it to the engines attribute. Returns a dictionnary
+        with the process and the queue filled with its output lines by a reader thread.
+        If the engine does not start properly, it is killed and the exception is raised.
+        """
+        process = subprocess.Popen(self.command, stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+                                   stderr = subprocess.DEVNULL, text = True, bufsize = 1)
+        lines = queue.Queue()
+
+        def read():
+            for line in process.stdout:
+                lines.put(line.strip())
+            lines.put(None) # End of the output : the engine stopped
+
+        threading.Thread(target = read, daemon = True).start()
+        engine = {'process': process, 'lines': lines}
+        try:
+            self._send(engine, 'uci')
+            self._wait(engine, 'uciok', self.timeout)
+            for name, value in self.options.items():
+                self._send(engine, 'setoption name %s value %s' % (name, value))
+            self._send(engine, 'isready')
+            self._wait(engine, 'readyok', self.timeout)
+        except Exception:
+            self._kill(engine)
+            raise
+        with self.lock:
+            self.engines.append(engine)
+        return engine
+
+    def _kill(self, engine):
+        """
+        Kills an engine subprocess and removes it from the engines attribute.
+        """
+        try:
+            engine['process'].kill()
+            engine['process'].wait(timeout = self.timeout)
+        except Exception:
+            pass
+        with self.lock:
+            if engine in self.engines:
+                self.engines.remove(engine)
+
+    def _send(self, engine, command):
+        """
+        Sends a command line to an engine.
+        """
+        engine['process'].stdin.write(command + '\n')
+        engine['process'].stdin.flush()
+
+    def _wait(self, engine, prefix, timeout):
+        """
+        Returns the first output line of an engine starting with a given prefix.
+        Raises a TimeoutError if there is no such line in time, or an EOFError if the engine stopped.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = engine['lines'].get(timeout = max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise TimeoutError('engine did not answer ' + prefix + ' in time')
+            if line == None:
+                raise EOFError('engine stopped')
+            if line.startswith(prefix):
+                return line
+
+    def _ask(self, engine, fen, movetime, depth):
+        """
+        Asks an engine the best move of a position and returns it in long algebraic notation.
+        If the engine does not answer in time, it is asked to stop before being considered as crashed.
+        """
+        while True: # The lines left by the previous searches must not be taken for the answer to this position
+            try:
+                line = engine['lines'].get_nowait()
+            except queue.Empty:
+                break
+            if line == None:
+                raise EOFError('engine stopped')
+        self._send(engine, 'position fen ' + fen)
+        if depth != None:
+            self._send(engine, 'go depth %d' % depth)
+            limit = self.timeout * 10
+        else:
+            self._send(engine, 'go movetime %d' % int(movetime * 1000))
+            limit = movetime + self.timeout
+        try:
+            line = self._wait(engine, 'bestmove', limit)
+        except TimeoutError:
+            self._send(engine, 'stop')
+            line = self._wait(engine, 'bestmove', self.timeout)
+        return line.split()[1]
+
+    def get_move(self, fen, movetime = None, depth = None):
+        """
+        Returns the best move of a position in long algebraic notation (e.g. 'e2e4', 'e1g1' or 'e7e8q'),
+        calculated by the first idle engine of the pool. If the engine crashed, it is killed, replaced by a new engine
+        and asked again once. If the new engine fails too, it is killed and the exception is raised.
+
+        Parameters
+        ----------
+            fen : str
+                The Forsyth–Edwards Notation (FEN) of the position.
+            movetime : float or None
+                The time in seconds given to the engine. If None, the movetime attribute is used.
+                Default is None.
+            depth : int or None
+                The depth of the search. If None, the depth attribute is used.
+                Default is None.
+        """
+        movetime = movetime if movetime != None else self.movetime
+        depth = depth if depth != None else self.depth
+        engine = self.idle.get()
+        try:
+            for attempt in range(2):
+                if engine == None: # The engine of the slot was killed
+                    with self.lock:
+                        self.restarts += 1
+                    engine = self._start()
+                try:
+                    return self._ask(engine, fen, movetime, depth)
+                except (OSError, EOFError, TimeoutError, ValueError, IndexError):
+                    self._kill(engine) # It may still be searching : its late answer must not be read by another position
+                    engine = None
+                    if attempt == 1:
+                        raise
+        finally:
+            self.idle.put(engine)
+
+    def close(self):
+        """
+        Stops all the engines of the pool.
+        """
+        with self.lock:
+            engines = list(self.engines)
+        for engine in engines:
+            try:
+                self._send(engine, 'quit')
+                engine['process'].wait(timeout = self.timeout)
+            except Exception:
+                engine['process'].kill()
+        with self.lock:
+            self.engines = []
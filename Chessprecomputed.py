@@ -0,0 +1,132 @@
+from array import array
+import os
+import struct
+import sys
+import zlib
+
+precomputed_magic = b'CHST\x02' # First bytes of a file of precomputed tables (version 2 of the format)
+precomputed_header = struct.Struct('<III') # Version of the tables, number of arrays, CRC-32 checksum of the arrays
+precomputed_array_header = struct.Struct('<cQ') # Type code and length of an array
+precomputed_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+
+def cache_file(name, version):
+    """
+    Returns the path of the cache file of a set of precomputed tables.
+
+    Parameters
+    ----------
+        name : str
+            The name of the tables (e.g. 'magics').
+        version : int
+            The version of the tables, to be increased when the way they are built changes.
+    """
+    return os.path.join(precomputed_folder, '%s.v%d.tables' % (name, version))
+
+
+def save_tables(file, version, tables):
+    """
+    Writes arrays in a file of precomputed tables, in little-endian byte order, with a checksum of their content.
+    The file is written under a temporary name and then renamed, so that a process reading it (e.g. another worker
+    of a pool) never sees it half-written.
+
+    Parameters
+    ----------
+        file : str
+            The path of the file.
+        version : int
+            The version of the tables.
+        tables : list of array.array
+            The arrays, of type code 'B', 'H', 'I' or 'Q'.
+    """
+    content = []
+    for table in tables:
+        content.append(precomputed_array_header.pack(table.typecode.encode(), len(table)))
+        if sys.byteorder != 'little':
+            table = array(table.typecode, table)
+            table.byteswap()
+        content.append(table.tobytes())
+    content = b''.join(content)
+    path = '%s.%d.tmp' % (file, os.getpid())
+    with open(path, 'wb') as stream:
+        stream.write(precomputed_magic)
+        stream.write(precomputed_header.pack(version, len(tables), zlib.crc32(content)))
+        stream.write(content)
+    os.replace(path, file)
+
+
+def read_tables(file, version):
+    """
+    Returns the arrays of a file of precomputed tables, or None if the file does not exist, is not a file of
+    tables of this version, is truncated or its checksum does not match its content.
+
+    Parameters
+    ----------
+        file : str
+            The path of the file.
+        version : int
+            The expected version of the tables.
+    """
+    try:
+        with open(file, 'rb') as stream:
+            data = stream.read()
+    except OSError:
+        return None
+    if not data.startswith(precomputed_magic) or len(data) < len(precomputed_magic) + precomputed_header.size:
+        return None
+    file_version, count, checksum = precomputed_header.unpack_from(data, len(precomputed_magic))
+    offset = len(precomputed_magic) + precomputed_header.size
+    if file_version != version or zlib.crc32(data[offset:]) != checksum:
+        return None
+    tables = []
+    for index in range(count):
+        if offset + precomputed_array_header.size > len(data):
+            return None
+        typecode, length = precomputed_array_header.unpack_from(data, offset)
+        offset += precomputed_array_header.size
+        table = array(typecode.decode())
+        size = length * table.itemsize
+        if offset + size > len(data):
+            return None
+        table.frombytes(data[offset:offset + size])
+        if sys.byteorder != 'little':
+            table.byteswap()
+        tables.append(table)
+        offset += size
+    if offset != len(data):
+        return None
+    return tables
+
+
+def load_tables(name, version, build, check = None):
+    """
+    Returns precomputed tables : read from their cache file if it exists and is valid, otherwise built and saved
+    in the cache file for the next runs. The tables must be built deterministically, so that every process gets
+    the same tables. If the cache folder cannot be written, the tables are built at each run.
+
+    Parameters
+    ----------
+        name : str
+            The name of the tables (e.g. 'magics').
+        version : int
+            The version of the tables, to be increased when the way they are built changes (the cache file of the
+            previous version is then ignored).
+        build : function
+            The function building the tables, called without argument and returning a list of array.array.
+        check : function or None
+            If given, the function called with the tables read from the cache file, returning False if they are not
+            the tables that build would return (e.g. written by a previous build with other parameters). They are
+            then built again and the cache file is replaced.
+            Default is None.
+    """
+    file = cache_file(name, version)
+    tables = read_tables(file, version)
+    if tables != None and (check == None or check(tables)):
+        return tables
+    tables = build()
+    try:
+        os.makedirs(precomputed_folder, exist_ok = True)
+        save_tables(file, version, tables)
+    except OSError:
+        pass
+    return tables
@@ -0,0 +1,180 @@
+from Chessboard import *
+import copy
+import functools
+import json
+import time
+
+class Chessprofiler:
+    """
+    A class to measure where the time goes in the Chessboard methods : number of calls and total wall time of
+    is_valid, attacks, all_attacks, is_checking, is_mating, is_pating, the make / unmake moves and the board copies.
+
+    ...
+
+    The instrumentation is opt-in : the methods are only replaced by timed wrappers while the profiler is enabled,
+    and the original methods are put back when it is disabled, so there is no overhead at all the rest of the time.
+    The times are inclusive : the time of is_mating includes the time of the is_checking and attacks calls it makes.
+    Only one profiler can be enabled at a time. It can be used as a context manager :
+
+        with Chessprofiler() as profiler:
+            game.playgame(timer = 0)
+        print(profiler.to_prometheus())
+
+    Attributes
+    ----------
+    targets : list of tuple
+        The instrumented methods, as (class, method name) tuples.
+    stats : dict of str: list
+        The number of calls and the total time in seconds of each instrumented method, as [calls, seconds] lists.
+
+    Methods
+    -------
+    enable(self):
+        Starts the instrumentation.
+
+    disable(self):
+        Stops the instrumentation and puts back the original methods.
+
+    reset(self):
+        Sets all the counters to 0.
+
+    snapshot(self):
+        Returns a dictionnary with the counters of each instrumented method.
+
+    to_json(self):
+        Returns the snapshot in JSON.
+
+    to_prometheus(self, prefix = 'chess'):
+        Returns the snapshot in the text exposition format of Prometheus.
+    """
+
+    default_targets = [(Chessboard, name) for name in ('is_valid', 'attacks', 'all_attacks', 'is_checking', 'is_mating',
+                                                        'is_pating', 'possible_moves', 'legal_moves', 'make_move', 'unmake_move')]
+    active = None # The enabled profiler, if any
+
+    def __init__(self, extra_targets = None):
+        """
+        Instantiate a Chessprofiler object, disabled, with all its counters at 0.
+
+        Parameters
+        ----------
+            extra_targets : list of tuple or None
+                Additional methods to instrument, as (class, method name) tuples (e.g. [(Chessengine, 'search')]).
+                Default is None.
+        """
+        self.targets = Chessprofiler.default_targets + list(extra_targets or [])
+        self.stats = {}
+        self.originals = {}
+        self.reset()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def _wrap(self, name, method):
+        """
+        Returns a wrapper of a method counting its calls and accumulating its wall time.
+        """
+        counters = self.stats[name]
+        clock = time.perf_counter
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                counters[0] += 1
+                counters[1] += clock() - start
+        return wrapper
+
+    def _deepcopy(self):
+        """
+        Returns a __deepcopy__ method for the Chessboard class counting the board copies. The copy is the same
+        as the default one of copy.deepcopy (the attributes returned by __getstate__).
+        """
+        counters = self.stats['deepcopy']
+        clock = time.perf_counter
+
+        def __deepcopy__(board, memo):
+            start = clock()
+            result = board.__class__.__new__(board.__class__)
+            memo[id(board)] = result
+            for name, value in board.__getstate__().items():
+                setattr(result, name, copy.deepcopy(value, memo))
+            counters[0] += 1
+            counters[1] += clock() - start
+            return result
+        return __deepcopy__
+
+    def enable(self):
+        """
+        Replaces the instrumented methods by timed wrappers.
+        Raises a RuntimeError if another profiler is already enabled.
+        """
+        if Chessprofiler.active is self:
+            return
+        if Chessprofiler.active != None:
+            raise RuntimeError('another Chessprofiler is already enabled')
+        for cls, name in self.targets:
+            key = cls.__name__ + '.' + name if cls is not Chessboard else name
+            self.originals[(cls, name)] = cls.__dict__[name]
+            setattr(cls, name, self._wrap(key, cls.__dict__[name]))
+        Chessboard.__deepcopy__ = self._deepcopy()
+        Chessprofiler.active = self
+
+    def disable(self):
+        """
+        Puts back the original methods.
+        """
+        if Chessprofiler.active is not self:
+            return
+        for (cls, name), method in self.originals.items():
+            setattr(cls, name, method)
+        self.originals = {}
+        del Chessboard.__deepcopy__
+        Chessprofiler.active = None
+
+    def reset(self):
+        """
+        Sets the number of calls and the total time of all the instrumented methods to 0.
+        """
+        for cls, name in self.targets:
+            self.stats.setdefault(cls.__name__ + '.' + name if cls is not Chessboard else name, [0, 0.0])[:] = [0, 0.0]
+        self.stats.setdefault('deepcopy', [0, 0.0])[:] = [0, 0.0]
+
+    def snapshot(self):
+        """
+        Returns a dictionnary with, for each instrumented method, the number of calls, the total time in seconds
+        and the mean time of a call in microseconds.
+        """
+        return {name: {'calls': calls, 'seconds': round(seconds, 6),
+                       'mean_us': round(1e6 * seconds / calls, 3) if calls else 0.0}
+                for name, (calls, seconds) in self.stats.items()}
+
+    def to_json(self):
+        """
+        Returns the snapshot of the counters in JSON.
+        """
+        return json.dumps(self.snapshot(), indent = 2)
+
+    def to_prometheus(self, prefix = 'chess'):
+        """
+        Returns the snapshot of the counters in the text exposition format of Prometheus.
+
+        Parameters
+        ----------
+            prefix : str
+                The prefix of the metric names.
+                Default is 'chess'.
+        """
+        lines = ['# HELP %s_calls_total Number of calls of the instrumented methods.' % prefix,
+                 '# TYPE %s_calls_total counter' % prefix]
+        lines += ['%s_calls_total{method="%s"} %d' % (prefix, name, calls) for name, (calls, seconds) in self.stats.items()]
+        lines += ['# HELP %s_seconds_total Total wall time of the instrumented methods, in seconds.' % prefix,
+                  '# TYPE %s_seconds_total counter' % prefix]
+        lines += ['%s_seconds_total{method="%s"} %.6f' % (prefix, name, seconds) for name, (calls, seconds) in self.stats.items()]
+        return '\n'.join(lines) + '\n'
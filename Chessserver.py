@@ -0,0 +1,270 @@
+from Chessengine import *
+from collections import deque
+import asyncio
+import random
+import sys
+import time
+
+_engine = None # Engine of an executor process, kept between the moves so that its transposition table is reused
+
+def choose_move(board, algo, movetime):
+    """
+    Returns the move chosen by the computer for a position, in long algebraic notation.
+    This function runs in the executor processes of the Chessserver class.
+
+    Parameters
+    ----------
+        board : Chessboard object
+            The position.
+        algo : str
+            The algorithm used by the computer : 'random' or 'engine'.
+        movetime : float
+            The time in seconds given to the engine.
+    """
+    global _engine
+    if algo == 'engine':
+        if _engine == None:
+            _engine = Chessengine()
+        move = _engine.search(board, movetime = movetime)
+    else:
+        moves = board.legal_moves()
+        move = random.choice(moves) if moves else None
+    return str(move) if move != None else None
+
+
+class Chessserver:
+    """
+    A class to host many games between human players and the computer in one process, with asyncio.
+
+    ...
+
+    Players connect with a line-based TCP protocol (e.g. with telnet or netcat), each connection being a session
+    with its own Chessboard. The moves of the computer are chosen in a pool of executor processes, so the event loop
+    never stalls while the computer thinks and the other sessions keep being served.
+
+    Commands of the protocol :
+        new White|Black : starts a new game, the player having the given color
+        <move> or move <move> : plays a move, in algebraic notation (e.g. 'Nf3') or long algebraic notation (e.g. 'g1f3')
+        board : shows the board
+        fen : shows the Forsyth–Edwards Notation (FEN) of the position
+        moves : shows the legal moves
+        stats : shows the latency metrics of the session
+        end : ends the session
+
+    Attributes
+    ----------
+    algo : str
+        The algorithm used by the computer : 'random' or 'engine'.
+    movetime : float
+        The time in seconds given to the engine for each move.
+    sessions : dict of int: dict
+        The current sessions, with their board, player color and latency metrics.
+    move_cache : Chesscache object or None
+        The cache of the legal moves shared by the boards of the sessions.
+
+    Methods
+    -------
+    serve(self, host = '127.0.0.1', port = 8765):
+        Coroutine starting the server and returning the asyncio server.
+
+    metrics(self, session):
+        Returns the latency metrics of a session.
+    """
+
+    def __init__(self, algo = 'random', movetime = 1, workers = 2, move_cache_size = 65536):
+        """
+        Instantiate a Chessserver object.
+
+        Parameters
+        ----------
+            algo : str
+                The algorithm used by the computer : 'random' or 'engine'.
+                Default is 'random'.
+            movetime : float
+                The time in seconds given to the engine for each move.
+                Default is 1.
+            workers : int
+                The number of executor processes choosing the moves of the computer.
+                Default is 2.
+            move_cache_size : int
+                The number of positions whose legal moves are cached, for all the sessions of the server
+                (0 for no cache).
+                Default is 65536.
+        """
+        # Imported on first use : the executor processes import this module, and do not need the pool modules
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+        self.algo = algo
+        self.movetime = movetime
+        self.executor = ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn'))
+        self.sessions = {}
+        self.next_id = 1
+        # The same positions (openings) are queried by many sessions : their boards share a cache of legal moves
+        self.move_cache = Chesscache(move_cache_size) if move_cache_size else None
+
+    async def serve(self, host = '127.0.0.1', port = 8765):
+        """
+        Coroutine starting the server and returning the asyncio server.
+
+        Parameters
+        ----------
+            host : str
+                The address on which the server listens.
+                Default is '127.0.0.1'.
+            port : int
+                The port on which the server listens.
+                Default is 8765.
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self):
+        """
+        Stops the executor processes.
+        """
+        self.executor.shutdown(cancel_futures = True)
+
+    def metrics(self, session):
+        """
+        Returns a dictionnary with the latency metrics of a session : number of commands, mean, median, 95th percentile
+        and maximum response time in milliseconds, total thinking time of the computer, and hit rate of the legal
+        moves cache.
+
+        Parameters
+        ----------
+            session : dict
+                The session, as stored in the sessions attribute.
+        """
+        latencies = sorted(session['latencies'])
+        result = {'commands': session['commands'], 'computer_moves': session['computer_moves'],
+                  'computer_seconds': round(session['computer_seconds'], 3)}
+        if latencies:
+            result['mean_ms'] = round(1000 * sum(latencies) / len(latencies), 1)
+            result['p50_ms'] = round(1000 * latencies[len(latencies) // 2], 1)
+            result['p95_ms'] = round(1000 * latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 1)
+            result['max_ms'] = round(1000 * latencies[-1], 1)
+        if self.move_cache != None:
+            result['move_cache_hit_rate'] = round(self.move_cache.hit_rate(), 3)
+        return result
+
+    async def handle(self, reader, writer):
+        """
+        Coroutine serving one session : reads the commands of the player and writes the answers.
+        """
+        session = {'id': self.next_id, 'board': Chessboard(move_cache = self.move_cache), 'color': 'White', 'commands': 0, 'computer_moves': 0,
+                   'computer_seconds': 0.0, 'latencies': deque(maxlen = 1000)}
+        self.next_id += 1
+        self.sessions[session['id']] = session
+
+        def send(text):
+            writer.write((text + '\n').encode())
+
+        send('Welcome to game %d. Commands : new White|Black, <move>, board, fen, moves, stats, end' % session['id'])
+        try:
+            while True:
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode().strip()
+                if not command:
+                    continue
+                start = time.perf_counter()
+                if command == 'end':
+                    send('bye')
+                    break
+                await self.execute(session, command, send)
+                session['commands'] += 1
+                session['latencies'].append(time.perf_counter() - start)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self.sessions[session['id']]
+            writer.close()
+
+    async def execute(self, session, command, send):
+        """
+        Coroutine executing one command of a session.
+        """
+        board = session['board']
+        words = command.split()
+
+        if words[0] == 'new':
+            session['board'] = Chessboard(move_cache = self.move_cache)
+            session['color'] = 'Black' if len(words) > 1 and words[1].lower() == 'black' else 'White'
+            send('New game, you play %s' % session['color'])
+            if session['color'] == 'Black':
+                await self.computer_move(session, send)
+        elif words[0] == 'board':
+            send(str(board))
+        elif words[0] == 'fen':
+            send(board.encode_fen())
+        elif words[0] == 'moves':
+            send(' '.join(str(move) for move in board.legal_moves()))
+        elif words[0] == 'stats':
+            send(' '.join('%s=%s' % (name, value) for name, value in self.metrics(session).items()))
+        else:
+            if board.turn != session['color']:
+                send('Not your turn !')
+                return
+            ref = words[-1]
+            error = self.player_move(board, ref)
+            if error != None:
+                send(error)
+                return
+            send('ok ' + ref)
+            if not self.game_over(board, send):
+                await self.computer_move(session, send)
+
+    def player_move(self, board, ref):
+        """
+        Executes a move of the player, in algebraic or long algebraic notation, as in playgame.game.
+        Returns None if the move was executed, or the message explaining why it was refused.
+        """
+        try:
+            move = board.parse_move(ref)
+        except MoveError as error:
+            return str(error)
+        board.make_move(*move)
+        return None
+
+    async def computer_move(self, session, send):
+        """
+        Coroutine choosing the move of the computer in an executor process, and executing it.
+        """
+        board = session['board']
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        ref = await loop.run_in_executor(self.executor, choose_move, board, self.algo, self.movetime)
+        session['computer_seconds'] += time.perf_counter() - start
+        session['computer_moves'] += 1
+        if ref == None:
+            return
+        board.make_move(*Chessmove.from_uci(ref))
+        send('computer ' + ref)
+        self.game_over(board, send)
+
+    def game_over(self, board, send):
+        """
+        Returns True and sends the result if the game is finished by a mate or a pat.
+        """
+        if board.legal_moves():
+            return False
+        if board.is_attacked(board.king_squares[board.turn], board.opponents[board.turn]):
+            send('checkmate ' + ('0-1' if board.turn == 'White' else '1-0'))
+        else:
+            send('stalemate 1/2-1/2')
+        return True
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    algo = sys.argv[2] if len(sys.argv) > 2 else 'random'
+
+    async def main():
+        server = Chessserver(algo = algo)
+        async with await server.serve(port = port):
+            print('Serving games on port %d' % port)
+            await asyncio.Event().wait()
+
+    asyncio.run(main())
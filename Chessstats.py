@@ -0,0 +1,123 @@
+import json
+
+class Chessstats:
+    """
+    A class to record the efficiency of the iterations of a Chessengine search, in order to tune the search
+    (e.g. to measure the effect of a change of the move ordering).
+
+    ...
+
+    For each depth fully searched, the following statistics are recorded : nodes and quiescence nodes of the iteration,
+    hit rate of the transposition table, percentage of the beta cutoffs produced by the first move searched,
+    effective branching factor (nodes of the iteration divided by the nodes of the previous one), time, score
+    and principal variation. The engine only increments a few counters during the search : the statistics are
+    computed at the end of each iteration.
+
+    Attributes
+    ----------
+    depths : list of dict
+        The statistics of each depth fully searched by the last search, in order.
+    trace : str or None
+        The path of a JSON lines file in which the statistics of each depth are appended, if any.
+
+    Methods
+    -------
+    reset(self, engine = None):
+        Clears the statistics, at the start of a search.
+
+    record(self, engine):
+        Records the statistics of the iteration just completed by an engine.
+
+    summary(self):
+        Returns the statistics of the whole search.
+
+    info_string(self):
+        Returns the statistics of the last depth as the text of a UCI 'info string' answer.
+    """
+
+    def __init__(self, trace = None):
+        """
+        Instantiate a Chessstats object without any statistics.
+
+        Parameters
+        ----------
+            trace : str or None
+                The path of a JSON lines file in which the statistics of each depth are appended.
+                Default is None.
+        """
+        self.trace = trace
+        self.depths = []
+        self.reset()
+
+    @staticmethod
+    def _counters(engine):
+        """
+        Returns the counters of an engine : nodes, quiescence nodes, probes and hits of the transposition table,
+        beta cutoffs, beta cutoffs of the first move, and elapsed time.
+        """
+        return (engine.nodes, engine.qnodes, engine.table.probes, engine.table.hits, engine.cutoffs,
+                engine.first_cutoffs, engine.elapsed())
+
+    def reset(self, engine = None):
+        """
+        Clears the statistics, at the start of a search.
+
+        Parameters
+        ----------
+            engine : Chessengine object or None
+                The engine starting the search. Its counters are the starting point of the first depth (the counters
+                of the transposition table are kept from one search to the other).
+                Default is None.
+        """
+        self.depths = []
+        self.last = Chessstats._counters(engine) if engine != None else (0, 0, 0, 0, 0, 0, 0.0)
+
+    def record(self, engine):
+        """
+        Records the statistics of the iteration just completed by an engine, and appends them to the trace file.
+
+        Parameters
+        ----------
+            engine : Chessengine object
+                The engine, whose counters are read.
+        """
+        counters = Chessstats._counters(engine)
+        nodes, qnodes, probes, hits, cutoffs, first_cutoffs, seconds = (now - before for now, before in zip(counters, self.last))
+        previous = self.depths[-1]['nodes'] if self.depths else 0
+        stats = {'depth': engine.depth, 'nodes': nodes, 'qnodes': qnodes,
+                 'tt_hit_rate': round(hits / probes, 4) if probes else 0.0,
+                 'first_cutoff_rate': round(first_cutoffs / cutoffs, 4) if cutoffs else 0.0,
+                 'ebf': round(nodes / previous, 2) if previous else None,
+                 'seconds': round(seconds, 4), 'total_nodes': engine.nodes, 'total_seconds': round(engine.elapsed(), 4),
+                 'score': engine.score, 'pv': [str(move) for move in engine.pv]}
+        self.depths.append(stats)
+        self.last = counters
+        if self.trace != None:
+            with open(self.trace, 'a') as file:
+                file.write(json.dumps(stats) + '\n')
+
+    def summary(self):
+        """
+        Returns a dictionnary with the statistics of the whole search : depth, nodes, quiescence nodes, time,
+        mean effective branching factor (geometric mean over the depths) and the statistics of each depth.
+        """
+        factors = [stats['ebf'] for stats in self.depths if stats['ebf']]
+        mean = 1.0
+        for factor in factors:
+            mean *= factor
+        return {'depth': self.depths[-1]['depth'] if self.depths else 0,
+                'nodes': sum(stats['nodes'] for stats in self.depths),
+                'qnodes': sum(stats['qnodes'] for stats in self.depths),
+                'seconds': self.depths[-1]['total_seconds'] if self.depths else 0.0,
+                'ebf': round(mean ** (1 / len(factors)), 2) if factors else None,
+                'depths': self.depths}
+
+    def info_string(self):
+        """
+        Returns the statistics of the last depth as the text of a UCI 'info string' answer
+        (e.g. 'info string depth 5 nodes 12034 qnodes 8211 tthit 31.5% firstcut 91.2% ebf 3.41 time 152').
+        """
+        stats = self.depths[-1]
+        return 'info string depth %d nodes %d qnodes %d tthit %.1f%% firstcut %.1f%% ebf %s time %d' % (
+            stats['depth'], stats['nodes'], stats['qnodes'], 100 * stats['tt_hit_rate'], 100 * stats['first_cutoff_rate'],
+            '%.2f' % stats['ebf'] if stats['ebf'] else '-', 1000 * stats['seconds'])
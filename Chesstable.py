@@ -0,0 +1,170 @@
+from Chessmove import *
+from array import array
+
+class Chesstable:
+    """
+    A class to represent a transposition table : a fixed-size table storing, for each position key, the result of
+    a previous search of the position (depth, bound type, score and best move).
+
+    ...
+
+    Each entry is stored in 2 unsigned 64-bit integers : the position key xored with the data, and the data.
+    An entry is only returned when the key xored with the data gives back the position key, so the table can be shared
+    between several processes (through multiprocessing.shared_memory) and written without lock : an entry torn by two
+    concurrent writes is simply seen as missing.
+
+    Attributes
+    ----------
+    entries : int
+        The number of entries of the table.
+    name : str or None
+        The name of the shared memory block holding the table, or None if the table is local to the process.
+    probes : int
+        The number of lookups done in the table by this process.
+    hits : int
+        The number of lookups that found their key in the table.
+
+    Methods
+    -------
+    probe(self, key):
+        Returns the entry (depth, flag, score, move) stored for a position key, or None.
+
+    store(self, key, depth, flag, score, move):
+        Stores the result of a search for a position key.
+
+    clear(self):
+        Removes all the entries of the table.
+
+    attach(name, entries):
+        Returns a Chesstable object using the shared memory block created by another process.
+
+    close(self):
+        Releases the shared memory block of the table, and destroys it if it was created by this object.
+    """
+
+    exact, lower, upper = 0, 1, 2 # Bound types of the stored scores
+    score_offset = 1 << 21 # Scores are stored as positive integers
+
+    def __init__(self, entries = 1 << 18, shared = False):
+        """
+        Instantiate a Chesstable object with all entries empty.
+
+        Parameters
+        ----------
+            entries : int
+                The number of entries of the table (each entry uses 16 bytes).
+                Default is 262144.
+            shared : bool
+                If True, the table is created in a shared memory block that other processes can attach to.
+                Default is False.
+        """
+        self.entries = entries
+        self.probes = 0
+        self.hits = 0
+        self.owner = shared
+        self.memory = None
+        self.name = None
+        if shared:
+            from multiprocessing import shared_memory # Imported on first use : most tables are local to their process
+            self.memory = shared_memory.SharedMemory(create = True, size = entries * 16)
+            self.name = self.memory.name
+            self.slots = self.memory.buf.cast('Q')
+            self.clear()
+        else:
+            self.slots = array('Q', bytes(entries * 16))
+
+    @classmethod
+    def attach(cls, name, entries):
+        """
+        Returns a Chesstable object using the shared memory block of a table created by another process.
+
+        Parameters
+        ----------
+            name : str
+                The name attribute of the shared table.
+            entries : int
+                The entries attribute of the shared table.
+        """
+        from multiprocessing import shared_memory
+        table = cls.__new__(cls)
+        table.entries = entries
+        table.probes = 0
+        table.hits = 0
+        table.owner = False
+        table.memory = shared_memory.SharedMemory(name = name)
+        table.name = name
+        table.slots = table.memory.buf.cast('Q')
+        return table
+
+    def close(self):
+        """
+        Releases the shared memory block of the table. The block is destroyed if it was created by this object.
+        """
+        if self.memory != None:
+            self.slots.release()
+            self.memory.close()
+            if self.owner:
+                self.memory.unlink()
+            self.memory = None
+
+    def clear(self):
+        """
+        Removes all the entries of the table.
+        """
+        if self.memory != None:
+            self.memory.buf[:self.entries * 16] = bytes(self.entries * 16)
+        else:
+            self.slots = array('Q', bytes(self.entries * 16))
+
+    def hit_rate(self):
+        """
+        Returns the ratio (between 0 and 1) of lookups that found their key in the table.
+        """
+        return self.hits / self.probes if self.probes else 0.0
+
+    def probe(self, key):
+        """
+        Returns a tuple (depth, flag, score, move) with the entry stored for a position key, or None if there is none.
+        The move is a Chessmove object or None.
+
+        Parameters
+        ----------
+            key : int
+                The Zobrist key of the position.
+        """
+        self.probes += 1
+        index = 2 * (key % self.entries)
+        data = self.slots[index + 1]
+        if data == 0 or self.slots[index] ^ data != key:
+            return None
+        self.hits += 1
+        move = None
+        if data & 0xFFF:
+            move = Chessmove.from_code(data & 0x7FFF)
+        return (data >> 16 & 0xFF, data >> 24 & 0x3, (data >> 26) - Chesstable.score_offset, move)
+
+    def store(self, key, depth, flag, score, move):
+        """
+        Stores the result of a search for a position key, replacing the previous entry of the slot.
+
+        Parameters
+        ----------
+            key : int
+                The Zobrist key of the position.
+            depth : int
+                The depth of the search.
+            flag : int
+                The type of the score : Chesstable.exact, Chesstable.lower (score is a lower bound) or
+                Chesstable.upper (score is an upper bound).
+            score : int
+                The score of the position.
+            move : Chessmove object or None
+                The best move found.
+        """
+        data = 0
+        if move != None:
+            data = move.to_code()
+        data |= max(depth, 0) << 16 | flag << 24 | (score + Chesstable.score_offset) << 26
+        index = 2 * (key % self.entries)
+        self.slots[index] = key ^ data
+        self.slots[index + 1] = data
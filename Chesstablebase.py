@@ -0,0 +1,554 @@
+from Chessboard import *
+import os
+import time
+
+def _tablebase_geometry():
+    """
+    Returns the geometry used by the tablebase generator, on squares numbered from 0 ('a1') to 63 ('h8')
+    as in Chessmove.to_code : king and knight targets, the 8 rays of each square (4 rook directions first),
+    the pawn attacks of each color, and the squares between two aligned squares with the type of line.
+    """
+    def inside(row, line):
+        return 0 <= row < 8 and 0 <= line < 8
+
+    king, knight, rays, pawn_attacks, between = [], [], [], ([], []), {}
+    for square in range(64):
+        row, line = square % 8, square // 8
+        king.append([(line + dl) * 8 + row + dr for dr in (-1, 0, 1) for dl in (-1, 0, 1)
+                     if (dr or dl) and inside(row + dr, line + dl)])
+        knight.append([(line + dl) * 8 + row + dr for dr, dl in ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+                       if inside(row + dr, line + dl)])
+        square_rays = []
+        for dr, dl in ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)):
+            ray = []
+            r, l = row + dr, line + dl
+            while inside(r, l):
+                ray.append(l * 8 + r)
+                r, l = r + dr, l + dl
+            square_rays.append(ray)
+            for index, target in enumerate(ray):
+                between[(square, target)] = ('R' if dr == 0 or dl == 0 else 'B', ray[:index])
+        rays.append(square_rays)
+        for color, dl in ((0, 1), (1, -1)):
+            pawn_attacks[color].append({(line + dl) * 8 + row + dr for dr in (-1, 1) if inside(row + dr, line + dl)})
+    return king, knight, rays, pawn_attacks, between
+
+
+def _symmetries():
+    """
+    Returns the 8 symmetries of the board (as lists mapping each square to its image) and the 2 symmetries
+    kept when there are pawns (identity and left-right mirror).
+    """
+    result = []
+    for transpose in (False, True):
+        for mirror_row in (False, True):
+            for mirror_line in (False, True):
+                mapping = []
+                for square in range(64):
+                    row, line = square % 8, square // 8
+                    if transpose:
+                        row, line = line, row
+                    if mirror_row:
+                        row = 7 - row
+                    if mirror_line:
+                        line = 7 - line
+                    mapping.append(line * 8 + row)
+                result.append(mapping)
+    return result, [result[0], result[2]]
+
+
+class Chesstablebase:
+    """
+    A class to generate and probe endgame tablebases : for each position of a small material set (3 or 4 pieces,
+    e.g. 'KQvK', 'KRvK', 'KPvK', 'KBNvK'), the result with perfect play (win, draw or loss for the player to move)
+    and the number of plies to mate.
+
+    ...
+
+    The tables are generated offline by retrograde analysis : starting from the mates, the positions won in n + 1 plies
+    are the predecessors (positions before an "unmove") of the positions lost in n plies, and a position is lost in
+    n + 1 plies when all its moves lead to positions won in at most n plies. Captures and promotions lead to smaller or
+    other material sets, whose tables are generated first.
+    Each table is a compact array of one byte per position, indexed by the squares of the pieces and the player to move.
+    The symmetries of the board are used to store only the positions with the white king in the a1-d1-d4 triangle
+    (in the a-d files when there are pawns), so the tables are 6 (3 with pawns) times smaller.
+    Castling and "prise en passant" are not taken into account : positions with castling rights or a possible
+    "prise en passant" are not probed.
+
+    Attributes
+    ----------
+    directory : str or None
+        The folder from which the tables are loaded when needed, and where they are saved.
+    tables : dict of str: dict
+        The tables generated or loaded, by material (e.g. 'KQvK').
+    missing : set of str
+        The material sets without a file in the directory, so that the engine, which probes after each capture of
+        the search, does not look for the file at each probe.
+
+    Methods
+    -------
+    generate(self, material, verbose = False):
+        Generates the table of a material set, and the tables of the material sets it can lead to.
+
+    save(self, directory = None):
+        Saves all the tables in a folder, one file per material set.
+
+    probe(self, board):
+        Returns the result for the player to move and the number of plies to mate of a position, or None.
+
+    best_move(self, board):
+        Returns the best move of a position according to the tables, or None.
+
+    adjudicate(self, board):
+        Returns the result of the game ('1-0', '0-1' or '1/2-1/2') of a position according to the tables, or None.
+    """
+
+    draw, illegal = 0, 1 # Value codes; a code c >= 2 means a mate in c - 2 plies (won if odd, lost if even)
+    order = 'QRBNP' # Order of the pieces in the material names
+    king, knight, rays, pawn_attacks, between = _tablebase_geometry()
+    symmetries, pawn_symmetries = _symmetries()
+    triangle = [square for square in range(64) if square % 8 <= 3 and square // 8 <= square % 8]
+
+    def __init__(self, directory = None):
+        """
+        Instantiate a Chesstablebase object without any table.
+
+        Parameters
+        ----------
+            directory : str or None
+                The folder from which the tables are loaded when they are needed for a probe.
+                Default is None.
+        """
+        self.directory = directory
+        self.tables = {}
+        self.missing = set()
+
+    @staticmethod
+    def material_name(white, black):
+        """
+        Returns the name of a material set (e.g. 'KRvKB') from the piece types of each color, kings excluded.
+        """
+        return 'K' + ''.join(sorted(white, key = Chesstablebase.order.index)) + 'vK' \
+               + ''.join(sorted(black, key = Chesstablebase.order.index))
+
+    def _new_table(self, material):
+        """
+        Returns an empty table for a material set : the piece types and colors in the order of the index
+        (white king, black king, white pieces, black pieces), the symmetries used, and the values array.
+        """
+        white, black = material[1:].split('vK')
+        if len(white) + len(black) > 2:
+            raise ValueError('tablebases are limited to 4 pieces, got ' + material)
+        types = ['K', 'K', *white, *black]
+        colors = [0, 1, *[0] * len(white), *[1] * len(black)]
+        pawns = 'P' in types
+        if pawns:
+            region = [square for square in range(64) if square % 8 <= 3]
+        else:
+            region = Chesstablebase.triangle
+        symmetries = Chesstablebase.pawn_symmetries if pawns else Chesstablebase.symmetries
+        # For each square of the white king, the symmetries bringing it in the region (2 for the squares of the diagonal)
+        choices = [[mapping for mapping in symmetries if mapping[square] in region] for square in range(64)]
+        size = len(region) * 64 ** (len(types) - 1) * 2
+        return {'material': material, 'types': types, 'colors': colors, 'region': region,
+                'region_index': {square: index for index, square in enumerate(region)}, 'choices': choices,
+                'values': bytearray(size)}
+
+    def _index(self, table, squares, turn):
+        """
+        Returns the index in a table of the position given by the squares of the pieces and the player to move
+        (0 for white, 1 for black), after bringing the position in its canonical symmetry.
+        """
+        choices = table['choices'][squares[0]]
+        if len(choices) == 1:
+            mapping = choices[0]
+            key = [mapping[square] for square in squares]
+        else: # White king on the diagonal : the smallest of the 2 images is kept
+            key = min([mapping[square] for square in squares] for mapping in choices)
+        index = table['region_index'][key[0]]
+        for square in key[1:]:
+            index = index * 64 + square
+        return index * 2 + turn
+
+    def _decode(self, table, index):
+        """
+        Returns the squares of the pieces and the player to move of an index of a table.
+        """
+        turn = index & 1
+        index >>= 1
+        squares = []
+        for piece in range(len(table['types']) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(table['region'][index])
+        squares.reverse()
+        return squares, turn
+
+    def _attacked(self, target, color, types, colors, squares):
+        """
+        Returns True if a square is attacked by one of the pieces of a given color (0 for white, 1 for black).
+        """
+        for piece, square in enumerate(squares):
+            if colors[piece] != color:
+                continue
+            piece_type = types[piece]
+            if piece_type == 'K':
+                if target in Chesstablebase.king[square]:
+                    return True
+            elif piece_type == 'N':
+                if target in Chesstablebase.knight[square]:
+                    return True
+            elif piece_type == 'P':
+                if target in Chesstablebase.pawn_attacks[color][square]:
+                    return True
+            else:
+                line = Chesstablebase.between.get((square, target))
+                if line != None and (piece_type == 'Q' or piece_type == line[0]) \
+                        and not any(other in squares for other in line[1]):
+                    return True
+        return False
+
+    def _is_legal(self, types, colors, squares, turn):
+        """
+        Returns True if a position is legal : pieces on different squares, no pawn on the first or last line,
+        and the player who just moved not in check.
+        """
+        if len(set(squares)) != len(squares):
+            return False
+        for piece, square in enumerate(squares):
+            if types[piece] == 'P' and (square < 8 or square >= 56):
+                return False
+        return not self._attacked(squares[1 - turn], turn, types, colors, squares)
+
+    def _children(self, table, squares, turn):
+        """
+        Returns the list of the positions reached by the legal moves of a position : tuples (True, index) for the
+        positions of the same table, and (False, value code) for the captures and promotions, whose value is read in
+        the tables of the new material sets.
+        """
+        types, colors = table['types'], table['colors']
+        occupied = {square: piece for piece, square in enumerate(squares)}
+        forward = 8 if turn == 0 else -8
+        result = []
+        for piece, square in enumerate(squares):
+            if colors[piece] != turn:
+                continue
+            piece_type = types[piece]
+            if piece_type == 'K':
+                targets = Chesstablebase.king[square]
+            elif piece_type == 'N':
+                targets = Chesstablebase.knight[square]
+            elif piece_type == 'P':
+                targets = []
+                if square + forward not in occupied:
+                    targets.append(square + forward)
+                    start = 1 if turn == 0 else 6
+                    if square // 8 == start and square + 2 * forward not in occupied:
+                        targets.append(square + 2 * forward)
+                targets += [target for target in Chesstablebase.pawn_attacks[turn][square] if target in occupied]
+            else:
+                rays = Chesstablebase.rays[square]
+                rays = rays[:4] if piece_type == 'R' else rays[4:] if piece_type == 'B' else rays
+                targets = []
+                for ray in rays:
+                    for target in ray:
+                        targets.append(target)
+                        if target in occupied:
+                            break
+
+            for target in targets:
+                captured = occupied.get(target)
+                if captured != None and (colors[captured] == turn or types[captured] == 'K'):
+                    continue
+                new_squares = squares[:]
+                new_squares[piece] = target
+                promotion = piece_type == 'P' and (target >= 56 or target < 8)
+                if captured == None and not promotion:
+                    if not self._attacked(new_squares[turn], 1 - turn, types, colors, new_squares):
+                        result.append((True, self._index(table, new_squares, 1 - turn)))
+                    continue
+                for new_type in (('Q', 'R', 'B', 'N') if promotion else (piece_type,)):
+                    new_types = types[:]
+                    new_types[piece] = new_type
+                    new_colors = colors[:]
+                    if captured != None:
+                        del new_types[captured], new_colors[captured], new_squares[captured]
+                    if not self._attacked(new_squares[turn], 1 - turn, new_types, new_colors, new_squares):
+                        result.append((False, self._value(new_types, new_colors, new_squares, 1 - turn, generate = True)))
+                    if captured != None:
+                        new_squares = squares[:]
+                        new_squares[piece] = target
+        return result
+
+    def _predecessors(self, table, squares, turn):
+        """
+        Returns the indexes of the positions from which a position of a table is reached by a move without capture
+        nor promotion ("unmoves" of the player who just moved).
+        """
+        types, colors = table['types'], table['colors']
+        mover = 1 - turn
+        occupied = set(squares)
+        backward = -8 if mover == 0 else 8
+        result = []
+        for piece, square in enumerate(squares):
+            if colors[piece] != mover:
+                continue
+            piece_type = types[piece]
+            if piece_type == 'K':
+                origins = [origin for origin in Chesstablebase.king[square] if origin not in occupied]
+            elif piece_type == 'N':
+                origins = [origin for origin in Chesstablebase.knight[square] if origin not in occupied]
+            elif piece_type == 'P':
+                origins = []
+                origin = square + backward
+                if origin not in occupied and 8 <= origin < 56:
+                    origins.append(origin)
+                    if square // 8 == (3 if mover == 0 else 4) and origin + backward not in occupied:
+                        origins.append(origin + backward)
+            else:
+                rays = Chesstablebase.rays[square]
+                rays = rays[:4] if piece_type == 'R' else rays[4:] if piece_type == 'B' else rays
+                origins = []
+                for ray in rays:
+                    for origin in ray:
+                        if origin in occupied:
+                            break
+                        origins.append(origin)
+            for origin in origins:
+                new_squares = squares[:]
+                new_squares[piece] = origin
+                if not self._attacked(new_squares[turn], mover, types, colors, new_squares): # Legal position
+                    result.append(self._index(table, new_squares, mover))
+        return result
+
+    def _value(self, types, colors, squares, turn, generate = False):
+        """
+        Returns the value code of any position, for the player to move, read in the table of its material set.
+        Returns None if the table is not available (and generate is False).
+        """
+        white = [piece_type for piece_type, color in zip(types, colors) if color == 0 and piece_type != 'K']
+        black = [piece_type for piece_type, color in zip(types, colors) if color == 1 and piece_type != 'K']
+        if not white and not black:
+            return Chesstablebase.draw
+        material = Chesstablebase.material_name(white, black)
+        table = self._table(material, generate = False)
+        if table == None: # The material set may be stored with the colors swapped
+            flipped = Chesstablebase.material_name(black, white)
+            table = self._table(flipped, generate = False)
+            if table != None or not generate:
+                material = flipped
+            if table != None:
+                colors = [1 - color for color in colors]
+                squares = [square ^ 56 for square in squares]
+                turn = 1 - turn
+        if table == None:
+            if not generate:
+                return None
+            table = self._table(material, generate = True)
+        # Pieces in the order of the table : kings, then the pieces of each color in the order of the material name
+        pieces = sorted(range(len(types)), key = lambda piece: (types[piece] != 'K', colors[piece],
+                                                               Chesstablebase.order.index(types[piece]) if types[piece] != 'K' else 0))
+        return table['values'][self._index(table, [squares[piece] for piece in pieces], turn)]
+
+    def _table(self, material, generate = False):
+        """
+        Returns the table of a material set, loaded from the directory if needed, or generated if generate is True.
+        Returns None if the table is not available.
+        """
+        table = self.tables.get(material)
+        if table == None and self.directory != None and material not in self.missing:
+            if os.path.exists(os.path.join(self.directory, material + '.tb')):
+                table = self._new_table(material)
+                with open(os.path.join(self.directory, material + '.tb'), 'rb') as file:
+                    table['values'] = bytearray(file.read())
+                self.tables[material] = table
+            else:
+                self.missing.add(material)
+        if table == None and generate:
+            table = self.generate(material)
+        return table
+
+    def generate(self, material, verbose = False):
+        """
+        Generates by retrograde analysis the table of a material set, and the tables of the material sets reached by
+        its captures and promotions. Returns the table. Generating a 4-piece table takes a few minutes.
+
+        Parameters
+        ----------
+            material : str
+                The material set, written as the pieces of white, 'v', then the pieces of black (e.g. 'KQvK', 'KPvK' or
+                'KBNvK'). The same table is used with the colors swapped.
+            verbose : bool
+                If True, the progress of the generation is printed.
+                Default is False.
+        """
+        white, black = material.upper().replace('V', 'v')[1:].split('vK')
+        material = Chesstablebase.material_name(white, black)
+        if material in self.tables:
+            return self.tables[material]
+        start = time.perf_counter()
+        table = self._new_table(material)
+        types, colors, values = table['types'], table['colors'], table['values']
+        wins_at, checks_at = {}, {} # Positions to be marked as won, or to be checked as lost, at a given number of plies
+        current = []
+
+        # First pass : illegal positions, mates, and results given by the captures and promotions
+        for index in range(len(values)):
+            squares, turn = self._decode(table, index)
+            if not self._is_legal(types, colors, squares, turn) or self._index(table, squares, turn) != index:
+                values[index] = Chesstablebase.illegal # Illegal, or symmetric to another position of the table
+                continue
+            children = self._children(table, squares, turn)
+            if not children:
+                if self._attacked(squares[turn], 1 - turn, types, colors, squares):
+                    current.append(index) # Checkmate (otherwise stalemate, which stays a draw)
+                continue
+            for in_table, child in children:
+                if not in_table and child >= 2:
+                    plies = child - 2 + 1
+                    (checks_at if plies % 2 == 0 else wins_at).setdefault(plies, []).append(index)
+
+        # Retrograde analysis, one number of plies after the other
+        plies = 0
+        while current or any(level >= plies for level in (*wins_at, *checks_at)):
+            for index in current:
+                values[index] = plies + 2
+            candidates = set(wins_at.pop(plies + 1, [])) | set(checks_at.pop(plies + 1, []))
+            for index in current:
+                squares, turn = self._decode(table, index)
+                candidates.update(self._predecessors(table, squares, turn))
+            if verbose:
+                print('%s : %d positions with a mate in %d plies' % (material, len(current), plies))
+            plies += 1
+            current = []
+            for index in candidates:
+                if values[index] != Chesstablebase.draw:
+                    continue
+                if plies % 2 == 1: # A move leads to a position lost in plies - 1 : won in plies
+                    current.append(index)
+                elif self._is_lost(table, index): # All the moves lead to positions won by the opponent
+                    current.append(index)
+
+        self.tables[material] = table
+        if verbose:
+            print('%s generated in %.1f s' % (material, time.perf_counter() - start))
+        return table
+
+    def _is_lost(self, table, index):
+        """
+        Returns True if all the moves of a position lead to positions won by the opponent (already found).
+        """
+        squares, turn = self._decode(table, index)
+        children = self._children(table, squares, turn)
+        values = table['values']
+        for in_table, child in children:
+            code = values[child] if in_table else child
+            if code < 2 or (code - 2) % 2 == 0: # Draw, not yet known, or lost for the opponent
+                return False
+        return bool(children)
+
+    def save(self, directory = None):
+        """
+        Saves all the tables in a folder, one file '<material>.tb' per table, with one byte per position.
+
+        Parameters
+        ----------
+            directory : str or None
+                The folder. If None, the directory attribute is used.
+                Default is None.
+        """
+        directory = directory if directory != None else self.directory
+        os.makedirs(directory, exist_ok = True)
+        for material, table in self.tables.items():
+            with open(os.path.join(directory, material + '.tb'), 'wb') as file:
+                file.write(table['values'])
+
+    def probe(self, board):
+        """
+        Returns a tuple (result, plies) for a position : result is 1 if the player to move wins, -1 if they lose and
+        0 for a draw, and plies is the number of plies to mate with perfect play (0 for a draw).
+        Returns None if the material set of the position has no table, or if castling or "prise en passant"
+        is possible.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position.
+        """
+        if board.big_castle_white or board.small_castle_white or board.big_castle_black or board.small_castle_black:
+            if any(board.squares[ref].piece != None and board.squares[ref].piece.piece_type == 'R' for ref in ('a1', 'h1', 'a8', 'h8')):
+                return None
+        if board.en_passant_square() != None:
+            return None
+        types, colors, squares = [], [], []
+        for ref, square in board.squares.items():
+            piece = square.piece
+            if piece != None:
+                if len(types) == 4:
+                    return None
+                types.append(piece.piece_type)
+                colors.append(0 if piece.color == 'White' else 1)
+                squares.append(Chessmove.square_index[ref])
+        code = self._value(types, colors, squares, 0 if board.turn == 'White' else 1)
+        if code == None or code == Chesstablebase.illegal:
+            return None
+        if code == Chesstablebase.draw:
+            return (0, 0)
+        return (1 if (code - 2) % 2 == 1 else -1, code - 2)
+
+    def best_move(self, board):
+        """
+        Returns a tuple (move, result, plies) with the best legal move of a position according to the tables : the
+        fastest mate if the position is won, a drawing move if it is drawn, the longest resistance if it is lost.
+        result and plies are those of probe for the position. Returns None if a position after a move cannot be probed.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position.
+        """
+        best, best_key = None, None
+        for move in board.legal_moves():
+            board.make_move(*move)
+            result = self.probe(board)
+            board.unmake_move()
+            if result == None:
+                return None
+            result, plies = result[0], result[1] + 1 # Probed for the opponent
+            if result < 0: # The opponent loses : mate as fast as possible
+                key = (2, -plies)
+            elif result == 0:
+                key = (1, 0)
+            else: # The opponent wins : resist as long as possible
+                key = (0, plies)
+            if best_key == None or key > best_key:
+                best, best_key = move, key
+        if best == None:
+            return None
+        return (best, best_key[0] - 1, abs(best_key[1]))
+
+    def adjudicate(self, board):
+        """
+        Returns the result of the game ('1-0', '0-1' or '1/2-1/2') in a position with perfect play, or None if the
+        position cannot be probed.
+
+        Parameters
+        ----------
+            board : Chessboard object
+                The position.
+        """
+        result = self.probe(board)
+        if result == None:
+            return None
+        if result[0] == 0:
+            return '1/2-1/2'
+        return '1-0' if (result[0] > 0) == (board.turn == 'White') else '0-1'
+
+
+if __name__ == "__main__":
+    import sys
+    directory = sys.argv[1]
+    tablebase = Chesstablebase(directory)
+    for material in sys.argv[2:]:
+        tablebase.generate(material, verbose = True)
+    tablebase.save()
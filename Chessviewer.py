@@ -0,0 +1,216 @@
+from Chessgame import *
+import threading
+
+class Chessviewer:
+    """
+    A class to browse the positions of a Chessgame : playback with a timer, seek to any ply, and step forward or backward.
+
+    ...
+
+    All the positions of the game are computed once, in a single pass without any printing, when the viewer is created.
+    The frames (move reference and ASCII board) are only rendered the first time they are shown, and kept, so moving
+    through a long game never replays it. The playback is driven by a timer thread instead of time.sleep, so the
+    viewer can be paused, resumed or moved while it is playing.
+
+    Attributes
+    ----------
+    game : Chessgame object
+        The game viewed.
+    positions : list of str
+        The Forsyth–Edwards Notation (FEN) of the position after each ply (index 0 is the initial position).
+    refs : list of str
+        The reference of the move of each ply, in standard algebraic notation (index 0 is None).
+    ply : int
+        The ply of the position currently shown.
+    delay : float
+        The time in seconds between two frames during the playback.
+    error : str or None
+        The reference of the first move that could not be executed, if any : the game is viewed until this move.
+
+    Methods
+    -------
+    frame(self, ply = None):
+        Returns the rendered frame of a ply.
+
+    show(self):
+        Prints the frame of the current ply.
+
+    seek(self, ply):
+        Moves to a ply and shows it.
+
+    step(self, plies = 1):
+        Moves forward (or backward if plies is negative) and shows the new ply.
+
+    play(self, delay = None):
+        Starts the playback from the current ply.
+
+    pause(self):
+        Stops the playback.
+
+    wait(self):
+        Waits until the end of the playback.
+    """
+
+    def __init__(self, game, delay = 1.0, output = None):
+        """
+        Instantiate a Chessviewer object and computes all the positions of the game.
+
+        Parameters
+        ----------
+            game : Chessgame object
+                The game to be viewed.
+            delay : float
+                The time in seconds between two frames during the playback.
+                Default is 1.0.
+            output : function or None
+                The function called with each frame to show it. If None, the frames are printed.
+                Default is None.
+        """
+        self.game = game
+        self.delay = delay
+        self.output = output if output != None else print
+        self.positions = []
+        self.refs = [None]
+        self.error = None
+        self.frames = {}
+        self.ply = 0
+        self.timer = None
+        self.finished = threading.Event()
+        self.finished.set()
+        self.lock = threading.Lock()
+
+        board = Chessboard()
+        self.positions.append(board.encode_fen())
+        for ref in game.moves:
+            try:
+                move = board.parse_move(ref)
+            except MoveError:
+                self.error = ref
+                break
+            self.refs.append(board.to_san(move))
+            board.make_move(*move)
+            self.positions.append(board.encode_fen())
+
+    def __len__(self):
+        """
+        Called by the len() built-in function. Returns the number of plies of the game.
+        """
+        return len(self.positions) - 1
+
+    def frame(self, ply = None):
+        """
+        Returns the frame of a ply : the number and reference of its move and the ASCII representation of the board.
+        The frame is rendered the first time it is asked for, and cached.
+
+        Parameters
+        ----------
+            ply : int or None
+                The ply. If None, the current ply.
+                Default is None.
+        """
+        ply = self.ply if ply == None else ply
+        frame = self.frames.get(ply)
+        if frame == None:
+            if ply == 0:
+                title = 'Initial position'
+            else:
+                title = '%d%s %s' % ((ply + 1) // 2, '.' if ply % 2 else '...', self.refs[ply])
+            frame = title + '\n' + str(Chessboard(fen = self.positions[ply]))
+            if ply == len(self):
+                frame += '\n' + (('Game stopped : move %s not understood' % self.error) if self.error != None else str(self.game.result))
+            self.frames[ply] = frame
+        return frame
+
+    def show(self):
+        """
+        Shows the frame of the current ply.
+        """
+        self.output(self.frame())
+
+    def seek(self, ply):
+        """
+        Moves to a ply (clamped to the plies of the game) and shows it.
+
+        Parameters
+        ----------
+            ply : int
+                The ply to be shown (0 for the initial position).
+        """
+        with self.lock:
+            self.ply = max(0, min(ply, len(self)))
+            self.show()
+
+    def step(self, plies = 1):
+        """
+        Moves forward, or backward if plies is negative, and shows the new ply.
+
+        Parameters
+        ----------
+            plies : int
+                The number of plies to move.
+                Default is 1.
+        """
+        self.seek(self.ply + plies)
+
+    def play(self, delay = None):
+        """
+        Starts the playback from the current ply : a new frame is shown every delay seconds by a timer thread,
+        until the end of the game or a call to pause. The method returns immediately.
+
+        Parameters
+        ----------
+            delay : float or None
+                The time in seconds between two frames. If None, the delay attribute is used.
+                Default is None.
+        """
+        if delay != None:
+            self.delay = delay
+        self.pause()
+        self.finished.clear()
+        self.show()
+        self._schedule()
+
+    def _schedule(self):
+        """
+        Starts the timer showing the next frame, or ends the playback at the end of the game.
+        """
+        if self.ply >= len(self):
+            self.timer = None
+            self.finished.set()
+            return
+        self.timer = threading.Timer(self.delay, self._tick)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _tick(self):
+        """
+        Called by the timer : shows the next frame and schedules the following one.
+        """
+        with self.lock:
+            if self.finished.is_set(): # Paused while the timer was expiring
+                return
+            self.ply += 1
+            self.show()
+            self._schedule()
+
+    def pause(self):
+        """
+        Stops the playback. The current ply is kept, so that play resumes from it.
+        """
+        with self.lock:
+            if self.timer != None:
+                self.timer.cancel()
+                self.timer = None
+            self.finished.set()
+
+    def wait(self, timeout = None):
+        """
+        Waits until the end of the playback (or its pause). Returns True if the playback ended.
+
+        Parameters
+        ----------
+            timeout : float or None
+                The maximum waiting time in seconds. If None, waits without limit.
+                Default is None.
+        """
+        return self.finished.wait(timeout)
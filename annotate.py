@@ -0,0 +1,243 @@
+from Chessengine import *
+from Chesspgn import *
+from Chesscache import *
+import argparse
+import collections
+import time
+
+clamp = 1000 # Evaluations are limited to +/- 10 pawns when the losses are measured : a won position stays won
+
+_engine = None # Engine of a worker process, kept between the games
+_cache = None # Evaluations of a worker process, by position key, kept between the games
+
+
+def replay(game):
+    """
+    Replays a game read by Chesspgn.read_games and returns a tuple (sans, moves, keys, complete) : its moves in standard
+    algebraic notation, its moves as Chessmove objects, the keys of its positions (one more than the moves), and False
+    if a move could not be executed (the game is then annotated until this move).
+
+    Parameters
+    ----------
+        game : dict
+            The game, with its tags and the references of its moves.
+    """
+    fen = game['tags'].get('FEN')
+    board = Chessboard(fen = fen) if fen != None else Chessboard()
+    sans, moves, keys = [], [], [board.key]
+    for ref in game['moves']:
+        try:
+            move = board.parse_move(ref)
+        except MoveError:
+            return sans, moves, keys, False
+        sans.append(board.to_san(move))
+        moves.append(move)
+        board.make_move(*move)
+        keys.append(board.key)
+    return sans, moves, keys, True
+
+
+def format_score(score, turn):
+    """
+    Returns an evaluation as the text of a comment, from the point of view of White : in pawns (e.g. '+0.35'),
+    or in moves before mate (e.g. '#3' or '#-2').
+
+    Parameters
+    ----------
+        score : int
+            The score in centipawns, from the point of view of the player to move.
+        turn : str
+            The color of the player to move ('White' or 'Black').
+    """
+    score = score if turn == 'White' else -score
+    if abs(score) >= Chessengine.mate_score - Chessengine.max_ply:
+        moves = (Chessengine.mate_score - abs(score) + 1) // 2
+        return '#%d' % moves if score > 0 else '#-%d' % moves
+    return '%+.2f' % (score / 100)
+
+
+def _evaluate(board, nodes, known, evaluations):
+    """
+    Returns a tuple (score, move) with the score of a position for the player to move and the best move (None if
+    there is no legal move), read in the evaluations already known or in the cache of the worker, or searched by the
+    engine. The new evaluations are added to the cache and to the evaluations dictionnary.
+    """
+    value = known.get(board.key)
+    if value == None:
+        value = _cache.get(board.key)
+    if value != None:
+        return value
+    moves = board.legal_moves()
+    if not moves:
+        value = (-Chessengine.mate_score if board.is_attacked(board.king_squares[board.turn], board.opponents[board.turn])
+                 else 0, None)
+    elif len(moves) == 1: # The engine does not search a forced move : the score is the one of the next position
+        board.make_move(*moves[0])
+        score = _evaluate(board, nodes, known, evaluations)[0]
+        board.unmake_move()
+        if abs(score) >= Chessengine.mate_score - Chessengine.max_ply: # One more ply before mate
+            score += 1 if score > 0 else -1
+        value = (-score, moves[0])
+    else:
+        move = _engine.search(board, nodes = nodes)
+        value = (_engine.score, move)
+    _cache.put(board.key, value)
+    evaluations[board.key] = value
+    return value
+
+
+def annotate_game(task):
+    """
+    Evaluates each position of a game and returns a dictionnary with its moves, annotations and result, and the new
+    evaluations. This function runs in the worker processes of annotate.
+
+    Parameters
+    ----------
+        task : dict
+            The game, the node budget of each search, the thresholds of the mistakes and of the blunders, the size of
+            the cache and the evaluations already known by the main process.
+    """
+    global _engine, _cache
+    if _engine == None:
+        _engine = Chessengine(table = Chesstable(1 << 16))
+        _cache = Chesscache(task['cache_size'])
+    game = task['game']
+    sans, moves, keys, complete = replay(game)
+    fen = game['tags'].get('FEN')
+    board = Chessboard(fen = fen) if fen != None else Chessboard()
+    evaluations = {}
+    annotations = []
+    before = _evaluate(board, task['nodes'], task['known'], evaluations)
+    for san, move in zip(sans, moves):
+        board.make_move(*move)
+        after = _evaluate(board, task['nodes'], task['known'], evaluations)
+        loss = max(min(before[0], clamp), -clamp) - max(min(-after[0], clamp), -clamp)
+        nag = None
+        if move != before[1] and loss >= task['blunder']:
+            nag = 4
+        elif move != before[1] and loss >= task['mistake']:
+            nag = 2
+        if after[1] == None and after[0] != 0: # Checkmate : no evaluation
+            comment = None
+        else:
+            comment = format_score(after[0], board.turn)
+        if nag != None:
+            board.unmake_move()
+            comment += '. Best was %s' % board.to_san(before[1])
+            board.make_move(*move)
+        annotations.append((nag, comment))
+        before = after
+    return {'tags': game['tags'], 'sans': sans, 'annotations': annotations,
+            'result': game['result'] if complete else '*', 'evaluations': evaluations}
+
+
+def annotate(files, output, nodes = 5000, mistake = 100, blunder = 300, workers = None, french = False,
+             cache_size = 65536, report_every = 0):
+    """
+    Writes the games of pgn files in a new pgn file, with an evaluation comment after each move and the NAG '?' or '??'
+    after the mistakes and the blunders, detected when the evaluation drops by more than a threshold.
+    Returns a dictionnary with the number of games, of positions, of positions searched by the engine, of mistakes and
+    of blunders.
+
+    Each position is searched by the engine with a fixed number of nodes, in a pool of worker processes. The
+    evaluations are cached by position key : in each worker, and in the main process, which sends the known
+    evaluations of a game with it, so the positions of the openings repeated across the games are searched only once.
+
+    Parameters
+    ----------
+        files : list of str
+            The paths of the pgn files.
+        output : str
+            The path of the annotated pgn file.
+        nodes : int
+            The maximum number of nodes of the search of each position.
+            Default is 5000.
+        mistake : int
+            The loss in centipawns from which a move is annotated as a mistake ('?').
+            Default is 100.
+        blunder : int
+            The loss in centipawns from which a move is annotated as a blunder ('??').
+            Default is 300.
+        workers : int or None
+            The number of worker processes. If None, the number of processors is used.
+            Default is None.
+        french : bool
+            To be set to True if the games are in french notations.
+            Default is False.
+        cache_size : int
+            The maximum number of evaluations kept in the cache of each process.
+            Default is 65536.
+        report_every : int
+            If not 0, the progress is printed each time this number of games is annotated.
+            Default is 0.
+    """
+    # Imported on first use : the worker processes import this module, and do not need the pool modules
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    start = time.perf_counter()
+    workers = workers if workers != None else (multiprocessing.cpu_count() or 1)
+    cache = Chesscache(cache_size)
+    stats = {'games': 0, 'positions': 0, 'searched': 0, 'mistakes': 0, 'blunders': 0}
+
+    def tasks():
+        for file in files:
+            for game in Chesspgn.read_games(file, french = french):
+                keys = replay(game)[2]
+                known = {}
+                for key in keys:
+                    value = cache.get(key)
+                    if value != None:
+                        known[key] = value
+                yield {'game': game, 'nodes': nodes, 'mistake': mistake, 'blunder': blunder,
+                       'cache_size': cache_size, 'known': known}
+
+    def write(result):
+        for key, value in result['evaluations'].items():
+            cache.put(key, value)
+        tags = dict(result['tags'])
+        fen = tags.pop('FEN', None)
+        tags.pop('SetUp', None)
+        tags.pop('Result', None)
+        termination = tags.pop('Termination', None)
+        tags['Annotator'] = 'annotate.py (%d nodes)' % nodes
+        writer.begin_game(fen = fen, **tags)
+        for san, (nag, comment) in zip(result['sans'], result['annotations']):
+            writer.add_move(san, nag = nag, comment = comment)
+            stats['mistakes'] += nag == 2
+            stats['blunders'] += nag == 4
+        writer.end_game(result = result['result'], termination = termination)
+        stats['games'] += 1
+        stats['positions'] += len(result['sans']) + 1
+        stats['searched'] += len(result['evaluations'])
+        if report_every and stats['games'] % report_every == 0:
+            print('%d games annotated, %.1f games/s' % (stats['games'], stats['games'] / (time.perf_counter() - start)))
+
+    with Chesspgn(output, mode = 'w') as writer:
+        with ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn')) as executor:
+            pending = collections.deque() # Games in progress, written in the order of the input files
+            for task in tasks():
+                pending.append(executor.submit(annotate_game, task))
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Writes the games of pgn files in a new pgn file, annotated by the engine.')
+    parser.add_argument('output', help = 'output pgn file')
+    parser.add_argument('files', nargs = '+', help = 'input pgn files')
+    parser.add_argument('--nodes', type = int, default = 5000, help = 'nodes searched in each position')
+    parser.add_argument('--mistake', type = int, default = 100, help = 'loss in centipawns of a mistake (?)')
+    parser.add_argument('--blunder', type = int, default = 300, help = 'loss in centipawns of a blunder (??)')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes')
+    parser.add_argument('--french', action = 'store_true', help = 'the input games are in french notations')
+    arguments = parser.parse_args()
+
+    stats = annotate(arguments.files, arguments.output, nodes = arguments.nodes, mistake = arguments.mistake,
+                     blunder = arguments.blunder, workers = arguments.workers, french = arguments.french, report_every = 10)
+    print('%d games, %d positions (%d searched), %d mistakes, %d blunders in %.1f s'
+          % (stats['games'], stats['positions'], stats['searched'], stats['mistakes'], stats['blunders'],
+             stats['seconds']))
@@ -0,0 +1,265 @@
+from Chessgame import *
+from Chessengine import *
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Middlegame position used by the micro benchmarks (Italian game after 6 moves)
+middlegame_fen = 'r1bq1rk1/pppp1ppp/2n2n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQK2R w KQ - 1 6'
+middlegame_refs = ['Bg5', 'Nxe5', 'O-O', 'a3', 'Bb5', 'Ng5', 'Qe2', 'Kf1', 'h3', 'Na4']
+# Positions of the perft check with the reference number of leaf positions for the depths 1, 2, 3...
+perft_positions = (
+    ('initial', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', (20, 400, 8902, 197281)),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', (48, 2039, 97862)),
+    ('endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', (14, 191, 2812, 43238)),
+    ('promotions', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', (6, 264, 9467)),
+    ('checks', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', (44, 1486, 62379)),
+)
+pgn_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pgn_files')
+
+
+def perft(board, depth):
+    """
+    Returns the number of leaf positions reached by all the sequences of legal moves of a given depth.
+    The reference values from the initial position are 20, 400, 8902 and 197281 for the depths 1 to 4.
+
+    Parameters
+    ----------
+        board : Chessboard object
+            The position from which the moves are counted.
+        depth : int
+            The number of plies.
+    """
+    moves = board.legal_moves()
+    if depth == 1:
+        return len(moves)
+    count = 0
+    for move in moves:
+        board.make_move(*move)
+        count += perft(board, depth - 1)
+        board.unmake_move()
+    return count
+
+
+def check_perft(max_depth = 3):
+    """
+    Counts the leaf positions of the perft positions up to a depth, prints each count with its reference value,
+    and returns the list of the wrong counts (name, depth, count, reference). A wrong count means a bug of the move
+    generation (e.g. of the attacks of the sliding pieces, castling, en passant or promotions).
+
+    Parameters
+    ----------
+        max_depth : int
+            The maximum depth of the counts.
+            Default is 3.
+    """
+    errors = []
+    for name, fen, references in perft_positions:
+        for depth, reference in enumerate(references[:max_depth], 1):
+            start = time.perf_counter()
+            count = perft(Chessboard(fen = fen), depth)
+            status = 'ok' if count == reference else 'WRONG (expected %d)' % reference
+            print('perft %-10s depth %d %10d  %10s  %s' % (name, depth, count, duration(time.perf_counter() - start), status))
+            if count != reference:
+                errors.append((name, depth, count, reference))
+    return errors
+
+
+def replay_pgn_files():
+    """
+    Replays the games of all the pgn files of the pgn_files folder with Chessboard.move, as viewgame.py does.
+    """
+    for file in sorted(glob.glob(os.path.join(pgn_folder, '*.pgn'))):
+        game = Chessgame(file, french = os.path.basename(file).startswith('Topalov'))
+        board = Chessboard()
+        with contextlib.redirect_stdout(io.StringIO()):
+            board.move(*game.moves, quiet = True)
+
+
+def cold_start(module):
+    """
+    Starts a new python interpreter importing a module of the project, as a command line or a spawned worker process
+    does, and waits for its end.
+    """
+    import subprocess # Imported on first use : only the startup benchmarks need it
+    subprocess.run([sys.executable, '-c', 'import ' + module], cwd = os.path.dirname(os.path.abspath(__file__)), check = True)
+
+
+def benchmarks(full = False):
+    """
+    Returns a dictionnary with the name of each benchmark as keys and, as values, a tuple with the function to
+    time and the number of calls of the function in one round.
+    The micro benchmarks time one Chessboard operation on a middlegame position, the macro benchmarks time
+    complete workloads.
+
+    Parameters
+    ----------
+        full : bool
+            If True, the slow macro benchmarks (perft 4 and depth 4 search) are included.
+            Default is False.
+    """
+    board = Chessboard(fen = middlegame_fen)
+    knight = board.squares['f3']
+    bishop = board.squares['c4']
+    move = board.parse_move('Nxe5')
+
+    def make_unmake():
+        board.make_move(*move)
+        board.unmake_move()
+
+    def parse_refs():
+        for ref in middlegame_refs:
+            board.parse_move(ref)
+
+    result = {
+        'micro.attacks': (lambda: board.attacks(knight), 2000),
+        'micro.attacks_slider': (lambda: board.attacks(bishop), 2000),
+        'micro.is_valid': (lambda: board.is_valid('f3', 'e5', quiet = True), 200),
+        'micro.is_attacked': (lambda: board.is_attacked('e1', 'Black'), 5000),
+        'micro.possible_moves': (lambda: board.possible_moves('White'), 1),
+        'micro.legal_moves': (lambda: board.legal_moves(), 50),
+        'micro.legal_moves_san': (lambda: board.legal_moves_san(), 10),
+        'micro.make_unmake': (make_unmake, 5000),
+        'micro.encode_fen': (lambda: board.encode_fen(), 2000),
+        'micro.parse_move': (parse_refs, 50),
+        'macro.replay_pgn_files': (replay_pgn_files, 1),
+        'macro.perft_3': (lambda: perft(Chessboard(), 3), 1),
+        'startup.viewgame': (lambda: cold_start('viewgame'), 1),
+        'startup.playgame': (lambda: cold_start('playgame'), 1),
+        'startup.selfplay_worker': (lambda: cold_start('selfplay'), 1),
+        'macro.search_depth_3': (lambda: Chessengine().search(Chessboard(fen = middlegame_fen), depth = 3), 1),
+    }
+    if full:
+        result['macro.perft_4'] = (lambda: perft(Chessboard(), 4), 1)
+        result['macro.search_depth_4'] = (lambda: Chessengine().search(Chessboard(fen = middlegame_fen), depth = 4), 1)
+    return result
+
+
+def duration(seconds):
+    """
+    Returns a duration as a string, in the most readable unit (us, ms or s).
+    """
+    if seconds < 1e-3:
+        return '%.1f us' % (seconds * 1e6)
+    if seconds < 1:
+        return '%.1f ms' % (seconds * 1e3)
+    return '%.2f s' % seconds
+
+
+def run(rounds = 3, full = False, select = None):
+    """
+    Runs the benchmarks and returns the results : for each benchmark, the minimum, median and mean time of one call
+    in seconds over the rounds, with the context of the run (date, python version, machine).
+
+    Parameters
+    ----------
+        rounds : int
+            The number of rounds of each benchmark.
+            Default is 3.
+        full : bool
+            If True, the slow macro benchmarks are included.
+            Default is False.
+        select : str or None
+            If given, only the benchmarks whose name contains this string are run.
+            Default is None.
+    """
+    results = {}
+    for name, (function, number) in benchmarks(full).items():
+        if select != None and select not in name:
+            continue
+        function() # Warm-up call, also filling the caches
+        times = []
+        for round in range(rounds):
+            start = time.perf_counter()
+            for call in range(number):
+                function()
+            times.append((time.perf_counter() - start) / number)
+        results[name] = {'min': min(times), 'median': statistics.median(times), 'mean': statistics.mean(times),
+                         'rounds': rounds, 'calls': number}
+        print('%-26s %10s  (min %s)' % (name, duration(results[name]['median']), duration(results[name]['min'])))
+    return {'date': datetime.datetime.now().isoformat(timespec = 'seconds'), 'python': platform.python_version(),
+            'machine': platform.platform(), 'benchmarks': results}
+
+
+def compare(baseline, current, threshold = 10.0):
+    """
+    Compares the median times of two benchmark results, prints the change of each benchmark, and returns the list
+    of the benchmarks slower than the baseline by more than the threshold.
+
+    Parameters
+    ----------
+        baseline : dict
+            The reference results, as returned by run.
+        current : dict
+            The new results, as returned by run.
+        threshold : float
+            The slowdown, in percent, above which a benchmark is a regression.
+            Default is 10.
+    """
+    regressions = []
+    for name, result in current['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            print('%-26s %10s' % (name, 'new'))
+            continue
+        before = baseline['benchmarks'][name]['median']
+        change = 100 * (result['median'] - before) / before if before > 0 else 0.0
+        status = ''
+        if change > threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        print('%-26s %10s -> %10s  %+7.1f %%  %s' % (name, duration(before), duration(result['median']), change, status))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Runs the benchmarks of the project and compares them to a baseline.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    run_parser = commands.add_parser('run', help = 'run the benchmarks')
+    run_parser.add_argument('--output', help = 'JSON file in which the results are saved (e.g. a new baseline)')
+    run_parser.add_argument('--compare', help = 'JSON baseline to compare the results with')
+    run_parser.add_argument('--threshold', type = float, default = 10.0, help = 'slowdown in percent failing the comparison')
+    run_parser.add_argument('--rounds', type = int, default = 3)
+    run_parser.add_argument('--full', action = 'store_true', help = 'include perft 4 and the depth 4 search')
+    run_parser.add_argument('--select', help = 'only run the benchmarks whose name contains this string')
+    perft_parser = commands.add_parser('perft', help = 'check the move generation on the perft positions')
+    perft_parser.add_argument('--depth', type = int, default = 3, help = 'maximum depth of the counts')
+    compare_parser = commands.add_parser('compare', help = 'compare two saved results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type = float, default = 10.0, help = 'slowdown in percent failing the comparison')
+    arguments = parser.parse_args()
+
+    if arguments.command == 'perft':
+        errors = check_perft(arguments.depth)
+        if errors:
+            print('%d wrong perft count(s)' % len(errors))
+            sys.exit(1)
+        sys.exit(0)
+
+    if arguments.command == 'run':
+        current = run(rounds = arguments.rounds, full = arguments.full, select = arguments.select)
+        if arguments.output:
+            with open(arguments.output, 'w') as file:
+                json.dump(current, file, indent = 2)
+        baseline_file = arguments.compare
+    else:
+        with open(arguments.current) as file:
+            current = json.load(file)
+        baseline_file = arguments.baseline
+
+    if baseline_file:
+        with open(baseline_file) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, current, arguments.threshold)
+        if regressions:
+            print('%d benchmark(s) slower than the baseline by more than %.0f %% : %s'
+                  % (len(regressions), arguments.threshold, ', '.join(regressions)))
+            sys.exit(1)
@@ -0,0 +1,184 @@
+from Chessboard import *
+from Chesspgn import *
+import argparse
+import hashlib
+import heapq
+import os
+import struct
+import tempfile
+import time
+
+entry = struct.Struct('<QQ') # Fingerprint and number of a game, in the sorted runs
+
+
+def canonical_game(game):
+    """
+    Replays a game read by Chesspgn.read_games and returns a tuple (sans, codes, key, complete) : its moves in standard
+    algebraic notation, its moves encoded by Chessmove.to_code, the key of its final position, and False if a move
+    could not be executed (the game is then kept until this move).
+    Two games with the same moves give the same result, whatever their move numbers, notation details
+    ('Nf3' or 'Ng1f3', 'e8=Q' or 'e8Q', annotations...) or tags.
+
+    Parameters
+    ----------
+        game : dict
+            The game, with its tags and the references of its moves.
+    """
+    fen = game['tags'].get('FEN')
+    board = Chessboard(fen = fen) if fen != None else Chessboard()
+    sans, codes = [], []
+    for ref in game['moves']:
+        try:
+            move = board.parse_move(ref)
+        except MoveError:
+            return sans, codes, board.key, False
+        sans.append(board.to_san(move))
+        codes.append(move.to_code())
+        board.make_move(*move)
+    return sans, codes, board.key, True
+
+
+def fingerprint(codes, key):
+    """
+    Returns the 64-bit fingerprint of a game : a hash of its list of moves and of the key of its final position.
+
+    Parameters
+    ----------
+        codes : list of int
+            The moves of the game, encoded by Chessmove.to_code.
+        key : int
+            The Zobrist key of the final position.
+    """
+    data = struct.pack('<%dHQ' % len(codes), *codes, key)
+    return int.from_bytes(hashlib.blake2b(data, digest_size = 8).digest(), 'little')
+
+
+def _write_run(entries):
+    """
+    Writes (fingerprint, game number) entries, sorted, in a temporary run file and returns its path.
+    """
+    descriptor, path = tempfile.mkstemp(suffix = '.run')
+    with os.fdopen(descriptor, 'wb', buffering = 1 << 16) as stream:
+        for item in sorted(entries):
+            stream.write(entry.pack(*item))
+    return path
+
+
+def _read_run(file):
+    """
+    Returns the entries of a sorted run one after the other.
+    """
+    with open(file, 'rb') as stream:
+        while True:
+            data = stream.read(entry.size * 4096)
+            if not data:
+                break
+            yield from entry.iter_unpack(data)
+
+
+def dedup(files, output, french = False, max_entries = 1000000, report_every = 0):
+    """
+    Writes the games of pgn files in a new pgn file, in standard algebraic notation and without the duplicates.
+    Returns a dictionnary with the number of games read, of games written, of duplicates, of groups of duplicated
+    games, of copies of the most duplicated game, and of games with a move that could not be executed.
+
+    The games are read and replayed once (first pass) : each canonical game is written in a temporary pgn file,
+    and its fingerprint in a buffer, sorted and written in a temporary run when it holds max_entries fingerprints.
+    The runs are merged to find the duplicates, marked with one bit per game, so the memory used does not
+    depend on the size of the archive. The second pass copies the first copy of each game in the output.
+
+    Parameters
+    ----------
+        files : list of str
+            The paths of the pgn files.
+        output : str
+            The path of the output pgn file.
+        french : bool
+            To be set to True if the games are in french notations.
+            Default is False.
+        max_entries : int
+            The number of fingerprints kept in memory before they are written in a sorted run.
+            Default is 1000000.
+        report_every : int
+            If not 0, the progress is printed each time this number of games is read.
+            Default is 0.
+    """
+    start = time.perf_counter()
+    stats = {'games': 0, 'written': 0, 'duplicates': 0, 'groups': 0, 'max_copies': 1, 'truncated': 0}
+    entries, runs = [], []
+    descriptor, canonical = tempfile.mkstemp(suffix = '.pgn')
+    os.close(descriptor)
+    try:
+        # First pass : canonical games and fingerprints
+        with Chesspgn(canonical, mode = 'w') as writer:
+            for file in files:
+                for game in Chesspgn.read_games(file, french = french):
+                    sans, codes, key, complete = canonical_game(game)
+                    tags = dict(game['tags'])
+                    fen = tags.pop('FEN', None)
+                    tags.pop('SetUp', None)
+                    tags.pop('Result', None)
+                    termination = tags.pop('Termination', None)
+                    writer.write_game(sans, result = game['result'], termination = termination, fen = fen, **tags)
+                    entries.append((fingerprint(codes, key), stats['games']))
+                    stats['games'] += 1
+                    stats['truncated'] += not complete
+                    if len(entries) >= max_entries:
+                        runs.append(_write_run(entries))
+                        entries = []
+                    if report_every and stats['games'] % report_every == 0:
+                        print('%d games read, %.0f games/s' % (stats['games'], stats['games'] / (time.perf_counter() - start)))
+        runs.append(_write_run(entries))
+        entries = []
+
+        # Duplicates : all the games of a group of equal fingerprints, except the first one
+        duplicates = bytearray(stats['games'] // 8 + 1)
+        previous, copies = None, 0
+        for value, index in heapq.merge(*(_read_run(run) for run in runs)):
+            if value == previous:
+                duplicates[index >> 3] |= 1 << (index & 7)
+                copies += 1
+                stats['duplicates'] += 1
+                continue
+            if copies > 1:
+                stats['groups'] += 1
+                stats['max_copies'] = max(stats['max_copies'], copies)
+            previous, copies = value, 1
+        if copies > 1:
+            stats['groups'] += 1
+            stats['max_copies'] = max(stats['max_copies'], copies)
+
+        # Second pass : the canonical games that are not duplicates
+        with Chesspgn(output, mode = 'w') as writer:
+            for index, game in enumerate(Chesspgn.read_games(canonical)):
+                if duplicates[index >> 3] & 1 << (index & 7):
+                    continue
+                tags = game['tags']
+                fen = tags.pop('FEN', None)
+                tags.pop('SetUp', None)
+                tags.pop('Result', None)
+                termination = tags.pop('Termination', None)
+                writer.write_game(game['moves'], result = game['result'], termination = termination, fen = fen, **tags)
+                stats['written'] += 1
+    finally:
+        os.remove(canonical)
+        for run in runs:
+            os.remove(run)
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Writes the games of pgn files in a new pgn file, without the duplicates.')
+    parser.add_argument('output', help = 'output pgn file')
+    parser.add_argument('files', nargs = '+', help = 'input pgn files')
+    parser.add_argument('--french', action = 'store_true', help = 'the input games are in french notations')
+    parser.add_argument('--max-entries', type = int, default = 1000000,
+                        help = 'fingerprints kept in memory before they are sorted on disk')
+    arguments = parser.parse_args()
+
+    stats = dedup(arguments.files, arguments.output, french = arguments.french, max_entries = arguments.max_entries,
+                  report_every = 10000)
+    print('%d games read, %d written, %d duplicates (%d duplicated games, up to %d copies), %d truncated in %.1f s'
+          % (stats['games'], stats['written'], stats['duplicates'], stats['groups'], stats['max_copies'],
+             stats['truncated'], stats['seconds']))
@@ -1,7 +1,12 @@
 from Chessboard import *
+from Chesspgn import *
+from Chessengine import *
+from Chessclock import *
+import copy
+import datetime
 import sys
 import random
-import requests
+import threading
 
 def get_move_from_api(fen):
     """
@@ -15,99 +20,223 @@ def get_move_from_api(fen):
             The Forsyth–Edwards Notation (FEN) of the current state of the chessboard.
 
     """
+    import requests # Imported on first use : loading it takes longer than the rest of the program, for the api only
     api_url = 'https://chess.apurn.com/nextmove' 
     response = requests.post(api_url, fen) # Stockfish API call
     move = response.content.decode()  # Getting the move from API response
     return move
 
-def game(algo = 'random'):
+def last_move_san(board):
+    """
+    Returns the reference in standard algebraic notation of the last move executed on a chessboard.
+
+    Parameters
+    ----------
+        board : Chessboard object
+            The chessboard on which the move was executed.
+
+    """
+    origin, destination, piece = board.history[-1][:3]
+    piece_type = board.squares[destination].piece.piece_type
+    move = Chessmove(origin, destination, piece_type if piece_type != piece.piece_type else None) # Promotion if the piece changed
+    board.unmake_move() # The notation is computed on the position before the move
+    ref = board.to_san(move)
+    board.make_move(*move)
+    return ref
+
+def game(algo = 'random', engine_command = None, pgn_file = None, clock = None, ponder = True):
     """
     Launches a chess game between a player and the computer.
-    Player can choose his color and enter his moves in the console.
+    Player can choose their color and enter their moves in the console.
     The function supports algebraic notation and long algebraic notation for the moves.
-    The computer can play as random or using Stockfish algorithm, via an api.
+    The computer can play as random, using Stockfish algorithm via an api, using a local UCI engine,
+    or using this project's engine in the same process.
     To end the game even if it is not finished, player can input 'end' in the console.
 
 
     Parameters
     ----------
         algo : str
-            The algorithm used by the computer to make its moves. Can be 'random' or 'api'.
+            The algorithm used by the computer to make its moves. Can be 'random', 'api', 'engine' or 'local'.
             If set to 'api', the Stockfish algorithm is used, via an api.
+            If set to 'engine', a local UCI engine is used, from a Chesspool object.
+            If set to 'local', a Chessengine object is used, with the time management of the clock and pondering.
             Default is 'random'
+        engine_command : str or None
+            The path of the UCI engine binary used if algo is 'engine'. If None, this project's engine (uci.py) is used.
+            Default is None
+        pgn_file : str or None
+            The path of the pgn file to which the game is added, move after move. Its result is written at its end,
+            or when it is interrupted (e.g. by an error or Ctrl-C, with the result '*') : if the program is killed,
+            the moves played so far are in the file. If None, the game is not saved.
+            Default is None
+        clock : str or None
+            The time control of the game, as '<minutes>+<increment in seconds>' (e.g. '5+3'). The time of each move of
+            the computer is allocated from its remaining time and the increment, and a player without time left
+            loses the game. If None, the game has no clock.
+            Default is None
+        ponder : bool
+            If True and algo is 'local', the computer searches the position after the expected move of the player
+            while the player is thinking, and answers immediately (or with more depth) if the move is played.
+            Default is True
 
     """
-    api_url = 'https://chess.apurn.com/nextmove' 
-    board = Chessboard()
+    board = Chessboard(move_cache = Chesscache(1024)) # The moves of a position are generated once, whatever the attempts of the player
     play = True
+    pool = None
+    if algo == 'engine':
+        from Chesspool import Chesspool # Imported on first use, as the subprocess module is only needed here
+        pool = Chesspool(command = engine_command, size = 1)
+    engine = Chessengine() if algo == 'local' else None
+    timer = Chessclock.from_string(clock) if clock != None else None
+    flagged = None # Color of the player who lost on time, if any
+    pondering = {} # Search running during the time of the player : thread, expected position key
 
-    # Player inputs his color on the console
+    # Player inputs their color on the console
     color = input('What color do you want to play ? (White or Black)')
     
     # Computer color
     other_color = (color == 'White') * 'Black' + (color == 'Black') * 'White'
-    
-    # If computer's color is white, it needs to play the 1st move
-    if other_color == 'White':
-        moves = board.possible_moves('White') # Calculating all the possible moves
+
+    pgn = None
+    if pgn_file != None: # The moves are written in the pgn file as soon as they are executed, and the result at the end
+        pgn = Chesspgn(pgn_file)
+        names = {color: 'Player', other_color: 'Computer (%s)' % algo}
+        tags = {'TimeControl': '%d+%d' % (timer.remaining['White'], timer.increment)} if timer != None else {}
+        pgn.begin_game(live = True, Event = 'Game against the computer', Site = 'playgame.py',
+                       Date = datetime.date.today().strftime('%Y.%m.%d'), White = names['White'], Black = names['Black'], **tags)
+
+    def log_move():
+        if pgn != None and len(board.history) > len(pgn.moves): # A move was executed
+            pgn.add_move(last_move_san(board))
+
+    def start_pondering():
+        # Searching the position after the expected move of the player, during the time of the player
+        if engine == None or not ponder or len(engine.pv) < 2:
+            return
+        ponder_board = copy.deepcopy(board)
+        ponder_board.make_move(*engine.pv[1])
+        engine.stop_event = threading.Event()
+        started = threading.Event()
+        thread = threading.Thread(target = engine.search, args = (ponder_board,),
+                                  kwargs = {'ponder': True, 'callback': lambda engine: started.set()}, daemon = True)
+        thread.start()
+        while not started.wait(0.01) and thread.is_alive(): # Waiting for the search to be set up
+            pass
+        pondering.update(thread = thread, key = ponder_board.key)
+
+    def computer_move():
+        # Returns the move chosen by the computer, in algebraic or long algebraic notation
+        moves = list(board.legal_moves_san()) # Calculating all the legal moves in algebraic notation
+        soft, hard = timer.allocate(other_color) if timer != None else (None, None)
         if algo == 'random':
-            picked_move = random.choice(moves) # Picking a random move
-        if algo == 'api':
-            fen = board.encode_fen() # fen of the chessboard is needed for the API call
-            try:
-                picked_move = get_move_from_api(fen)  # Picking the move from API response
-            except:
-                picked_move = random.choice(moves)
-                print("Api call didn't work, Random move picked")       
-        
+            return random.choice(moves) # Picking a random move
+        if algo == 'local':
+            thread = pondering.pop('thread', None)
+            if thread != None and pondering.pop('key') == board.key: # Ponder hit : the search goes on with time limits
+                engine.ponderhit(movetime = hard if hard != None else 1.0, soft_time = soft)
+                thread.join()
+                print('Expected move : %d plies already searched' % engine.depth)
+                return board.to_san(engine.best_move)
+            if thread != None: # Ponder miss
+                engine.stop_event.set()
+                thread.join()
+            engine.stop_event = None
+            return board.to_san(engine.search(board, movetime = hard if hard != None else 1.0, soft_time = soft))
+        fen = board.encode_fen() # fen of the chessboard is needed for the API call
+        try:
+            # Picking the move from API response or from the local engine
+            picked_move = pool.get_move(fen, movetime = soft) if algo == 'engine' else get_move_from_api(fen)
+            # Converting API notation in case of castling
+            if (picked_move == 'e8g8' or picked_move == 'e1g1') and board.squares[picked_move[:2]].piece.piece_type == 'K':
+                picked_move = 'O-O'
+            elif (picked_move == 'e8c8' or picked_move == 'e1c1') and board.squares[picked_move[:2]].piece.piece_type == 'K':
+                picked_move = 'O-O-O'
+        except:
+            picked_move = random.choice(moves)
+            print("Api call didn't work, Random move picked")
+        return picked_move
+
+    def computer_turn():
+        # Chooses and executes the move of the computer. Returns False if the game is over.
+        if timer != None:
+            timer.start(other_color)
+        picked_move = computer_move()
         print(picked_move)
         if len(picked_move) == 4 and picked_move[:2] in board.squares.keys(): # Case of a long algebraic notation
             board.smove(picked_move[:2], picked_move[2:]) # Executing the move with a long algebraic notation
+        elif len(picked_move) == 5 and picked_move[:2] in board.squares.keys(): # Long algebraic notation with promotion
+            board.smove(picked_move[:2], picked_move[2:4], promote = picked_move[4].upper())
         else:
             board.cmove(picked_move) # Executing the move with an algebraic notation
+        log_move()
         print(board)
+        if timer != None:
+            timer.stop()
+            print(timer)
+            if timer.flagged(other_color):
+                return False
+        if board.is_mating(other_color) or board.is_pating(other_color): # Checking if the game is finished
+            return False
+        start_pondering()
+        return True
 
-    while play: # Loop until a checkmate or a pat or the players inputs 'end' in the console
-        player_move = input('What is your move ? ("end" to finish the game)')
-        if player_move == 'end':
-            play = False
-        else:
-            board.move(player_move)
+    try:
+        # If computer's color is white, it needs to play the 1st move
+        if other_color == 'White':
+            computer_turn()
 
-            if board.is_mating(color) or board.is_pating(color): # Checking if the game is finished
+        while play: # Loop until a checkmate or a pat or the players inputs 'end' in the console
+            if timer != None and timer.running != color:
+                timer.start(color)
+            player_move = input('What is your move ? ("end" to finish the game)')
+            if player_move == 'end':
                 play = False
-            
-            if board.turn == other_color and play: # If a move was executed and game is not finished, it is now computer's turn.
-                moves = board.possible_moves(board.turn) # Calculating all the possible moves
-                                
-                if algo=='random':
-                    picked_move=random.choice(moves) # Picking a random move
-                
-                if algo == 'api':
-                    fen = board.encode_fen() # fen of the chessboard is needed for the API call
-                    try:
-                        picked_move = get_move_from_api(fen)  # Picking the move from API response
-                        # Converting API notation in case of castling
-                        if (picked_move == 'e8g8' or picked_move == 'e1g1') and board.squares[picked_move[:2]].piece.piece_type == 'K':
-                            picked_move = 'O-O'
-                        elif (picked_move == 'e8c8' or picked_move == 'e1c1') and board.squares[picked_move[:2]].piece.piece_type == 'K':
-                            picked_move = 'O-O-O'
-                    except:
-                        picked_move = random.choice(moves)
-                        print("Api call didn't work, Random move picked")
-                        
-                print(picked_move)
-                if len(picked_move) == 4 and picked_move[:2] in board.squares.keys(): # Case of a long algebraic notation
-                    board.smove(picked_move[:2],picked_move[2:]) # Executing the move with a long algebraic notation
-                else:
-                    board.cmove(picked_move) # Executing the move with an algebraic notation
-                if board.is_mating(other_color) or board.is_pating(other_color): # Checking if the game is finished
+            else:
+                board.move(player_move)
+                log_move()
+
+                if timer != None and board.turn == other_color: # The move was executed
+                    timer.stop()
+                    print(timer)
+                    if timer.flagged(color):
+                        play = False
+
+                if board.is_mating(color) or board.is_pating(color): # Checking if the game is finished
                     play = False
+            
+                if board.turn == other_color and play: # If a move was executed and game is not finished, it is now computer's turn.
+                    play = computer_turn()
+
+    finally: # The game is also saved and the engines are stopped if it is interrupted
+        if pondering.get('thread') != None: # Stopping the search started during the time of the player
+            engine.stop_event.set()
+            pondering['thread'].join()
+        if timer != None:
+            timer.stop()
+            flagged = next((player for player in ('White', 'Black') if timer.flagged(player)), None)
+
+        if pgn != None: # Writing the game with its result in the pgn file
+            if flagged != None:
+                result, termination = ('0-1' if flagged == 'White' else '1-0'), 'time forfeit'
+            elif board.has_legal_move():
+                result, termination = '*', 'abandoned'
+            elif board.is_attacked(board.king_squares[board.turn], board.opponents[board.turn]):
+                result, termination = ('0-1' if board.turn == 'White' else '1-0'), 'normal'
+            else:
+                result, termination = '1/2-1/2', 'normal'
+            pgn.end_game(result = result, termination = termination)
+            pgn.close()
+        elif flagged != None:
+            print('%s lost on time' % flagged)
 
-                    
-                print(board)
+        if pool != None:
+            pool.close()
 
 
 if __name__ == "__main__":
     game_type = sys.argv[1]
-    game(algo = game_type)
+    engine_path = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] else None
+    pgn_path = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] else None
+    time_control = sys.argv[4] if len(sys.argv) > 4 else None
+    game(algo = game_type, engine_command = engine_path, pgn_file = pgn_path, clock = time_control)
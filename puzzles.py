@@ -0,0 +1,329 @@
+from Chessengine import *
+from Chesspgn import *
+import argparse
+import collections
+import csv
+import time
+
+values = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 0} # Material values of the prefilter, in pawns
+columns = ('FEN', 'Moves', 'SAN', 'Score', 'White', 'Black', 'Date', 'Ply')
+
+_engine = None # Engine of a worker process, kept between the games
+
+
+def replay(game):
+    """
+    Replays a game read by Chesspgn.read_games and returns a tuple (moves, material, forcing, mate) : its moves as
+    Chessmove objects, the material balance in pawns for the player of the first move before and after each ply,
+    for each move True if it is a capture, a check or a promotion, and True if the game ends by a checkmate.
+    The game is replayed until its first move that cannot be executed.
+
+    Parameters
+    ----------
+        game : dict
+            The game, with its tags and the references of its moves.
+    """
+    fen = game['tags'].get('FEN')
+    board = Chessboard(fen = fen) if fen != None else Chessboard()
+    first = board.turn
+    balance = sum(values[square.piece.piece_type] * (1 if square.piece.color == first else -1)
+                  for square in board.squares.values() if square.piece != None)
+    moves, material, forcing = [], [balance], []
+    for ref in game['moves']:
+        try:
+            move = board.parse_move(ref)
+        except MoveError:
+            return moves, material, forcing, False
+        board.make_move(*move)
+        sign = 1 if board.turn != first else -1 # The player who moved
+        piece, captured = board.history[-1][2:4]
+        promoted = board.squares[move.destination].piece.piece_type != piece.piece_type
+        if captured != None:
+            balance += sign * values[captured.piece_type]
+        if promoted:
+            balance += sign * (values[board.squares[move.destination].piece.piece_type] - 1)
+        moves.append(move)
+        material.append(balance)
+        forcing.append(captured != None or promoted or board.is_attacked(board.king_squares[board.turn], board.opponents[board.turn]))
+    mate = bool(moves) and forcing[-1] and not board.has_legal_move()
+    return moves, material, forcing, mate
+
+
+def candidates(moves, material, forcing, mate, window = 6, min_gain = 2, skip_plies = 10):
+    """
+    Returns the plies of a game (indexes of the positions before a move) that may hold a tactic, found without any
+    search : the move played is forcing (a capture, a check or a promotion), and the player to move checkmates or wins
+    at least min_gain pawns of material within the next plies of the game, including the answer of the opponent.
+    Once a candidate is found, the plies of its window are skipped.
+
+    Parameters
+    ----------
+        moves, material, forcing, mate :
+            The replayed game, as returned by replay.
+        window : int
+            The number of plies of the game in which the tactic must pay off.
+            Default is 6.
+        min_gain : int
+            The material won by the player to move, in pawns.
+            Default is 2.
+        skip_plies : int
+            The number of plies of the opening in which no candidate is searched.
+            Default is 10.
+    """
+    result = []
+    end = len(moves)
+    ply = skip_plies
+    while ply < end:
+        sign = 1 if ply % 2 == 0 else -1 # Sign of the player to move, relatively to the player of the first move
+        if not forcing[ply]:
+            ply += 1
+            continue
+        last = min(ply + window, end)
+        mating = mate and (end - ply) <= window and (end - ply) % 2 == 1 # The player to move delivers the mate
+        gain = min(material[last] - material[ply], material[max(last - 1, ply)] - material[ply]) * sign
+        if mating or gain >= min_gain:
+            result.append(ply)
+            ply += window
+        else:
+            ply += 1
+    return result
+
+
+def verify(board, nodes = 20000, min_score = 200, margin = 150, min_gain = 2, max_moves = 4):
+    """
+    Searches the solution of a candidate position and returns it as a tuple (moves, score) : the line of the puzzle
+    (Chessmove objects, beginning and ending with a move of the solver) and the score of the position for the solver,
+    or None if the position is not a puzzle.
+    A move of the solver is accepted if it is winning (its score is at least min_score) and unique (the second best
+    move is not winning and is worse by at least margin), or if it is the only move which mates. The answers of the opponent are the best moves of the engine.
+    The line ends with a checkmate, with a move of the solver after which the material is won for good, when the next
+    move of the solver is not unique, or after max_moves moves of the solver. The board is left unchanged.
+
+    Parameters
+    ----------
+        board : Chessboard object
+            The position of the puzzle, the solver being the player to move.
+        nodes : int
+            The maximum number of nodes of each search.
+            Default is 20000.
+        min_score : int
+            The score in centipawns from which a move is winning.
+            Default is 200.
+        margin : int
+            The minimum difference in centipawns between the best and the second best move of the solver.
+            Default is 150.
+        min_gain : int
+            The material in pawns from which the material is won.
+            Default is 2.
+        max_moves : int
+            The maximum number of moves of the solver in the line.
+            Default is 4.
+    """
+    line, score = [], None
+    start = sum(values[square.piece.piece_type] * (1 if square.piece.color == board.turn else -1)
+                for square in board.squares.values() if square.piece != None)
+    balance = start
+    made = 0
+    try:
+        for step in range(max_moves):
+            lines = _engine.multipv_search(board, lines = 2, nodes = nodes)
+            if lines and lines[0][1] >= Chessengine.mate_score - Chessengine.max_ply: # Only the mating moves count
+                unique = len(lines) == 1 or lines[1][1] < Chessengine.mate_score - Chessengine.max_ply
+            else:
+                unique = bool(lines) and lines[0][1] >= min_score and \
+                    (len(lines) == 1 or (lines[1][1] < min_score and lines[0][1] - lines[1][1] >= margin))
+            if not unique:
+                if step == 0:
+                    return None
+                line.pop() # The line ends with the previous move of the solver
+                break
+            move = lines[0][0]
+            if step == 0:
+                score = lines[0][1]
+            line.append(move)
+            board.make_move(*move)
+            made += 1
+            balance += values[board.history[-1][3].piece_type] if board.history[-1][3] != None else 0
+            if move.promote != None:
+                balance += values[move.promote] - 1
+            if not board.has_legal_move(): # Checkmate (or stalemate, which the engine did not choose if winning)
+                break
+            reply = _engine.search(board, nodes = nodes)
+            board.make_move(*reply)
+            made += 1
+            balance -= values[board.history[-1][3].piece_type] if board.history[-1][3] != None else 0
+            if reply.promote != None:
+                balance -= values[reply.promote] - 1
+            if balance - start >= min_gain: # The material is won for good : the reply does not take it back
+                board.unmake_move()
+                made -= 1
+                break
+            line.append(reply)
+        else:
+            line.pop() # The line ends with a move of the solver
+    finally:
+        for count in range(made):
+            board.unmake_move()
+    return (line, score) if line else None
+
+
+def format_score(score):
+    """
+    Returns a score of the solver as text : in centipawns, or in moves before mate (e.g. '#3').
+    """
+    if abs(score) >= Chessengine.mate_score - Chessengine.max_ply:
+        moves = (Chessengine.mate_score - abs(score) + 1) // 2
+        return '#%d' % moves if score > 0 else '#-%d' % moves
+    return str(score)
+
+
+def extract_puzzles(task):
+    """
+    Replays a batch of games, filters their positions and verifies the candidates with the engine. Returns a dictionnary
+    with the puzzles found (one dictionnary per puzzle, with the keys of columns) and the numbers of games, positions
+    and candidates. This function runs in the worker processes of puzzles.
+
+    Parameters
+    ----------
+        task : dict
+            The games, and the parameters of the prefilter and of the verification.
+    """
+    global _engine
+    if _engine == None:
+        _engine = Chessengine(table = Chesstable(1 << 16))
+    result = {'puzzles': [], 'games': 0, 'positions': 0, 'candidates': 0}
+    for game in task['games']:
+        moves, material, forcing, mate = replay(game)
+        plies = candidates(moves, material, forcing, mate, window = task['window'], min_gain = task['min_gain'],
+                           skip_plies = task['skip_plies'])
+        result['games'] += 1
+        result['positions'] += len(moves)
+        result['candidates'] += len(plies)
+        if not plies:
+            continue
+        fen = game['tags'].get('FEN')
+        board = Chessboard(fen = fen) if fen != None else Chessboard()
+        played = 0
+        for ply in plies:
+            while played < ply:
+                board.make_move(*moves[played])
+                played += 1
+            found = verify(board, nodes = task['nodes'], min_score = task['min_score'], margin = task['margin'],
+                           min_gain = task['min_gain'])
+            if found == None:
+                continue
+            line, score = found
+            sans = []
+            for move in line:
+                sans.append(board.to_san(move))
+                board.make_move(*move)
+            for move in line:
+                board.unmake_move()
+            result['puzzles'].append({'FEN': board.encode_fen(), 'Moves': ' '.join(str(move) for move in line),
+                                      'SAN': ' '.join(sans), 'Score': format_score(score),
+                                      'White': game['tags'].get('White', '?'), 'Black': game['tags'].get('Black', '?'),
+                                      'Date': game['tags'].get('Date', '?'), 'Ply': ply + 1})
+    return result
+
+
+def puzzles(files, output, nodes = 20000, window = 6, min_gain = 2, skip_plies = 10, min_score = 200, margin = 150,
+            workers = None, french = False, batch = 16, report_every = 0):
+    """
+    Extracts tactics puzzles from the games of pgn files and writes them in a CSV file : the FEN of the position, the
+    solution line in long algebraic notation (as used by chess engines) and in standard algebraic notation, the score
+    of the position for the solver, and the game and ply of the position.
+    Returns a dictionnary with the number of games, of positions, of candidates verified and of puzzles found.
+
+    The games are replayed by batches in a pool of worker processes. A cheap prefilter (forcing moves followed by a
+    material swing or a checkmate in the game) keeps only a few positions of each game, and only these candidates are
+    verified by the engine, which searches whether the player to move has a unique winning line.
+
+    Parameters
+    ----------
+        files : list of str
+            The paths of the pgn files.
+        output : str
+            The path of the CSV file.
+        nodes : int
+            The maximum number of nodes of each search of the verification.
+            Default is 20000.
+        window, min_gain, skip_plies :
+            The parameters of the prefilter, as in the candidates function.
+        min_score, margin :
+            The parameters of the verification, as in the verify function.
+        workers : int or None
+            The number of worker processes. If None, the number of processors is used.
+            Default is None.
+        french : bool
+            To be set to True if the games are in french notations.
+            Default is False.
+        batch : int
+            The number of games sent at once to a worker process.
+            Default is 16.
+        report_every : int
+            If not 0, the progress is printed after each batch which completes this number of games.
+            Default is 0.
+    """
+    # Imported on first use : the worker processes import this module, and do not need the pool modules
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    start = time.perf_counter()
+    workers = workers if workers != None else (multiprocessing.cpu_count() or 1)
+    stats = {'games': 0, 'positions': 0, 'candidates': 0, 'puzzles': 0}
+
+    def tasks():
+        games = []
+        for file in files:
+            for game in Chesspgn.read_games(file, french = french):
+                games.append(game)
+                if len(games) >= batch:
+                    yield games
+                    games = []
+        if games:
+            yield games
+
+    def write(result):
+        for puzzle in result['puzzles']:
+            writer.writerow(puzzle)
+        reported = stats['games'] // report_every if report_every else 0
+        for key in ('games', 'positions', 'candidates'):
+            stats[key] += result[key]
+        stats['puzzles'] += len(result['puzzles'])
+        if report_every and stats['games'] // report_every > reported:
+            print('%d games, %d candidates, %d puzzles, %.1f games/s' % (stats['games'], stats['candidates'],
+                  stats['puzzles'], stats['games'] / (time.perf_counter() - start)))
+
+    with open(output, 'w', newline = '') as stream:
+        writer = csv.DictWriter(stream, fieldnames = columns)
+        writer.writeheader()
+        with ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn')) as executor:
+            pending = collections.deque() # Batches in progress, written in the order of the input files
+            for games in tasks():
+                pending.append(executor.submit(extract_puzzles, {'games': games, 'nodes': nodes, 'window': window,
+                    'min_gain': min_gain, 'skip_plies': skip_plies, 'min_score': min_score, 'margin': margin}))
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Extracts tactics puzzles from the games of pgn files.')
+    parser.add_argument('output', help = 'output CSV file')
+    parser.add_argument('files', nargs = '+', help = 'input pgn files')
+    parser.add_argument('--nodes', type = int, default = 20000, help = 'nodes of each search of the verification')
+    parser.add_argument('--window', type = int, default = 6, help = 'plies in which the tactic must pay off')
+    parser.add_argument('--min-gain', type = int, default = 2, help = 'material won by the tactic, in pawns')
+    parser.add_argument('--workers', type = int, default = None, help = 'number of worker processes')
+    parser.add_argument('--french', action = 'store_true', help = 'the input games are in french notations')
+    arguments = parser.parse_args()
+
+    stats = puzzles(arguments.files, arguments.output, nodes = arguments.nodes, window = arguments.window,
+                    min_gain = arguments.min_gain, workers = arguments.workers, french = arguments.french,
+                    report_every = 1000)
+    print('%d games, %d positions, %d candidates (%.2f %%), %d puzzles in %.1f s'
+          % (stats['games'], stats['positions'], stats['candidates'],
+             100 * stats['candidates'] / stats['positions'] if stats['positions'] else 0, stats['puzzles'],
+             stats['seconds']))
@@ -0,0 +1,316 @@
+from Chessengine import *
+from Chesspgn import *
+from Chesstablebase import *
+import argparse
+import os
+import random
+import struct
+import time
+
+# Openings used to seed the games, in standard algebraic notation
+openings = (
+    ('e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6'), # Ruy Lopez
+    ('e4', 'e5', 'Nf3', 'Nc6', 'Bc4', 'Bc5'), # Italian game
+    ('e4', 'c5', 'Nf3', 'd6', 'd4', 'cxd4', 'Nxd4', 'Nf6', 'Nc3', 'a6'), # Sicilian defence, Najdorf variation
+    ('e4', 'c5', 'Nc3', 'Nc6', 'g3'), # Sicilian defence, closed variation
+    ('e4', 'e6', 'd4', 'd5', 'Nc3', 'Bb4'), # French defence, Winawer variation
+    ('e4', 'c6', 'd4', 'd5', 'e5', 'Bf5'), # Caro-Kann defence, advance variation
+    ('e4', 'd5', 'exd5', 'Qxd5', 'Nc3', 'Qa5'), # Scandinavian defence
+    ('d4', 'd5', 'c4', 'e6', 'Nc3', 'Nf6', 'Bg5', 'Be7'), # Queen's gambit declined
+    ('d4', 'd5', 'c4', 'dxc4', 'Nf3', 'Nf6', 'e3'), # Queen's gambit accepted
+    ('d4', 'Nf6', 'c4', 'g6', 'Nc3', 'Bg7', 'e4', 'd6'), # King's indian defence
+    ('d4', 'Nf6', 'c4', 'e6', 'Nc3', 'Bb4'), # Nimzo-indian defence
+    ('d4', 'f5', 'g3', 'Nf6', 'Bg2', 'e6'), # Dutch defence
+    ('c4', 'e5', 'Nc3', 'Nf6', 'g3'), # English opening
+    ('Nf3', 'd5', 'g3', 'Nf6', 'Bg2', 'c6'), # Reti opening
+)
+
+result_codes = {'*': 0, '1-0': 1, '0-1': 2, '1/2-1/2': 3}
+termination_codes = {termination: code for code, termination in enumerate(Chesspgn.terminations)}
+binary_magic = b'CHSG\x01' # First bytes of a file in the compact binary format (version 1)
+
+_engines = {} # Engines of a worker process, by player description, kept between the games
+_tablebases = {} # Tablebases of a worker process, by folder, loaded once
+
+
+def make_player(description, tablebase = None):
+    """
+    Returns a function choosing the move of a player, called with the board and the random generator of the game.
+
+    Parameters
+    ----------
+        description : str
+            'random' for a player choosing random legal moves, or 'engine' for the alpha-beta engine, limited by
+            'engine:depth=<plies>' or 'engine:nodes=<count>' (default is 'engine:depth=2').
+        tablebase : Chesstablebase object or None
+            The endgame tablebases used by the engine players.
+            Default is None.
+    """
+    name, _, limit = description.partition(':')
+    if name == 'random':
+        return lambda board, generator: generator.choice(board.legal_moves())
+    if name != 'engine':
+        raise ValueError('unknown player ' + description)
+    limits = {'depth': 2} if not limit else {limit.partition('=')[0]: int(limit.partition('=')[2])}
+    if description not in _engines:
+        _engines[description] = Chessengine(table = Chesstable(1 << 16))
+    engine = _engines[description]
+    engine.tablebase = tablebase
+
+    def engine_player(board, generator):
+        return engine.search(board, **limits)
+    return engine_player
+
+
+def play_game(task):
+    """
+    Plays one self-play game and returns a dictionnary with its moves and result. This function runs in the worker
+    processes of selfplay. The game only depends on its seed, so that it can be replayed.
+
+    Parameters
+    ----------
+        task : dict
+            The description of the game : index, seed, white and black players, use of the openings book,
+            number of random opening plies, maximum number of plies, adjudication, folder of the tablebases
+            and notation of the moves.
+    """
+    generator = random.Random(task['seed'])
+    board = Chessboard()
+    tablebase = None
+    if task['tablebases'] != None:
+        tablebase = _tablebases.setdefault(task['tablebases'], Chesstablebase(task['tablebases']))
+    players = {'White': make_player(task['white'], tablebase), 'Black': make_player(task['black'], tablebase)}
+    for engine in _engines.values(): # Same starting state for each game, whatever the games played before by the process
+        engine.table.clear()
+
+    moves = []
+    sans = []
+    if task['book']: # The game starts with an opening of the book
+        for ref in generator.choice(openings):
+            move = board.parse_move(ref)
+            moves.append(move)
+            if task['san']: # Written as the other moves (check suffixes and disambiguation), not as in the book
+                sans.append(board.to_san(move))
+            board.make_move(*move)
+    for ply in range(task['random_plies']): # Followed by random moves, to diversify the games
+        legal = board.legal_moves()
+        if not legal:
+            break
+        move = generator.choice(legal)
+        moves.append(move)
+        if task['san']:
+            sans.append(board.to_san(move, legal = legal))
+        board.make_move(*move)
+
+    result, termination = '*', 'unterminated'
+    quiet_plies = 0 # Plies since the last capture or pawn move
+    repetitions = {board.key: 1}
+    losing_plies = 0 # Consecutive plies with a decisive material advantage
+    while True:
+        legal = board.legal_moves()
+        if not legal:
+            if board.is_attacked(board.king_squares[board.turn], board.opponents[board.turn]):
+                result = '0-1' if board.turn == 'White' else '1-0'
+            else:
+                result = '1/2-1/2'
+            termination = 'normal'
+            break
+        if quiet_plies >= 100 or repetitions[board.key] >= 3 or insufficient_material(board):
+            result, termination = '1/2-1/2', 'normal'
+            break
+        if len(moves) >= task['max_plies']:
+            result, termination = ('1/2-1/2', 'adjudication') if task['adjudicate'] else ('*', 'unterminated')
+            break
+        if task['adjudicate'] and tablebase != None and board.phase <= 8:
+            exact = tablebase.adjudicate(board) # Result with perfect play, if the material set has a table
+            if exact != None:
+                result, termination = exact, 'adjudication'
+                break
+        if task['adjudicate']:
+            if abs(board.eg_score) >= task['adjudicate_score']:
+                losing_plies += 1
+                if losing_plies >= task['adjudicate_plies']:
+                    result, termination = ('1-0' if board.eg_score > 0 else '0-1'), 'adjudication'
+                    break
+            else:
+                losing_plies = 0
+
+        move = players[board.turn](board, generator)
+        if task['san']:
+            sans.append(board.to_san(move, legal = legal))
+        moves.append(move)
+        board.make_move(*move)
+        record = board.history[-1]
+        quiet_plies = 0 if record[2].piece_type == 'P' or record[3] != None else quiet_plies + 1
+        repetitions[board.key] = repetitions.get(board.key, 0) + 1
+
+    return {'index': task['index'], 'seed': task['seed'], 'white': task['white'], 'black': task['black'],
+            'result': result, 'termination': termination, 'codes': [move.to_code() for move in moves],
+            'sans': sans if task['san'] else None}
+
+
+def insufficient_material(board):
+    """
+    Returns True if none of the players can mate : only kings, with at most one bishop or knight on the board.
+    """
+    minors = 0
+    for square in board.squares.values():
+        piece = square.piece
+        if piece != None and piece.piece_type != 'K':
+            if piece.piece_type in 'PRQ':
+                return False
+            minors += 1
+    return minors <= 1
+
+
+def write_binary_game(stream, game):
+    """
+    Writes a game in the compact binary format : the result and termination codes (1 byte each), the seed
+    (4 bytes), the number of plies (2 bytes), and each move encoded on 2 bytes by Chessmove.to_code.
+    All the integers are little-endian.
+    """
+    codes = game['codes']
+    stream.write(struct.pack('<BBIH%dH' % len(codes), result_codes[game['result']],
+                             termination_codes[game['termination']], game['seed'] & 0xFFFFFFFF, len(codes), *codes))
+
+
+def read_binary_games(file):
+    """
+    Yields the games of a file in the compact binary format, as dictionnaries with the result, termination,
+    seed and moves (Chessmove objects) of each game. The games start from the standard initial position.
+
+    Parameters
+    ----------
+        file : str
+            The path of the file.
+    """
+    results = {code: result for result, code in result_codes.items()}
+    with open(file, 'rb') as stream:
+        if stream.read(len(binary_magic)) != binary_magic:
+            raise ValueError(file + ' is not a self-play binary file')
+        while True:
+            header = stream.read(8)
+            if len(header) < 8:
+                return
+            result, termination, seed, plies = struct.unpack('<BBIH', header)
+            codes = struct.unpack('<%dH' % plies, stream.read(2 * plies))
+            yield {'result': results[result], 'termination': Chesspgn.terminations[termination], 'seed': seed,
+                   'moves': [Chessmove.from_code(code) for code in codes]}
+
+
+def selfplay(output, games = 100, white = 'random', black = 'random', workers = None, seed = 0, book = True,
+             random_plies = 0, max_plies = 300, adjudicate = True, adjudicate_score = 1000, adjudicate_plies = 10,
+             tablebases = None, report_every = 0):
+    """
+    Plays self-play games in a pool of processes and streams them to a file, as soon as they are finished.
+    Returns a dictionnary with the number of games and plies, the duration, and the games and plies per second.
+
+    Parameters
+    ----------
+        output : str
+            The path of the output file. Games are written in pgn if it ends with '.pgn',
+            in the compact binary format otherwise (see write_binary_game).
+        games : int
+            The number of games.
+            Default is 100.
+        white : str
+            The white player : 'random', 'engine', 'engine:depth=<plies>' or 'engine:nodes=<count>'.
+            Default is 'random'.
+        black : str
+            The black player, as for white.
+            Default is 'random'.
+        workers : int or None
+            The number of worker processes. If None, the number of CPUs.
+            Default is None.
+        seed : int
+            The seed of the first game. The game number i is played with seed + i.
+            Default is 0.
+        book : bool
+            If True, each game starts with an opening of the book, chosen with the seed of the game.
+            Default is True.
+        random_plies : int
+            The number of random plies played after the opening, to diversify the games.
+            Default is 0.
+        max_plies : int
+            The number of plies after which the game is stopped.
+            Default is 300.
+        adjudicate : bool
+            If True, a game stopped by max_plies is a draw, and a game is won by a player whose material and
+            piece-square endgame score stays above adjudicate_score during adjudicate_plies plies.
+            Default is True.
+        adjudicate_score : int
+            The score (in centipawns) giving a won game.
+            Default is 1000.
+        adjudicate_plies : int
+            The number of consecutive plies with a winning score needed to adjudicate the game.
+            Default is 10.
+        tablebases : str or None
+            The folder of the endgame tablebases (see Chesstablebase). If given, the engine players use them, and
+            a game reaching a material set with a table is adjudicated with its exact result.
+            Default is None.
+        report_every : int
+            If not 0, the throughput is printed each time this number of games is finished.
+            Default is 0.
+    """
+    # Imported on first use : the worker processes import this module, and do not need the pool modules
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+    pgn_output = output.endswith('.pgn')
+    tasks = [{'index': index, 'seed': seed + index, 'white': white, 'black': black, 'book': book,
+              'random_plies': random_plies, 'max_plies': max_plies, 'adjudicate': adjudicate,
+              'adjudicate_score': adjudicate_score, 'adjudicate_plies': adjudicate_plies, 'tablebases': tablebases,
+              'san': pgn_output}
+             for index in range(games)]
+    workers = workers if workers != None else os.cpu_count() or 1
+
+    plies = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn')) as executor:
+        if pgn_output:
+            writer = Chesspgn(output, mode = 'w')
+        else:
+            writer = open(output, 'wb', buffering = 1 << 16)
+            writer.write(binary_magic)
+        try:
+            # The games are written in order, as they are finished; chunks amortize the inter-process communication
+            for count, game in enumerate(executor.map(play_game, tasks, chunksize = max(1, min(32, games // (4 * workers)))), 1):
+                plies += len(game['codes'])
+                if pgn_output:
+                    writer.write_game(game['sans'], result = game['result'], termination = game['termination'],
+                                      Event = 'Self-play', Site = 'selfplay.py', Round = game['index'] + 1,
+                                      White = game['white'], Black = game['black'], Seed = game['seed'])
+                else:
+                    write_binary_game(writer, game)
+                if report_every and count % report_every == 0:
+                    seconds = time.perf_counter() - start
+                    print('%d games, %.1f games/s, %.0f plies/s' % (count, count / seconds, plies / seconds))
+        finally:
+            writer.close()
+
+    seconds = time.perf_counter() - start
+    return {'games': games, 'plies': plies, 'seconds': round(seconds, 3),
+            'games_per_second': round(games / seconds, 2), 'plies_per_second': round(plies / seconds, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Plays self-play games and writes them in a pgn or binary file.')
+    parser.add_argument('output', help = 'output file (.pgn for pgn, any other extension for the binary format)')
+    parser.add_argument('games', type = int, nargs = '?', default = 100)
+    parser.add_argument('--white', default = 'random', help = "random, engine, engine:depth=<plies> or engine:nodes=<count>")
+    parser.add_argument('--black', default = 'random', help = "random, engine, engine:depth=<plies> or engine:nodes=<count>")
+    parser.add_argument('--workers', type = int, default = None)
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--no-book', action = 'store_true', help = 'start the games from the initial position')
+    parser.add_argument('--random-plies', type = int, default = 0)
+    parser.add_argument('--max-plies', type = int, default = 300)
+    parser.add_argument('--no-adjudication', action = 'store_true')
+    parser.add_argument('--tablebases', help = 'folder of the endgame tablebases generated by Chesstablebase.py')
+    arguments = parser.parse_args()
+
+    stats = selfplay(arguments.output, games = arguments.games, white = arguments.white, black = arguments.black,
+                     workers = arguments.workers, seed = arguments.seed, book = not arguments.no_book,
+                     random_plies = arguments.random_plies, max_plies = arguments.max_plies,
+                     adjudicate = not arguments.no_adjudication, tablebases = arguments.tablebases,
+                     report_every = max(1, arguments.games // 10))
+    print('%d games, %d plies in %.1f s : %.2f games/s, %.1f plies/s' % (stats['games'], stats['plies'], stats['seconds'],
+          stats['games_per_second'], stats['plies_per_second']))
@@ -0,0 +1,80 @@
+from benchmark import perft, perft_positions, pgn_folder
+from Chessgame import *
+from Chessprofiler import *
+import itertools
+import os
+import random
+import pytest
+
+# Run with : python -m pytest -q
+
+
+def state(board):
+    """
+    Returns the attributes of a chessboard maintained incrementally by make_move and unmake_move.
+    """
+    return (board.key, board.pawn_key, board.mg_score, board.eg_score, board.phase, board.occupied,
+            dict(board.king_squares))
+
+
+def random_boards(games = 8, plies = 60, seed = 1):
+    """
+    Yields the positions of random games (the same board, after each move).
+    """
+    generator = random.Random(seed)
+    for game in range(games):
+        board = Chessboard()
+        for ply in range(plies):
+            yield board
+            moves = sorted(board.legal_moves(), key = str)
+            if not moves:
+                break
+            board.make_move(*generator.choice(moves))
+
+
+@pytest.mark.parametrize('name, fen, references', perft_positions, ids = [position[0] for position in perft_positions])
+def test_perft(name, fen, references):
+    board = Chessboard(fen = fen)
+    for depth, reference in enumerate(references[:3], 1):
+        assert perft(board, depth) == reference
+    assert board.encode_fen() == Chessboard(fen = fen).encode_fen() # Left as it was
+
+
+def test_san_round_trip():
+    boards = [Chessboard(fen = fen) for name, fen, references in perft_positions]
+    for board in itertools.chain(boards, random_boards(games = 4)):
+        for move in board.legal_moves():
+            assert board.parse_move(board.to_san(move)) == move
+
+
+def test_incremental_state():
+    generator = random.Random(2)
+    for board in random_boards():
+        before = state(board)
+        moves = board.legal_moves()
+        for move in generator.sample(moves, min(len(moves), 4)):
+            board.make_move(*move)
+            assert state(board) == state(Chessboard(fen = board.encode_fen()))
+            board.unmake_move()
+            assert state(board) == before
+
+
+def test_replay_without_board_copies():
+    game = Chessgame(os.path.join(pgn_folder, 'nabaty_fridman_2018.pgn'))
+    board = Chessboard()
+    with Chessprofiler() as profiler:
+        board.move(*game.moves[:40], quiet = True)
+    assert profiler.stats['deepcopy'][0] == 0 # The legacy checks test the moves on the board itself
+    assert len(board.history) == 40
+    assert state(board) == state(Chessboard(fen = board.encode_fen()))
+
+
+def test_move_cache():
+    cache = Chesscache()
+    for board in random_boards(games = 1, plies = 12):
+        cached = Chessboard(fen = board.encode_fen(), move_cache = cache)
+        for repeat in range(2): # Generated, then read in the cache
+            assert sorted(cached.legal_moves()) == sorted(board.legal_moves())
+            for color in ('White', 'Black'):
+                assert cached.possible_moves(color) == board.possible_moves(color)
+    assert cache.hits > 0
@@ -0,0 +1,279 @@
+from Chessengine import *
+from Chessclock import *
+import re
+import sys
+import threading
+
+class UciSession:
+    """
+    A class to drive a Chessboard and a Chessengine with the Universal Chess Interface (UCI) protocol,
+    so that they can be used by standard chess GUIs and tournament tools.
+
+    ...
+
+    The commands are read line by line. The search runs on a background thread, so that the 'stop', 'isready'
+    and 'quit' commands are answered while the engine is thinking.
+
+    Attributes
+    ----------
+    board : Chessboard object
+        The current position, set with the 'position' command.
+    engine : Chessengine object
+        The engine searching the positions.
+    threads : int
+        The number of worker processes of the search (UCI option 'Threads').
+    output : file object
+        The stream on which the answers are written.
+
+    Methods
+    -------
+    run(self, stream):
+        Reads and executes the commands of a stream until the 'quit' command or the end of the stream.
+
+    execute(self, line):
+        Executes one UCI command. Returns False if the command is 'quit'.
+    """
+
+    name = 'Chess'
+    author = 'Joydata'
+    fen_pattern = [re.compile(pattern) for pattern in (r'^([KQRBNPkqrbnp1-8]+/){7}[KQRBNPkqrbnp1-8]+$', r'^[wb]$',
+                                                       r'^(-|K?Q?k?q?)$', r'^(-|[a-h][36])$', r'^\d+$', r'^\d+$')]
+
+    def __init__(self, output = sys.stdout):
+        """
+        Instantiate a UciSession object with the initial position of a standard game.
+
+        Parameters
+        ----------
+            output : file object
+                The stream on which the answers are written.
+                Default is sys.stdout.
+        """
+        self.board = Chessboard()
+        self.engine = Chessengine()
+        self.engine.stop_event = threading.Event()
+        self.threads = 1
+        self.multipv = 1 # Number of best moves searched (UCI option 'MultiPV')
+        self.hash_size = 4 # Size of the transposition table in MB
+        self.output = output
+        self.search_thread = None
+        self.lock = threading.Lock()
+
+    def send(self, line):
+        """
+        Writes an answer line on the output stream.
+        """
+        with self.lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, stream = sys.stdin):
+        """
+        Reads and executes the commands of a stream until the 'quit' command or the end of the stream.
+
+        Parameters
+        ----------
+            stream : file object
+                The stream from which the commands are read.
+                Default is sys.stdin.
+        """
+        for line in stream:
+            if not self.execute(line):
+                break
+        self.stop()
+
+    def execute(self, line):
+        """
+        Executes one UCI command. Returns False if the command is 'quit', True otherwise.
+        Unknown commands are ignored, as required by the protocol.
+
+        Parameters
+        ----------
+            line : str
+                The command line.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+
+        if command == 'uci':
+            self.send('id name ' + UciSession.name)
+            self.send('id author ' + UciSession.author)
+            self.send('option name Threads type spin default 1 min 1 max 64')
+            self.send('option name Hash type spin default 4 min 1 max 1024')
+            self.send('option name Trace type string default <empty>')
+            self.send('option name Ponder type check default false')
+            self.send('option name MultiPV type spin default 1 min 1 max 64')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'setoption':
+            self.set_option(tokens)
+        elif command == 'ucinewgame':
+            self.stop()
+            self.engine.table.clear()
+            self.board = Chessboard()
+        elif command == 'position':
+            self.stop()
+            self.set_position(tokens)
+        elif command == 'go':
+            self.stop()
+            self.go(tokens)
+        elif command == 'ponderhit': # The expected move was played : the pondering search goes on with its time limits
+            self.engine.ponderhit()
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            return False
+        return True
+
+    def set_option(self, tokens):
+        """
+        Executes a 'setoption name <name> value <value>' command.
+        """
+        if 'name' not in tokens or 'value' not in tokens:
+            return
+        name = ' '.join(tokens[tokens.index('name') + 1:tokens.index('value')]).lower()
+        value = ' '.join(tokens[tokens.index('value') + 1:])
+        if name in ('threads', 'hash', 'multipv'):
+            try:
+                int(value)
+            except ValueError: # A malformed command must not stop the session
+                self.send('info string invalid value %s of option %s' % (value, name))
+                return
+        if name == 'threads':
+            self.threads = max(1, int(value))
+        elif name == 'hash':
+            self.hash_size = max(1, int(value))
+            self.engine.table = Chesstable(self.hash_size * (1 << 20) // 16)
+        elif name == 'multipv':
+            self.multipv = max(1, int(value))
+        elif name == 'trace': # JSON lines file of the statistics of each depth
+            self.engine.stats.trace = value if value not in ('', '<empty>') else None
+
+    def set_position(self, tokens):
+        """
+        Executes a 'position startpos|fen <fen> [moves <move1> ... <movei>]' command.
+        The position is only replaced if the FEN is valid and every move is legal : otherwise an 'info string' answer
+        is sent and the previous position is kept.
+        """
+        moves = tokens.index('moves') if 'moves' in tokens else len(tokens)
+        if len(tokens) > 1 and tokens[1] == 'fen':
+            fen = ' '.join(tokens[2:moves])
+            if not UciSession.is_valid_fen(fen):
+                self.send('info string invalid fen %s' % fen)
+                return
+            board = Chessboard(fen = fen)
+        else:
+            board = Chessboard()
+        for text in tokens[moves + 1:]:
+            legal = {str(move): move for move in board.legal_moves()}
+            if text.lower() not in legal: # The moves are checked on the new board, before it replaces the current one
+                self.send('info string illegal move %s' % text)
+                return
+            board.make_move(*legal[text.lower()])
+        self.board = board
+
+    @staticmethod
+    def is_valid_fen(fen):
+        """
+        Returns True if a FEN can be set up on a Chessboard : eight lines of eight squares, one king of each color,
+        and well-formed turn, castling, en passant and move number fields (the fields after the position are optional).
+        """
+        fields = fen.split()
+        if not 1 <= len(fields) <= 6 or not UciSession.fen_pattern[0].match(fields[0]):
+            return False
+        lines = fields[0].split('/')
+        if any(sum(int(char) if char.isdigit() else 1 for char in line) != 8 for line in lines):
+            return False
+        if fields[0].count('K') != 1 or fields[0].count('k') != 1:
+            return False
+        for field, pattern in zip(fields[1:], UciSession.fen_pattern[1:]):
+            if not pattern.match(field):
+                return False
+        return True
+
+    def go(self, tokens):
+        """
+        Executes a 'go' command : starts the search of the current position on a background thread.
+        Supported limits are depth, nodes, movetime, wtime / btime / winc / binc / movestogo and infinite.
+        The time of a move is allocated from the remaining time by a Chessclock object (soft and hard limits).
+        With 'go ponder', the time limits only start at the 'ponderhit' command. With 'go ponder' and 'go infinite',
+        the 'bestmove' answer is only sent after the 'ponderhit' or 'stop' command.
+        """
+        limits = {}
+        for index, token in enumerate(tokens[:-1]):
+            if token in ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+                try:
+                    limits[token] = int(tokens[index + 1])
+                except ValueError: # The malformed limit is ignored
+                    self.send('info string invalid value %s of %s' % (tokens[index + 1], token))
+
+        depth = limits.get('depth')
+        nodes = limits.get('nodes')
+        movetime = limits['movetime'] / 1000 if 'movetime' in limits else None
+        soft_time = None
+        color = self.board.turn
+        remaining = limits.get('wtime' if color == 'White' else 'btime')
+        if movetime == None and remaining != None: # Sharing the remaining time between the next moves
+            clock = Chessclock(remaining / 60000, limits.get('winc' if color == 'White' else 'binc', 0) / 1000)
+            soft_time, movetime = clock.allocate(color, moves_to_go = max(1, limits.get('movestogo', 30)))
+
+        self.engine.stop_event.clear()
+        self.search_thread = threading.Thread(target = self.search, daemon = True,
+                                              args = (self.board, depth, movetime, nodes, soft_time,
+                                                      'ponder' in tokens or 'infinite' in tokens))
+        self.search_thread.start()
+
+    def search(self, board, depth, movetime, nodes, soft_time = None, ponder = False):
+        """
+        Searches a position (on the background thread) and writes the 'info' and 'bestmove' answers.
+        """
+        if self.threads > 1:
+            move = self.engine.parallel_search(board, workers = self.threads, depth = depth, movetime = movetime,
+                                               nodes = nodes, callback = self.info, soft_time = soft_time, ponder = ponder)
+            for report in self.engine.worker_stats:
+                self.send('info string worker %d depth %d nodes %d nps %d' % (report['worker'], report['depth'],
+                                                                               report['nodes'], report['nps']))
+        elif self.multipv > 1:
+            lines = self.engine.multipv_search(board, lines = self.multipv, depth = depth, movetime = movetime, nodes = nodes,
+                                               callback = self.info, ponder = ponder)
+            move = lines[0][0] if lines else None
+        else:
+            move = self.engine.search(board, depth = depth, movetime = movetime, nodes = nodes, callback = self.info,
+                                      soft_time = soft_time, ponder = ponder)
+        self.send('bestmove ' + (str(move) if move != None else '0000'))
+
+    def info(self, engine):
+        """
+        Writes an 'info' answer with the depth, score, nodes, nodes per second, time and principal variation of the search
+        (one answer per line, with its 'multipv' rank, for a multi-PV search), followed by an 'info string' answer
+        with the statistics of the depth (see Chessstats).
+        """
+        seconds = engine.elapsed()
+        lines = engine.lines if self.multipv > 1 and engine.lines else [(engine.best_move, engine.score, engine.pv)]
+        for rank, (move, score, pv) in enumerate(lines, 1):
+            if abs(score) >= Chessengine.mate_score - Chessengine.max_ply: # Mate score, given in moves
+                plies = Chessengine.mate_score - abs(score)
+                score = 'mate %d' % ((plies + 1) // 2 if score > 0 else -((plies + 1) // 2))
+            else:
+                score = 'cp %d' % score
+            self.send('info depth %d%s score %s nodes %d nps %d time %d pv %s' % (engine.depth,
+                      ' multipv %d' % rank if self.multipv > 1 else '', score, engine.nodes,
+                      engine.nodes / seconds if seconds > 0 else 0, seconds * 1000, ' '.join(str(move) for move in pv)))
+        if engine.stats.depths and engine.stats.depths[-1]['depth'] == engine.depth:
+            self.send(engine.stats.info_string())
+
+    def stop(self):
+        """
+        Stops the current search, if any, and waits for its 'bestmove' answer.
+        """
+        if self.search_thread != None:
+            self.engine.stop_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+
+if __name__ == "__main__":
+    UciSession().run()
@@ -1,14 +1,37 @@
-from Chessgame import *
+from Chessviewer import *
 import sys
 
 if __name__ == "__main__":
     game_file = sys.argv[1]
-    wait_time = int(sys.argv[2])
+    wait_time = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
     is_french = False
-    
+    interactive = 'interactive' in sys.argv[3:]
+
     if len(sys.argv) > 3:
-        if sys.argv[3] == 'fr':
-            is_french = True            
-    
+        if sys.argv[3] in ('fr', 'french'):
+            is_french = True
+
     game = Chessgame(game_file, french = is_french)
-    game.playgame(timer = wait_time)
\ No newline at end of file
+    viewer = Chessviewer(game, delay = wait_time)
+
+    if not interactive:
+        viewer.play()
+        viewer.wait()
+    else:
+        print('Commands : Enter or n (next), p (previous), <ply number> (seek), play, pause, q (quit)')
+        viewer.show()
+        for line in sys.stdin:
+            command = line.strip()
+            if command in ('', 'n'):
+                viewer.step(1)
+            elif command == 'p':
+                viewer.step(-1)
+            elif command.isdigit():
+                viewer.seek(int(command))
+            elif command == 'play':
+                viewer.play()
+            elif command == 'pause':
+                viewer.pause()
+            elif command == 'q':
+                break
+        viewer.pause()